@@ -0,0 +1,50 @@
+import sys
+import argparse
+
+from records import iter_row_blocks, parse_columns, parse_key_expressions
+from job_output import TaskCounters
+
+# One line per valid value, keyed for the secondary sort (site_series.py):
+#   site \t date \t column \t value \t place
+# Nothing is kept across rows: the per-site state lives in the reducer.
+
+PLACE_FIELDS = ['state_name', 'county_name']
+
+def mapper(columns, key_fields):
+    counters = TaskCounters(columns)
+    lookup = columns + key_fields + ['date_local'] + PLACE_FIELDS
+    write = sys.stdout.write
+    for indexes, rows in iter_row_blocks(sys.stdin, lookup, counters=counters):
+        counters.rows += len(rows)
+        value_indexes = list(zip(columns, indexes[:len(columns)]))
+        key_indexes = indexes[len(columns):len(columns) + len(key_fields)]
+        date_index = indexes[len(columns) + len(key_fields)]
+        place_indexes = [i for i in indexes[-len(PLACE_FIELDS):] if i >= 0]
+        if min(key_indexes) < 0 or date_index < 0:
+            continue
+        for row in rows:
+            try:
+                key = ','.join(row[i].strip() for i in key_indexes)
+                date = row[date_index][:10]
+            except IndexError:
+                continue
+            if not key or len(date) != 10:
+                continue
+            place = ', '.join(row[i].strip() for i in place_indexes if i < len(row))
+            for column, index in value_indexes:
+                try:
+                    value = float(row[index])
+                except (ValueError, IndexError):
+                    continue
+                if value >= 0:
+                    counters.valid[column] += 1
+                    write(f"{key}\t{date}\t{column}\t{value!r}\t{place}\n")
+    counters.emit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily values keyed by site and date")
+    parser.add_argument("columns", nargs="?", default="")
+    parser.add_argument("--key", default="site", help="series key: site, county, ... or fields joined with +")
+    args = parser.parse_args()
+    _, key_fields = next(iter(parse_key_expressions(args.key).items()))
+    mapper(parse_columns([args.columns]), key_fields)
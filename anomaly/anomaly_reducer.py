@@ -0,0 +1,157 @@
+import sys
+import json
+import argparse
+from datetime import date
+
+from records import ordered_columns
+from site_series import DEFAULT_ALPHA, DEFAULT_MAX_GAP, DEFAULT_THRESHOLD, DEFAULT_WARMUP, EWMeanVariance
+from topk import TopKHeap
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_counts
+
+# Reads each series (site) in date order thanks to the secondary sort and
+# scores every day against the exponentially weighted mean and variance of
+# the days before it. Only the current series is held in memory, one O(1)
+# state per column, and the output keeps the `limit` highest z-scores per
+# column. Rows of the same day (several monitors) are averaged first; a
+# flagged day enters the baseline clipped to the threshold, so a multi-day
+# smoke event does not hide its own later days.
+
+DEFAULT_LIMIT = 200
+
+class SeriesState:
+
+    __slots__ = ("stats", "last_date", "day", "total", "count", "place")
+
+    def __init__(self, alpha):
+        self.stats = EWMeanVariance(alpha)
+        self.last_date = None
+        self.day = None
+        self.total = 0.0
+        self.count = 0
+        self.place = ""
+
+class Detector:
+
+    def __init__(self, alpha, threshold, warmup, max_gap, limit, two_sided):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.max_gap = max_gap
+        self.two_sided = two_sided
+        self.limit = limit
+        self.key = None
+        self.series = {}
+        self.heaps = {}
+        self.totals = {}
+
+    def add(self, key, day, column, value, place):
+        if key != self.key:
+            self.finish_series()
+            self.key = key
+        state = self.series.get(column)
+        if state is None:
+            state = self.series[column] = SeriesState(self.alpha)
+            self.column_totals(column)["series"] += 1
+        if day != state.day:
+            self.finish_day(column, state)
+            state.day, state.total, state.count = day, 0.0, 0
+        state.total += value
+        state.count += 1
+        state.place = place or state.place
+
+    def column_totals(self, column):
+        if column not in self.totals:
+            self.totals[column] = {"series": 0, "days": 0, "scored": 0, "flagged": 0}
+            self.heaps[column] = TopKHeap(self.limit)
+        return self.totals[column]
+
+    def finish_series(self):
+        for column, state in self.series.items():
+            self.finish_day(column, state)
+        self.series = {}
+
+    def finish_day(self, column, state):
+        if not state.count:
+            return
+        try:
+            day = date.fromisoformat(state.day)
+        except ValueError:
+            return
+        value = state.total / state.count
+        stats = state.stats
+        if state.last_date is not None and (day - state.last_date).days > self.max_gap:
+            stats = state.stats = EWMeanVariance(self.alpha)
+        totals = self.totals[column]
+        totals["days"] += 1
+        if stats.count >= self.warmup:
+            totals["scored"] += 1
+            z = stats.zscore(value)
+            if z >= self.threshold or (self.two_sided and z <= -self.threshold):
+                totals["flagged"] += 1
+                self.heaps[column].add(abs(z), json.dumps({
+                    "series": self.key, "place": state.place, "date": state.day, "value": value,
+                    "baseline": stats.mean, "spread": stats.spread(), "z": z, "days_in_series": stats.count,
+                }, separators=(',', ':')))
+                value = stats.mean + (self.threshold if z > 0 else -self.threshold) * stats.spread()
+        stats.update(value)
+        state.last_date = day
+        state.count = 0
+
+def report_anomalies(column, result):
+    print(f"=== Spike Detection (EW mean / variance per series) ===")
+    print(f"Column: {column}")
+    print(f"Series: {result['series']}, days: {result['days']}, days scored: {result['scored']}")
+    print(f"Flagged days ({'|z|' if result['two_sided'] else 'z'} >= {result['threshold']:g}): {result['flagged']}"
+          f", {len(result['anomalies'])} highest shown")
+    if not result["anomalies"]:
+        return
+    print(f"\n{'date':<12}{'z':>8}{'value':>12}{'baseline':>12}  series / place")
+    for anomaly in result["anomalies"]:
+        print(f"{anomaly['date']:<12}{anomaly['z']:8.2f}{anomaly['value']:12.4g}{anomaly['baseline']:12.4g}"
+              f"  {anomaly['series']}  {anomaly['place']}")
+
+def reducer(alpha, threshold, warmup, max_gap, limit, two_sided):
+    detector = Detector(alpha, threshold, warmup, max_gap, limit, two_sided)
+    record = new_record("anomaly")
+    for line in sys.stdin:
+        parts = line.rstrip('\n').split('\t')
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+            continue
+        if len(parts) != 5:
+            continue
+        key, day, column, value, place = parts
+        try:
+            detector.add(key, day, column, float(value), place)
+        except ValueError:
+            continue
+    detector.finish_series()
+
+    for column in ordered_columns(detector.totals):
+        result = dict(detector.totals[column], threshold=threshold, two_sided=two_sided)
+        result["anomalies"] = [json.loads(context) for _, context in detector.heaps[column].items()]
+        record["results"][column] = result
+    record["state"]["parameters"] = {"alpha": alpha, "threshold": threshold, "warmup": warmup,
+                                     "max_gap": max_gap, "limit": limit, "two_sided": two_sided}
+    finish_record(record)
+
+    for i, column in enumerate(record["results"]):
+        if i > 0:
+            print()
+        report_anomalies(column, record["results"][column])
+    print_counts(record)
+    emit_record(record)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flags days far above the running baseline of their series")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="weight of the newest day (0-1)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="z-score of a flagged day")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="days before a series is scored")
+    parser.add_argument("--max-gap", type=int, default=DEFAULT_MAX_GAP, help="days without data that restart a series")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="anomalies kept per column")
+    parser.add_argument("--two-sided", action="store_true", help="also flag sudden drops")
+    args = parser.parse_args()
+    if not 0 < args.alpha < 1:
+        print("ERROR: --alpha must be between 0 and 1", file=sys.stderr)
+        sys.exit(1)
+    reducer(args.alpha, args.threshold, args.warmup, args.max_gap, args.limit, args.two_sided)
@@ -0,0 +1,145 @@
+import sys
+import math
+import time
+import argparse
+
+from aggregates import Moments, decode
+from records import ordered_columns
+from histogram import encode_sparse, value_at_rank
+from job_output import emit_record, finish_record, new_record
+
+# Folds block partials in arrival order and publishes running estimates with
+# 95% confidence intervals:
+#   ESTIMATE  column  statistic  value  low  high
+#   PROGRESS  blocks  bytes_read  total_bytes  rows  elapsed_seconds
+# and, once the input ends, the final estimates as a RESULT_JSON record.
+# Blocks are sampled as clusters, so the standard error of the mean comes from
+# the spread of the block means; its ratio to the iid standard error (the
+# design effect) widens the intervals of the other statistics. A finite
+# population correction shrinks all intervals to zero once every block is read.
+
+Z_95 = 1.96
+PUBLISH_INTERVAL = 0.5
+PERCENTILES = [(50, "p50"), (90, "p90"), (95, "p95")]
+
+def process_partial(parts, states):
+    column = parts[1]
+    moments = decode(parts[3])
+    n, mean = moments.result()[:2]
+    if n == 0:
+        return
+    histogram = decode(parts[4])
+    if column not in states:
+        states[column] = {"moments": Moments(), "blocks": [], "histogram": histogram}
+    else:
+        states[column]["histogram"].merge(histogram)
+    state = states[column]
+    state["moments"].merge(moments)
+    state["blocks"].append((n, mean))
+
+def mean_standard_errors(blocks, n, mean, variance):
+    iid_se = math.sqrt(variance / n) if n > 0 else float('inf')
+    k = len(blocks)
+    if k < 2:
+        return iid_se, iid_se
+    spread = sum((n_i * (mean_i - mean)) ** 2 for n_i, mean_i in blocks)
+    cluster_se = math.sqrt(k / (k - 1) * spread) / n
+    return cluster_se, iid_se
+
+def column_estimates(state, fraction_read):
+    n, mean, M2, M3, M4 = state["moments"].result()
+    if n < 2:
+        return []
+    fpc = math.sqrt(max(0.0, 1.0 - fraction_read))
+    variance = M2 / (n - 1)
+    std_dev = math.sqrt(variance)
+    mean_se, iid_se = mean_standard_errors(state["blocks"], n, mean, variance)
+    design_effect = max(1.0, (mean_se / iid_se) ** 2) if iid_se > 0 else 1.0
+
+    estimates = []
+    half = Z_95 * mean_se * fpc
+    estimates.append(("mean", mean, mean - half, mean + half))
+
+    m4 = M4 / n
+    var_of_variance = max(0.0, (m4 - variance * variance) / n) * design_effect
+    half = Z_95 * math.sqrt(var_of_variance) / (2 * std_dev) * fpc if std_dev > 0 else 0.0
+    estimates.append(("std_dev", std_dev, max(0.0, std_dev - half), std_dev + half))
+
+    if M2 > 0 and n > 2:
+        skewness = (M3 / n) / std_dev ** 3
+        skew_se = math.sqrt(6.0 * n * (n - 1) / ((n - 2) * (n + 1) * (n + 3)) * design_effect)
+        half = Z_95 * skew_se * fpc
+        estimates.append(("skewness", skewness, skewness - half, skewness + half))
+
+    counts = state["histogram"].counts
+    layout = state["histogram"].layout
+    total = sum(counts)
+    for percentile, label in PERCENTILES:
+        p = percentile / 100.0
+        rank_half = Z_95 * math.sqrt(p * (1 - p) * total * design_effect) * fpc
+        value = value_at_rank(counts, p * total, layout)
+        low = value_at_rank(counts, max(1.0, p * total - rank_half), layout)
+        high = value_at_rank(counts, min(float(total), p * total + rank_half), layout)
+        if value is not None:
+            estimates.append((label, value, low, high))
+    return estimates
+
+def publish(states, blocks_done, bytes_done, total_bytes, started):
+    fraction_read = bytes_done / total_bytes if total_bytes else 1.0
+    rows = 0
+    for column in ordered_columns(states):
+        for statistic, value, low, high in column_estimates(states[column], fraction_read):
+            print(f"ESTIMATE\t{column}\t{statistic}\t{value}\t{low}\t{high}")
+        rows = max(rows, states[column]["moments"].result()[0])
+    print(f"PROGRESS\t{blocks_done}\t{bytes_done}\t{total_bytes}\t{rows}\t{time.time() - started:.2f}", flush=True)
+
+def final_record(states, record, fraction_read):
+    for column in ordered_columns(states):
+        state = states[column]
+        histogram = state["histogram"]
+        record["results"][column] = {
+            statistic: {"value": value, "low": low, "high": high}
+            for statistic, value, low, high in column_estimates(state, fraction_read)
+        }
+        record["state"][column] = {
+            "moments": list(state["moments"].result()),
+            "histogram": {"layout": histogram.layout.spec(), "num_buckets": histogram.layout.num_buckets,
+                          "sparse": encode_sparse(histogram.counts)},
+        }
+        record["counts"]["valid"][column] = state["moments"].result()[0]
+    record["sampled_fraction"] = fraction_read
+    return finish_record(record)
+
+def reducer(publish_interval):
+    states = {}
+    started = time.time()
+    last_publish = 0.0
+    blocks_done = bytes_done = total_bytes = 0
+    record = new_record("progressive_estimate")
+    for line in sys.stdin:
+        parts = line.rstrip('\n').split('\t')
+        try:
+            if parts[0] == "PARTIAL":
+                process_partial(parts, states)
+            elif parts[0] == "BLOCK_DONE":
+                blocks_done += 1
+                bytes_done = int(parts[2])
+                total_bytes = int(parts[3])
+                record["counts"]["rows"] += int(parts[4]) if len(parts) > 4 else 0
+                if time.time() - last_publish >= publish_interval:
+                    publish(states, blocks_done, bytes_done, total_bytes, started)
+                    last_publish = time.time()
+        except (ValueError, IndexError):
+            error_logged = True
+    publish(states, blocks_done, bytes_done, total_bytes, started)
+    emit_record(final_record(states, record, bytes_done / total_bytes if total_bytes else 1.0))
+    print("DONE", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Progressive estimates from sampled partials")
+    parser.add_argument("--interval", type=float, default=PUBLISH_INTERVAL)
+    args = parser.parse_args()
+    try:
+        reducer(args.interval)
+    except BrokenPipeError:
+        sys.stderr.close()
@@ -0,0 +1,69 @@
+import sys
+import csv
+import argparse
+
+from aggregates import Histogram, Moments
+from records import column_indexes, is_header, parse_columns, parse_values
+from histogram import DEFAULT_LAYOUT, parse_column_layouts, sample_layout
+from block_reader import BLOCK_BYTES, open_source, read_block, shuffled_blocks
+
+# Reads the input as fixed-size byte blocks in a random order (sampling
+# without replacement) and emits one partial per column and block as soon as
+# the block is read. Run to the end it has seen every row once, so the
+# estimate converges to the exact answer. A partial is a pair of serialized
+# aggregates (aggregates.py):
+#   PARTIAL  column  block_no  moments  histogram
+# The histogram carries its layout; with --layout auto the layout is fitted
+# to the values of the first sampled block.
+
+def emit_block(block_no, bytes_done, total_bytes, columns, rows, indexes, layouts):
+    for column, index in zip(columns, indexes):
+        values = parse_values(rows, index)
+        if column not in layouts:
+            layouts[column] = sample_layout(values) or DEFAULT_LAYOUT
+        moments = Moments()
+        moments.update_block(values)
+        histogram = Histogram(layouts[column])
+        histogram.update_block(values)
+        print(f"PARTIAL\t{column}\t{block_no}\t{moments.serialize()}\t{histogram.serialize()}")
+    print(f"BLOCK_DONE\t{block_no}\t{bytes_done}\t{total_bytes}\t{len(rows)}", flush=True)
+
+def mapper(columns, size, read_range, seed, max_fraction, layouts):
+    order = shuffled_blocks(size, seed)
+    limit = max(1, int(len(order) * max_fraction + 0.5))
+    bytes_done = 0
+    indexes = column_indexes(None, columns)
+    for block_no, block_idx in enumerate(order[:limit]):
+        rows = list(csv.reader(read_block(read_range, block_idx)))
+        if rows and is_header(rows[0]):
+            indexes = column_indexes(rows[0], columns)
+            rows = rows[1:]
+        bytes_done += min(BLOCK_BYTES, size - block_idx * BLOCK_BYTES)
+        emit_block(block_no, bytes_done, size, columns, rows, indexes, layouts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Random block sampler for progressive estimates")
+    parser.add_argument("columns", nargs="?", default="")
+    parser.add_argument("--input", required=True, help="HDFS path (with --webhdfs) or local file")
+    parser.add_argument("--webhdfs", default="", help="e.g. http://localhost:9870")
+    parser.add_argument("--user", default="hadoop")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-fraction", type=float, default=1.0)
+    parser.add_argument("--layout", default="auto", help="'auto' or histogram layouts, see histogram.py")
+    args = parser.parse_args()
+    columns = parse_columns([args.columns])
+    layouts = {}
+    if args.layout != "auto":
+        try:
+            layouts = parse_column_layouts(args.layout, columns)
+        except ValueError as e:
+            parser.error(str(e))
+    size, read_range = open_source(args.input, args.webhdfs, args.user)
+    try:
+        mapper(columns, size, read_range, args.seed, args.max_fraction, layouts)
+    except BrokenPipeError:
+        # The consumer stopped reading: the user accepted the current estimate
+        sys.stderr.close()
+
+if __name__ == "__main__":
+    main()
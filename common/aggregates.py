@@ -0,0 +1,488 @@
+import json
+import math
+import zlib
+import base64
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import mul
+from itertools import accumulate
+
+from moments import EMPTY_MOMENTS, CoMomentAccumulator, MomentAccumulator
+from histogram import parse_layout
+
+# Mergeable aggregates with one interface and one wire format, shared by the
+# mappers, combiners and reducers of every statistic job:
+#   update(value), update_block(values), merge(other), serialize()
+# and decode(text) for any serialized aggregate. Moments and histograms also
+# take update_block(values, weights) with integer frequency weights. Serialized, an aggregate is
+# base64 of [wire version][type code][payload], the payload packed binary
+# (little endian), so it fits one field of a tab separated streaming line:
+#   AGG  key  serialized
+# or, with the typed bytes wire format (wire.py), the same bytes unencoded.
+# Merging is exact for counts, min/max, histograms and sketches; moments
+# merge through the balanced tree of moments.py. The sketch modules are only
+# imported by the jobs that use them.
+
+WIRE_VERSION = 1
+AGGREGATE_KEY = "AGG"
+AGGREGATE_TYPES = {}
+
+def register(cls):
+    AGGREGATE_TYPES[cls.type_code] = cls
+    return cls
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def pack_text(text):
+    data = text.encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+def unpack_text(data, pos):
+    (length,) = struct.unpack_from('<H', data, pos)
+    pos += 2
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+class Aggregate:
+    type_code = 0
+
+    def update(self, value):
+        self.update_block((value,))
+
+    def update_block(self, values):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def payload(self):
+        raise NotImplementedError
+
+    @classmethod
+    def from_payload(cls, data):
+        raise NotImplementedError
+
+    def to_bytes(self):
+        return bytes((WIRE_VERSION, self.type_code)) + self.payload()
+
+    def serialize(self):
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    def check_type(self, other):
+        if type(other) is not type(self):
+            raise ValueError(f"cannot merge {type(other).__name__} into {type(self).__name__}")
+
+def decode(text):
+    # A serialized aggregate: base64 text, or raw bytes off a typed bytes stream
+    data = text if isinstance(text, bytes) else base64.b64decode(text)
+    if len(data) < 2 or data[0] != WIRE_VERSION:
+        raise ValueError("unsupported aggregate wire version")
+    cls = AGGREGATE_TYPES.get(data[1])
+    if cls is None:
+        raise ValueError(f"unknown aggregate type {data[1]}")
+    return cls.from_payload(data[2:])
+
+def format_line(key, aggregate):
+    return f"{AGGREGATE_KEY}\t{key}\t{aggregate.serialize()}"
+
+def write_aggregate(writer, key, aggregate):
+    # Through a wire.RecordWriter: the AGG line in text, raw bytes in typed bytes
+    writer.write(AGGREGATE_KEY, writer.tagged(key), aggregate.to_bytes())
+
+def merge_into(aggregates, key, aggregate):
+    if key in aggregates:
+        aggregates[key].merge(aggregate)
+    else:
+        aggregates[key] = aggregate
+
+@register
+class Count(Aggregate):
+    type_code = 1
+
+    def __init__(self, n=0):
+        self.n = n
+
+    def update_block(self, values):
+        self.n += len(values)
+
+    def merge(self, other):
+        self.check_type(other)
+        self.n += other.n
+
+    def payload(self):
+        return struct.pack('<q', self.n)
+
+    @classmethod
+    def from_payload(cls, data):
+        return cls(*struct.unpack('<q', data))
+
+@register
+class MinMax(Aggregate):
+    type_code = 2
+
+    def __init__(self, n=0, min_value=float('inf'), max_value=float('-inf')):
+        self.n = n
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def update_block(self, values):
+        if len(values):
+            self.n += len(values)
+            self.min_value = min(self.min_value, min(values))
+            self.max_value = max(self.max_value, max(values))
+
+    def merge(self, other):
+        self.check_type(other)
+        self.n += other.n
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def payload(self):
+        return struct.pack('<qdd', self.n, self.min_value, self.max_value)
+
+    @classmethod
+    def from_payload(cls, data):
+        return cls(*struct.unpack('<qdd', data))
+
+@register
+class Moments(Aggregate):
+    # Count, mean and central moment sums M2..M4 (moments.py)
+    type_code = 3
+
+    def __init__(self, moments=EMPTY_MOMENTS):
+        self.accumulator = MomentAccumulator()
+        self.accumulator.add_partial(moments)
+
+    def update_block(self, values, weights=None):
+        self.accumulator.add_block(values, weights)
+
+    def merge(self, other):
+        self.check_type(other)
+        self.accumulator.add_partial(other.result())
+
+    def result(self):
+        return self.accumulator.result()
+
+    def payload(self):
+        return struct.pack('<q4d', *self.result())
+
+    @classmethod
+    def from_payload(cls, data):
+        return cls(struct.unpack('<q4d', data))
+
+@register
+class CoMoments(Aggregate):
+    # Means and co-moments of several columns, updated with one block of
+    # values per column (moments.py)
+    type_code = 4
+
+    def __init__(self, columns, comoments=None):
+        self.columns = list(columns)
+        self.accumulator = CoMomentAccumulator(len(self.columns))
+        if comoments is not None:
+            self.accumulator.add_partial(comoments)
+
+    def update(self, row):
+        self.update_block([[value] for value in row])
+
+    def update_block(self, columns):
+        self.accumulator.add_block(columns)
+
+    def merge(self, other):
+        self.check_type(other)
+        if other.columns != self.columns:
+            raise ValueError("cannot merge co-moments of different columns")
+        self.accumulator.add_partial(other.result())
+
+    def result(self):
+        return self.accumulator.result()
+
+    def payload(self):
+        n, means, C = self.result()
+        k = len(self.columns)
+        return (pack_text(','.join(self.columns)) +
+                struct.pack(f'<q{k}d{len(C)}d', n, *means, *C))
+
+    @classmethod
+    def from_payload(cls, data):
+        names, pos = unpack_text(data, 0)
+        columns = names.split(',')
+        k = len(columns)
+        num_c = k * (k + 1) // 2
+        values = struct.unpack_from(f'<q{k}d{num_c}d', data, pos)
+        return cls(columns, (values[0], tuple(values[1:1 + k]), tuple(values[1 + k:])))
+
+@register
+class Histogram(Aggregate):
+    # Bucket counts over a histogram.py layout; the layout travels with the
+    # counts, which are written sparse as varint (index gap, count) pairs
+    type_code = 5
+
+    def __init__(self, layout, counts=None):
+        self.layout = layout
+        self.counts = counts if counts is not None else array('q', bytes(8 * layout.num_buckets))
+
+    def update(self, value):
+        self.counts[self.layout.index(value)] += 1
+
+    def update_block(self, values, weights=None):
+        counts = self.counts
+        index = self.layout.index
+        if weights is None:
+            for value in values:
+                counts[index(value)] += 1
+        else:
+            for value, weight in zip(values, weights):
+                counts[index(value)] += weight
+
+    def merge(self, other):
+        self.check_type(other)
+        if other.layout.spec() != self.layout.spec():
+            raise ValueError("cannot merge histograms of different layouts")
+        counts = self.counts
+        for bucket_idx, count in enumerate(other.counts):
+            if count:
+                counts[bucket_idx] += count
+
+    def total(self):
+        return sum(self.counts)
+
+    def bucket_counts(self):
+        return {i: c for i, c in enumerate(self.counts) if c}
+
+    def payload(self):
+        out = bytearray(pack_text(self.layout.spec()))
+        previous = -1
+        for bucket_idx, count in enumerate(self.counts):
+            if count:
+                encode_varint(bucket_idx - previous - 1, out)
+                encode_varint(count, out)
+                previous = bucket_idx
+        return bytes(out)
+
+    @classmethod
+    def from_payload(cls, data):
+        spec, pos = unpack_text(data, 0)
+        histogram = cls(parse_layout(spec))
+        bucket_idx = -1
+        while pos < len(data):
+            gap, pos = decode_varint(data, pos)
+            count, pos = decode_varint(data, pos)
+            bucket_idx += gap + 1
+            histogram.counts[bucket_idx] = count
+        return histogram
+
+def merge_samples(samples_a, count_a, samples_b, count_b, capacity, rng):
+    # Uniform samples (without replacement) of two disjoint sets of count_a
+    # and count_b values -> a uniform sample of up to `capacity` values of the
+    # union: the share drawn from each side follows the hypergeometric law
+    take = min(capacity, count_a + count_b)
+    from_a = 0
+    remaining_a, remaining_b = count_a, count_b
+    for _ in range(take):
+        if rng.random() * (remaining_a + remaining_b) < remaining_a:
+            from_a += 1
+            remaining_a -= 1
+        else:
+            remaining_b -= 1
+    return rng.sample(samples_a, from_a) + rng.sample(samples_b, take - from_a)
+
+def weighted_sample(values, weights, size, rng):
+    # Uniform sample without replacement of the values repeated `weight`
+    # times each, drawn as positions in the expanded run
+    if size == 0:
+        return []
+    cumulative = list(accumulate(weights))
+    total = cumulative[-1]
+    return [values[bisect_right(cumulative, position)] for position in rng.sample(range(total), min(size, total))]
+
+@register
+class BucketStats(Histogram):
+    # Histogram that also keeps, per populated bucket, the exact min, max and
+    # sum of its values and a uniform reservoir of up to `capacity` of them,
+    # so any bucket can be validated at O(buckets x capacity) cost
+    type_code = 8
+
+    def __init__(self, layout, capacity, counts=None, rng=None):
+        super().__init__(layout, counts)
+        if rng is None:
+            import random
+            rng = random.Random()
+        self.capacity = capacity
+        self.rng = rng
+        self.stats = {}   # bucket: [count, min, max, sum, samples]
+
+    def update(self, value):
+        self.update_block((value,))
+
+    def update_block(self, values, weights=None):
+        # Sorted, the values of one bucket are one contiguous run (the layouts
+        # are monotonic), so the work per block is a C sort plus O(buckets)
+        if weights is None:
+            values = sorted(values)
+        else:
+            order = sorted(range(len(values)), key=values.__getitem__)
+            values = [values[i] for i in order]
+            weights = [weights[i] for i in order]
+        index = self.layout.index
+        last_bucket = self.layout.num_buckets - 1
+        n = len(values)
+        start = 0
+        while start < n:
+            bucket_idx = index(values[start])
+            if bucket_idx == last_bucket:
+                end = n
+            else:
+                end = bisect_left(values, self.layout.bucket_range(bucket_idx)[1], start)
+                # The edge arithmetic may disagree with index() by one value
+                while end < n and index(values[end]) == bucket_idx:
+                    end += 1
+                while end > start + 1 and index(values[end - 1]) != bucket_idx:
+                    end -= 1
+            run = values[start:end]
+            if weights is None:
+                self.add_bucket(bucket_idx, len(run), run[0], run[-1], math.fsum(run),
+                                self.rng.sample(run, min(self.capacity, len(run))))
+            else:
+                run_weights = weights[start:end]
+                self.add_bucket(bucket_idx, sum(run_weights), run[0], run[-1], math.fsum(map(mul, run, run_weights)),
+                                weighted_sample(run, run_weights, self.capacity, self.rng))
+            start = end
+
+    def add_bucket(self, bucket_idx, count, min_value, max_value, total, samples):
+        self.counts[bucket_idx] += count
+        bucket = self.stats.get(bucket_idx)
+        if bucket is None:
+            self.stats[bucket_idx] = [count, min_value, max_value, total, list(samples)]
+            return
+        bucket[4] = merge_samples(bucket[4], bucket[0], samples, count, self.capacity, self.rng)
+        bucket[0] += count
+        bucket[1] = min(bucket[1], min_value)
+        bucket[2] = max(bucket[2], max_value)
+        bucket[3] += total
+
+    def merge(self, other):
+        self.check_type(other)
+        if other.layout.spec() != self.layout.spec():
+            raise ValueError("cannot merge histograms of different layouts")
+        for bucket_idx, (count, min_value, max_value, total, samples) in other.stats.items():
+            self.add_bucket(bucket_idx, count, min_value, max_value, total, samples)
+
+    def bucket_summary(self, bucket_idx):
+        # {"count", "min", "max", "average", "samples"} of one bucket, or None
+        bucket = self.stats.get(bucket_idx)
+        if bucket is None:
+            return None
+        count, min_value, max_value, total, samples = bucket
+        return {"count": count, "min": min_value, "max": max_value, "average": total / count,
+                "samples": sorted(samples)}
+
+    def payload(self):
+        out = bytearray(pack_text(self.layout.spec()))
+        out += struct.pack('<H', self.capacity)
+        previous = -1
+        for bucket_idx in sorted(self.stats):
+            count, min_value, max_value, total, samples = self.stats[bucket_idx]
+            encode_varint(bucket_idx - previous - 1, out)
+            encode_varint(count, out)
+            encode_varint(len(samples), out)
+            out += struct.pack(f'<3d{len(samples)}d', min_value, max_value, total, *samples)
+            previous = bucket_idx
+        return bytes(out)
+
+    @classmethod
+    def from_payload(cls, data):
+        spec, pos = unpack_text(data, 0)
+        (capacity,) = struct.unpack_from('<H', data, pos)
+        pos += 2
+        aggregate = cls(parse_layout(spec), capacity)
+        bucket_idx = -1
+        while pos < len(data):
+            gap, pos = decode_varint(data, pos)
+            count, pos = decode_varint(data, pos)
+            num_samples, pos = decode_varint(data, pos)
+            values = struct.unpack_from(f'<3d{num_samples}d', data, pos)
+            pos += 8 * (3 + num_samples)
+            bucket_idx += gap + 1
+            aggregate.counts[bucket_idx] = count
+            aggregate.stats[bucket_idx] = [count, values[0], values[1], values[2], list(values[3:])]
+        return aggregate
+
+@register
+class Distinct(Aggregate):
+    # HyperLogLog sketch of distinct keys
+    type_code = 6
+
+    def __init__(self, precision=None, sketch=None):
+        if sketch is None:
+            from hyperloglog import DEFAULT_PRECISION, HyperLogLog
+            sketch = HyperLogLog(precision or DEFAULT_PRECISION)
+        self.sketch = sketch
+
+    def update(self, key):
+        self.sketch.add(key)
+
+    def update_block(self, keys):
+        for key in keys:
+            self.sketch.add(key)
+
+    def merge(self, other):
+        self.check_type(other)
+        self.sketch.merge(other.sketch)
+
+    def payload(self):
+        return bytes((self.sketch.precision,)) + zlib.compress(bytes(self.sketch.registers))
+
+    @classmethod
+    def from_payload(cls, data):
+        precision = data[0]
+        registers = zlib.decompress(data[1:])
+        if len(registers) != 1 << precision:
+            raise ValueError("register count does not match the precision")
+        from hyperloglog import HyperLogLog
+        return cls(precision, HyperLogLog(precision, registers))
+
+@register
+class FrequentItems(Aggregate):
+    # Space-Saving summary of frequent keys (topk.py)
+    type_code = 7
+
+    def __init__(self, capacity, summary=None):
+        if summary is None:
+            from topk import SpaceSaving
+            summary = SpaceSaving(capacity)
+        self.summary = summary
+
+    def update(self, key):
+        self.summary.add(key)
+
+    def update_block(self, keys):
+        for key in keys:
+            self.summary.add(key)
+
+    def merge(self, other):
+        self.check_type(other)
+        self.summary.merge(other.summary)
+
+    def payload(self):
+        return zlib.compress(json.dumps(self.summary.to_dict(), separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def from_payload(cls, data):
+        from topk import SpaceSaving
+        summary = SpaceSaving.from_dict(json.loads(zlib.decompress(data)))
+        return cls(summary.capacity, summary)
@@ -0,0 +1,68 @@
+import os
+import json
+import random
+import urllib.parse
+import urllib.request
+
+# Random access to the input as fixed-size byte blocks, from a local file or
+# over WebHDFS, for the jobs that sample blocks instead of scanning.
+# A row belongs to the block holding its first byte; each read fetches
+# MAX_LINE_BYTES extra so the last row of the block is complete.
+
+BLOCK_BYTES = 1024 * 1024
+MAX_LINE_BYTES = 64 * 1024
+
+def local_source(path):
+    size = os.path.getsize(path)
+
+    def read_range(offset, length):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+    return size, read_range
+
+def webhdfs_source(base_url, path, user):
+    # WebHDFS is enabled by default on EMR, so the master node can read
+    # arbitrary byte ranges without copying the file
+    url = f"{base_url.rstrip('/')}/webhdfs/v1{urllib.parse.quote(path)}"
+    with urllib.request.urlopen(f"{url}?op=GETFILESTATUS&user.name={user}") as response:
+        size = json.load(response)["FileStatus"]["length"]
+
+    def read_range(offset, length):
+        with urllib.request.urlopen(f"{url}?op=OPEN&offset={offset}&length={length}&user.name={user}") as response:
+            return response.read()
+    return size, read_range
+
+def webhdfs_list_status(base_url, path, user):
+    url = f"{base_url.rstrip('/')}/webhdfs/v1{urllib.parse.quote(path)}"
+    with urllib.request.urlopen(f"{url}?op=LISTSTATUS&user.name={user}") as response:
+        return json.load(response)["FileStatuses"]["FileStatus"]
+
+def open_source(path, webhdfs="", user="hadoop"):
+    if webhdfs:
+        return webhdfs_source(webhdfs, path, user)
+    return local_source(path)
+
+def shuffled_blocks(size, seed=None):
+    order = list(range(max(1, -(-size // BLOCK_BYTES))))
+    random.Random(seed).shuffle(order)
+    return order
+
+def block_lines(data, offset, block_bytes=BLOCK_BYTES):
+    # Drop the row that started in the previous block, keep rows starting in this one
+    start = 0
+    if offset > 0:
+        start = data.find(b'\n') + 1
+        if start == 0:
+            return []
+    end = data.find(b'\n', block_bytes + (1 if offset > 0 else 0) - 1)
+    end = len(data) if end < 0 else end + 1
+    return data[start:end].decode('utf-8', errors='replace').splitlines()
+
+def read_lines(read_range, offset, length):
+    # The rows starting inside [offset, offset + length)
+    read_offset = offset - 1 if offset > 0 else 0
+    return block_lines(read_range(read_offset, length + MAX_LINE_BYTES + 1), offset, length)
+
+def read_block(read_range, block_idx):
+    return read_lines(read_range, block_idx * BLOCK_BYTES, BLOCK_BYTES)
@@ -0,0 +1,167 @@
+import sys
+import math
+import struct
+import argparse
+from hashlib import blake2b
+
+# Scalable Bloom filter (Almeida et al. 2007) for the optional duplicate
+# suppression of the mappers. Keys go into a series of plain Bloom filters:
+# when one holds its capacity the next one starts, GROWTH times larger and
+# with its false-positive rate ERROR_RATIO times lower, so memory follows the
+# number of keys and the total false-positive rate stays below the
+# configured one however many keys arrive. Positions come from one 128-bit
+# hash with double hashing (Kirsch & Mitzenmacher).
+#
+# A filter can also be built ahead of time from one input and shipped to
+# every map task through the distributed cache (see records.row_dedup):
+#   hdfs dfs -cat national.csv | python3 bloom.py build --source /user/.../national.csv > national.bloom
+
+DEFAULT_FP_RATE = 0.001
+INITIAL_CAPACITY = 1 << 16
+GROWTH = 2
+ERROR_RATIO = 0.5
+MAGIC = b"EPABLOOM"
+VERSION = 1
+
+class BloomFilter:
+
+    def __init__(self, capacity, fp_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, math.ceil(math.log2(1 / fp_rate)))
+        self.bits = bytearray((self.num_bits + 7) // 8) if bits is None else bits
+        self.count = count
+
+    def positions(self, h1, h2):
+        # h1 + i*h2 (mod m), stepped without multiplications
+        m = self.num_bits
+        position, step = h1 % m, h2 % m
+        for _ in range(self.num_hashes):
+            yield position
+            position += step
+            if position >= m:
+                position -= m
+
+    def contains(self, h1, h2):
+        bits = self.bits
+        for position in self.positions(h1, h2):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, h1, h2):
+        bits = self.bits
+        for position in self.positions(h1, h2):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+def key_hashes(key):
+    digest = blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+class ScalableBloomFilter:
+
+    def __init__(self, fp_rate=DEFAULT_FP_RATE, initial_capacity=INITIAL_CAPACITY, source=""):
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"the false-positive rate must be between 0 and 1, got {fp_rate}")
+        self.fp_rate = fp_rate
+        self.initial_capacity = initial_capacity
+        self.source = source   # the input the filter was built from, if prebuilt
+        self.stages = []
+
+    def __len__(self):
+        return sum(stage.count for stage in self.stages)
+
+    def __contains__(self, key):
+        h1, h2 = key_hashes(key)
+        return any(stage.contains(h1, h2) for stage in self.stages)
+
+    def add(self, key):
+        # True when the key was (probably) seen before; it is added otherwise
+        h1, h2 = key_hashes(key)
+        for stage in self.stages:
+            if stage.contains(h1, h2):
+                return True
+        if not self.stages or self.stages[-1].count >= self.stages[-1].capacity:
+            # Rates p(1-r), p(1-r)r, p(1-r)r², ... sum to at most p
+            level = len(self.stages)
+            self.stages.append(BloomFilter(self.initial_capacity * GROWTH ** level,
+                                           self.fp_rate * (1 - ERROR_RATIO) * ERROR_RATIO ** level))
+        self.stages[-1].add(h1, h2)
+        return False
+
+    def size_bytes(self):
+        return sum(len(stage.bits) for stage in self.stages)
+
+    def to_bytes(self):
+        source = self.source.encode('utf-8')
+        out = bytearray(MAGIC)
+        out += struct.pack('<BdQH', VERSION, self.fp_rate, self.initial_capacity, len(source)) + source
+        out += struct.pack('<H', len(self.stages))
+        for stage in self.stages:
+            out += struct.pack('<QdQ', stage.capacity, stage.fp_rate, stage.count) + stage.bits
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a Bloom filter file")
+        pos = len(MAGIC)
+        version, fp_rate, initial_capacity, source_length = struct.unpack_from('<BdQH', data, pos)
+        if version != VERSION:
+            raise ValueError(f"unsupported Bloom filter version {version}")
+        pos += struct.calcsize('<BdQH')
+        source = data[pos:pos + source_length].decode('utf-8')
+        pos += source_length
+        (num_stages,) = struct.unpack_from('<H', data, pos)
+        pos += 2
+        bloom = cls(fp_rate, initial_capacity, source)
+        for _ in range(num_stages):
+            capacity, stage_fp_rate, count = struct.unpack_from('<QdQ', data, pos)
+            pos += struct.calcsize('<QdQ')
+            stage = BloomFilter(capacity, stage_fp_rate, count=count)
+            stage.bits = bytearray(data[pos:pos + len(stage.bits)])
+            pos += len(stage.bits)
+            bloom.stages.append(stage)
+        return bloom
+
+def load_filter(path):
+    with open(path, 'rb') as f:
+        return ScalableBloomFilter.from_bytes(f.read())
+
+def build(stream, fp_rate, source, initial_capacity=INITIAL_CAPACITY):
+    # Filter of the dedup keys of a CSV stream
+    from records import DEDUP_FIELDS, KEY_SEPARATOR, iter_row_blocks
+    bloom = ScalableBloomFilter(fp_rate, initial_capacity, source)
+    rows = duplicates = 0
+    for indexes, block in iter_row_blocks(stream, DEDUP_FIELDS):
+        for row in block:
+            try:
+                key = KEY_SEPARATOR.join(row[i].strip() for i in indexes)
+            except IndexError:
+                continue
+            rows += 1
+            duplicates += bloom.add(key)
+    return bloom, rows, duplicates
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a dedup Bloom filter of a CSV input (stdin)")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--fp-rate", type=float, default=DEFAULT_FP_RATE)
+    parser.add_argument("--capacity", type=int, default=INITIAL_CAPACITY, help="keys of the first stage")
+    parser.add_argument("--source", default="", help="HDFS path of the input, whose own map tasks skip the filter")
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args()
+    bloom, rows, duplicates = build(sys.stdin, args.fp_rate, args.source, args.capacity)
+    data = bloom.to_bytes()
+    if args.output == "-":
+        sys.stdout.buffer.write(data)
+    else:
+        with open(args.output, 'wb') as f:
+            f.write(data)
+    print(f"{rows} rows, {len(bloom)} keys, {duplicates} suspected duplicates, "
+          f"{len(data) / 1024 / 1024:.1f} MB, false-positive rate <= {args.fp_rate}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
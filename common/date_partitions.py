@@ -0,0 +1,42 @@
+import datetime
+
+# Year/month partitions of the raw data (year=2019/month=03) and the date
+# ranges that queries prune them with.
+#
+# Date range syntax, also used in the EPA_DATE_RANGE environment variable:
+#   2019-03-01,2019-05-31   (inclusive, either side may be left empty)
+
+UNDATED = "undated"   # rows without a valid date_local
+
+def parse_date(text):
+    return datetime.date.fromisoformat(text.strip()[:10])
+
+def partition_of(date_local):
+    date = parse_date(date_local)
+    return f"year={date.year:04d}/month={date.month:02d}"
+
+def parse_date_range(text):
+    start_text, _, end_text = text.partition(',')
+    start = parse_date(start_text) if start_text.strip() else datetime.date.min
+    end = parse_date(end_text) if end_text.strip() else datetime.date.max
+    if start > end:
+        raise ValueError("the date range starts after it ends")
+    return start, end
+
+def parse_manifest(text):
+    # PARTITION lines written by the partitioning reducer:
+    #   PARTITION  partition  rows  min_date  max_date  path
+    partitions = []
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if parts[0] != "PARTITION" or len(parts) != 6:
+            continue
+        try:
+            dates = (parse_date(parts[3]), parse_date(parts[4]))
+        except ValueError:
+            dates = None   # no span, as for the undated rows
+        partitions.append({"partition": parts[1], "rows": int(parts[2]), "dates": dates, "path": parts[5]})
+    return partitions
+
+def select_partitions(partitions, start, end):
+    return [p for p in partitions if p["dates"] is not None and p["dates"][0] <= end and p["dates"][1] >= start]
@@ -0,0 +1,203 @@
+import sys
+import csv
+import math
+import cmath
+import argparse
+
+from histogram import parse_layout, value_at_rank
+
+# Distribution views from the merged histograms of the histogram jobs
+# (median, 90th percentile, MAD/IQR), which every result record keeps as
+# state: {"histogram": {"layout": spec, "counts": {bucket: count}}}. A few KB
+# of state stand in for the raw rows, so plots and density estimates need no
+# second pass over the data.
+#
+# Exports: a columnar CSV table of the populated buckets (lower, upper,
+# count, density), the density curve, or the histograms as Hadoop typed
+# bytes pairs (column, serialized aggregates.Histogram) that wire.read_pairs
+# and aggregates.decode read back.
+#
+# The kernel density estimate is binned: the bucket counts are spread
+# uniformly over an even grid fine enough for the bandwidth, and the grid is
+# convolved with a Gaussian kernel through a radix-2 FFT, so the cost follows
+# the grid size and not the number of rows.
+
+GRID_SIZE = 512          # grid points at least
+MAX_GRID_SIZE = 1 << 14
+POINTS_PER_BANDWIDTH = 4
+KERNEL_REACH = 4.0       # bandwidths on each side of a grid point
+IQR_SIGMA = 1.34         # interquartile range of a unit normal
+
+def record_histograms(record):
+    # {column: (layout, {bucket: count})} of a result record
+    histograms = {}
+    for column, state in record.get("state", {}).items():
+        histogram = state.get("histogram") if isinstance(state, dict) else None
+        if histogram and histogram.get("counts"):
+            histograms[column] = (parse_layout(histogram["layout"]),
+                                  {int(i): c for i, c in histogram["counts"].items()})
+    return histograms
+
+def distribution_table(layout, bucket_counts):
+    # Columnar: lists of lower edge, upper edge, count and density per
+    # populated bucket; the densities integrate to one
+    total = sum(bucket_counts.values())
+    table = {"lower": [], "upper": [], "count": [], "density": []}
+    for bucket_idx in sorted(bucket_counts):
+        lower, upper = layout.bucket_range(bucket_idx)
+        count = bucket_counts[bucket_idx]
+        table["lower"].append(lower)
+        table["upper"].append(upper)
+        table["count"].append(count)
+        table["density"].append(count / (total * (upper - lower)) if upper > lower else 0.0)
+    return table
+
+def fft(values, inverse=False):
+    # Iterative radix-2 Cooley-Tukey; len(values) must be a power of two
+    n = len(values)
+    a = [complex(v) for v in values]
+    j = 0
+    for i in range(1, n):
+        bit = n >> 1
+        while j & bit:
+            j ^= bit
+            bit >>= 1
+        j |= bit
+        if i < j:
+            a[i], a[j] = a[j], a[i]
+    sign = 1 if inverse else -1
+    size = 2
+    while size <= n:
+        half = size // 2
+        twiddles = [cmath.exp(sign * 2j * math.pi * k / size) for k in range(half)]
+        for start in range(0, n, size):
+            for k in range(half):
+                even = a[start + k]
+                odd = a[start + k + half] * twiddles[k]
+                a[start + k] = even + odd
+                a[start + k + half] = even - odd
+        size *= 2
+    if inverse:
+        a = [v / n for v in a]
+    return a
+
+def next_power_of_two(n):
+    return 1 << max(0, (n - 1).bit_length())
+
+def silverman_bandwidth(layout, bucket_counts):
+    # 0.9 min(sd, IQR / 1.34) n^(-1/5), from bucket midpoints and
+    # interpolated quartiles
+    total = sum(bucket_counts.values())
+    if total < 2:
+        return None
+    mean = variance = 0.0
+    for bucket_idx, count in bucket_counts.items():
+        lower, upper = layout.bucket_range(bucket_idx)
+        mean += count * (lower + upper) / 2
+    mean /= total
+    for bucket_idx, count in bucket_counts.items():
+        lower, upper = layout.bucket_range(bucket_idx)
+        variance += count * (((lower + upper) / 2 - mean) ** 2 + (upper - lower) ** 2 / 12)
+    sd = math.sqrt(variance / (total - 1))
+    counts = [bucket_counts.get(i, 0) for i in range(max(bucket_counts) + 1)]
+    iqr = value_at_rank(counts, total * 0.75, layout) - value_at_rank(counts, total * 0.25, layout)
+    spread = min(sd, iqr / IQR_SIGMA) if iqr > 0 else sd
+    return 0.9 * spread * total ** -0.2 if spread > 0 else None
+
+def binned_kde(layout, bucket_counts, bandwidth=None, grid_size=GRID_SIZE):
+    # (grid, density, bandwidth): a Gaussian kernel density estimate on an
+    # even grid over the populated buckets, padded by the kernel reach
+    total = sum(bucket_counts.values())
+    if not total:
+        return [], [], bandwidth
+    bandwidth = bandwidth or silverman_bandwidth(layout, bucket_counts)
+    ranges = {i: layout.bucket_range(i) for i in bucket_counts}
+    low = min(lower for lower, _ in ranges.values())
+    high = max(upper for _, upper in ranges.values())
+    if not bandwidth:
+        bandwidth = (high - low) / grid_size or 1.0
+    start = low - KERNEL_REACH * bandwidth
+    stop = high + KERNEL_REACH * bandwidth
+    points = min(MAX_GRID_SIZE, next_power_of_two(max(grid_size, math.ceil((stop - start) / bandwidth * POINTS_PER_BANDWIDTH))))
+    step = (stop - start) / (points - 1)
+
+    # Each bucket's count spread uniformly over the grid cells it overlaps
+    mass = [0.0] * points
+    for bucket_idx, count in bucket_counts.items():
+        lower, upper = ranges[bucket_idx]
+        if upper <= lower:
+            continue
+        first = max(0, int((lower - start) / step + 0.5))
+        last = min(points - 1, int((upper - start) / step + 0.5))
+        per_unit = count / (upper - lower)
+        for cell in range(first, last + 1):
+            cell_low = max(lower, start + (cell - 0.5) * step)
+            cell_high = min(upper, start + (cell + 0.5) * step)
+            if cell_high > cell_low:
+                mass[cell] += per_unit * (cell_high - cell_low)
+
+    # Linear convolution: the padded length keeps the kernel from wrapping
+    reach = min(points - 1, math.ceil(KERNEL_REACH * bandwidth / step))
+    size = next_power_of_two(points + 2 * reach)
+    kernel = [0.0] * size
+    norm = 1.0 / (math.sqrt(2 * math.pi) * bandwidth * total)
+    for offset in range(-reach, reach + 1):
+        kernel[offset % size] = norm * math.exp(-0.5 * (offset * step / bandwidth) ** 2)
+    smoothed = fft([a * b for a, b in zip(fft(mass + [0.0] * (size - points)), fft(kernel))], inverse=True)
+    grid = [start + i * step for i in range(points)]
+    return grid, [max(0.0, value.real) for value in smoothed[:points]], bandwidth
+
+def write_table_csv(stream, histograms):
+    writer = csv.writer(stream)
+    writer.writerow(["column", "lower", "upper", "count", "density"])
+    for column, (layout, bucket_counts) in histograms.items():
+        table = distribution_table(layout, bucket_counts)
+        for row in zip(table["lower"], table["upper"], table["count"], table["density"]):
+            writer.writerow([column, *(repr(v) for v in row)])
+
+def write_kde_csv(stream, histograms, bandwidth=None):
+    writer = csv.writer(stream)
+    writer.writerow(["column", "value", "density", "bandwidth"])
+    for column, (layout, bucket_counts) in histograms.items():
+        grid, density, used = binned_kde(layout, bucket_counts, bandwidth)
+        for x, y in zip(grid, density):
+            writer.writerow([column, repr(x), repr(y), repr(used)])
+
+def typed_bytes_histograms(histograms):
+    # The histograms as (column, aggregate bytes) typed bytes pairs
+    from array import array
+    from aggregates import Histogram
+    from wire import encode_pair
+    out = bytearray()
+    for column, (layout, bucket_counts) in histograms.items():
+        counts = array('q', bytes(8 * layout.num_buckets))
+        for bucket_idx, count in bucket_counts.items():
+            counts[bucket_idx] = count
+        out += encode_pair(column, Histogram(layout, counts).to_bytes())
+    return bytes(out)
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribution export and kernel density from a histogram job's output")
+    parser.add_argument("output", help="job output with a RESULT_JSON line ('-' for stdin)")
+    parser.add_argument("--column", action="append", help="only these columns (repeatable)")
+    parser.add_argument("--format", choices=["table", "kde", "typedbytes"], default="table")
+    parser.add_argument("--bandwidth", type=float, help="kernel bandwidth (default: Silverman's rule)")
+    args = parser.parse_args()
+    from job_output import load_record
+    text = sys.stdin.read() if args.output == "-" else open(args.output).read()
+    record = load_record(text)
+    histograms = record_histograms(record) if record else {}
+    if args.column:
+        histograms = {c: h for c, h in histograms.items() if c in args.column}
+    if not histograms:
+        print("ERROR: no histogram state in the output", file=sys.stderr)
+        sys.exit(1)
+    if args.format == "typedbytes":
+        sys.stdout.buffer.write(typed_bytes_histograms(histograms))
+    elif args.format == "kde":
+        write_kde_csv(sys.stdout, histograms, args.bandwidth)
+    else:
+        write_table_csv(sys.stdout, histograms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+
+# Single entry point for every streaming task:
+#   python3 epa_jobs.pyz <job> map|reduce|combine [args...]
+# The archive (see job_archive.py) holds this module as __main__ next to the
+# shared modules and all job scripts, so a job ships as one file. Only the
+# script of the requested phase is imported, nothing else is loaded up front.
+
+JOBS = {
+    # job: {phase: (module, extra arguments)}
+    "std_dev": {"map": ("stddev_welford_mapper", []), "reduce": ("stddev_welford_reducer", [])},
+    "skewness": {"map": ("skewness_stats_mapper", []), "reduce": ("skewness_stats_reducer", [])},
+    "median": {"map": ("median_histogram_mapper", []), "reduce": ("median_histogram_reducer", [])},
+    "percentile_90": {"map": ("percentile_90_mapper", []), "reduce": ("percentile_90_reducer", [])},
+    "mad_iqr": {"map": ("mad_iqr_mapper", []), "reduce": ("mad_iqr_reducer", [])},
+    "min_max": {"map": ("min_max_finder_mapper", []), "reduce": ("min_max_finder_reducer", [])},
+    "normalize": {"map": ("min_max_normalizer_mapper", [])},
+    "covariance": {"map": ("covariance_mapper", []), "reduce": ("covariance_reducer", [])},
+    "distinct": {"map": ("hll_distinct_mapper", []), "reduce": ("hll_distinct_reducer", [])},
+    "top_k": {"map": ("top_k_mapper", []), "reduce": ("top_k_reducer", []),
+              "combine": ("top_k_reducer", ["--combine"])},
+    "anomaly": {"map": ("anomaly_mapper", []), "reduce": ("anomaly_reducer", [])},
+    "spatial_layout": {"map": ("spatial_tile_mapper", []), "reduce": ("spatial_tile_reducer", [])},
+    "date_partitioning": {"map": ("date_partition_mapper", []), "reduce": ("date_partition_reducer", [])},
+}
+
+# Statistic jobs: their mappers write aggregates.py partials through
+# wire.RecordWriter, so they can run as comparisons of several datasets
+# (records.input_source) and exchange typed bytes
+AGGREGATE_JOBS = ("std_dev", "skewness", "median", "percentile_90", "mad_iqr", "min_max", "covariance", "distinct")
+# The jobs that can exchange typed bytes (wire.py); the other jobs always
+# exchange text lines
+TYPED_BYTES_JOBS = AGGREGATE_JOBS
+# Jobs whose map output is one line per input row (execution_planner.py
+# keeps them off the in-memory local runner beyond small inputs)
+ROW_OUTPUT_JOBS = ("anomaly", "spatial_layout", "date_partitioning")
+# Jobs whose reducers write their rows to files of their own
+# (partition_writer.py), one set per reduce task
+LAYOUT_JOBS = ("spatial_layout", "date_partitioning")
+
+def script_subcommand(script_name):
+    # "stddev_welford_mapper.py" -> "std_dev map"
+    module = script_name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    for job, phases in JOBS.items():
+        for phase, (phase_module, extra_args) in phases.items():
+            if phase_module == module and not extra_args:
+                return f"{job} {phase}"
+    return None
+
+def usage():
+    jobs = ', '.join(sorted(JOBS))
+    print(f"usage: epa_jobs.pyz <job> map|reduce|combine [args...]\njobs: {jobs}", file=sys.stderr)
+    sys.exit(2)
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    if len(argv) < 3 or argv[1] not in JOBS or argv[2] not in JOBS[argv[1]]:
+        usage()
+    module, extra_args = JOBS[argv[1]][argv[2]]
+    # runpy is already loaded by the interpreter when it runs the archive
+    import runpy
+    sys.argv = [module + ".py"] + argv[3:] + extra_args
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import math
+
+# Histogram bucket layouts shared by the histogram based jobs. Mappers and
+# reducers agree on a layout through its spec string, which is passed to the
+# mappers as an argument and echoed in their output (LAYOUT lines):
+#   linear:MIN:MAX:BUCKETS   equal width buckets between MIN and MAX
+#   log:LOWEST:HIGHEST:SUB   log-linear (HDR style) buckets: every power of two
+#                            above LOWEST is split into SUB equal buckets, so no
+#                            bucket is wider than 1/SUB of its lower edge; bucket
+#                            0 holds [0, LOWEST)
+# Values outside the range are counted in the first or the last bucket.
+# Column layouts are written as one spec for all columns or as
+# column=spec pairs joined with ';'.
+
+MIN_VALUE = 0.0
+MAX_VALUE = 500.0
+NUM_BUCKETS = 1000
+DEFAULT_SUB_BUCKETS = 64      # 1.6% relative bucket width
+RELATIVE_FLOOR = 1e-4         # lowest log bucket edge, relative to the maximum
+SAMPLE_MARGIN = 4.0           # two octaves of room above a sampled maximum
+
+class LinearLayout:
+    kind = "linear"
+
+    def __init__(self, min_value=MIN_VALUE, max_value=MAX_VALUE, num_buckets=NUM_BUCKETS):
+        if not max_value > min_value or num_buckets < 1:
+            raise ValueError("a linear layout needs max > min and at least one bucket")
+        self.min_value = min_value
+        self.max_value = max_value
+        self.num_buckets = num_buckets
+        self.width = (max_value - min_value) / num_buckets
+
+    def index(self, value):
+        if value <= self.min_value:
+            return 0
+        if value >= self.max_value:
+            return self.num_buckets - 1
+        return min(int((value - self.min_value) / self.width), self.num_buckets - 1)
+
+    def bucket_range(self, bucket_idx):
+        bucket_start = self.min_value + bucket_idx * self.width
+        return bucket_start, bucket_start + self.width
+
+    def spec(self):
+        return f"linear:{self.min_value!r}:{self.max_value!r}:{self.num_buckets}"
+
+class LogLinearLayout:
+    kind = "log"
+
+    def __init__(self, lowest, highest, sub_buckets=DEFAULT_SUB_BUCKETS):
+        if not 0 < lowest < highest or sub_buckets < 1:
+            raise ValueError("a log layout needs 0 < lowest < highest and at least one sub-bucket")
+        self.lowest = lowest
+        self.highest = highest
+        self.sub_buckets = sub_buckets
+        self.octaves = max(1, math.ceil(math.log2(highest / lowest)))
+        self.num_buckets = 1 + self.octaves * sub_buckets
+
+    def index(self, value):
+        if value < self.lowest:
+            return 0
+        # value / lowest = mantissa * 2**exponent with 0.5 <= mantissa < 1
+        mantissa, exponent = math.frexp(value / self.lowest)
+        octave = exponent - 1
+        if octave >= self.octaves:
+            return self.num_buckets - 1
+        return 1 + octave * self.sub_buckets + int((2 * mantissa - 1) * self.sub_buckets)
+
+    def bucket_range(self, bucket_idx):
+        if bucket_idx == 0:
+            return 0.0, self.lowest
+        octave, sub_bucket = divmod(bucket_idx - 1, self.sub_buckets)
+        base = self.lowest * 2.0 ** octave
+        return (base * (1 + sub_bucket / self.sub_buckets),
+                base * (1 + (sub_bucket + 1) / self.sub_buckets))
+
+    def spec(self):
+        return f"log:{self.lowest!r}:{self.highest!r}:{self.sub_buckets}"
+
+LAYOUT_KINDS = {LinearLayout.kind: LinearLayout, LogLinearLayout.kind: LogLinearLayout}
+DEFAULT_LAYOUT = LinearLayout()
+
+def parse_layout(spec):
+    kind, *params = spec.strip().split(':')
+    if kind not in LAYOUT_KINDS or len(params) != 3:
+        raise ValueError(f"invalid histogram layout '{spec}'")
+    return LAYOUT_KINDS[kind](float(params[0]), float(params[1]), int(params[2]))
+
+def parse_column_layouts(arg, columns):
+    layouts = dict.fromkeys(columns, DEFAULT_LAYOUT)
+    for item in arg.split(';'):
+        if not item.strip():
+            continue
+        column, sep, spec = item.rpartition('=')
+        layout = parse_layout(spec)
+        for name in ([column.strip()] if sep else columns):
+            if name in layouts:
+                layouts[name] = layout
+    return layouts
+
+def format_column_layouts(layouts):
+    return ';'.join(f"{column}={layout.spec()}" for column, layout in layouts.items())
+
+def range_layout(low, high, sub_buckets=DEFAULT_SUB_BUCKETS):
+    # Non-negative data gets log-linear buckets from the power of ten below
+    # the smallest positive value (but no lower than RELATIVE_FLOOR * high),
+    # so low concentrations keep the same relative resolution as high ones
+    if high <= 0 or high <= low:
+        return DEFAULT_LAYOUT
+    if low < 0:
+        return LinearLayout(low, high, NUM_BUCKETS)
+    lowest = 10.0 ** math.floor(math.log10(max(low, high * RELATIVE_FLOOR)))
+    return LogLinearLayout(lowest, max(high, 2 * lowest), sub_buckets)
+
+def sample_layout(values, margin=SAMPLE_MARGIN):
+    # Layout from a sample: the sample may have missed the extremes, so the
+    # range is widened by `margin`
+    if not values:
+        return None
+    low, high = min(values), max(values)
+    if low == 0:
+        low = min((v for v in values if v > 0), default=0.0)
+    return range_layout(low * margin if low < 0 else low, high * margin if high > 0 else high)
+
+def parse_layout_lines(text):
+    # LAYOUT  column  spec  [...]
+    layouts = {}
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if len(parts) >= 3 and parts[0] == "LAYOUT":
+            layouts[parts[1]] = parse_layout(parts[2])
+    return layouts
+
+def value_at_rank(counts, rank, layout=DEFAULT_LAYOUT):
+    # Linear interpolation inside the bucket holding the rank-th value
+    cumulative = 0
+    for bucket_idx, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            bucket_start, bucket_end = layout.bucket_range(bucket_idx)
+            fraction = (rank - cumulative) / count
+            return bucket_start + max(0.0, min(1.0, fraction)) * (bucket_end - bucket_start)
+        cumulative += count
+    return None
+
+def populated_window(bucket_counts, center_idx, size):
+    # Up to `size` populated bucket indexes around center_idx, for the reports
+    populated = sorted(bucket_counts)
+    if center_idx is None:
+        return populated[:size]
+    position = sum(1 for idx in populated if idx < center_idx)
+    start = max(0, min(position - size // 2, len(populated) - size))
+    return populated[start:start + size]
+
+def encode_sparse(counts):
+    return ','.join(f"{i}:{c}" for i, c in enumerate(counts) if c)
+
+def decode_sparse(text, counts):
+    if not text:
+        return
+    for item in text.split(','):
+        bucket_idx, count = item.split(':')
+        counts[int(bucket_idx)] += int(count)
@@ -0,0 +1,71 @@
+import os
+import sys
+import zipfile
+import argparse
+import tempfile
+import py_compile
+
+# Packs the entry module (epa_job.py, as __main__), the shared modules and
+# the job scripts of the given directories into one executable zip archive:
+#   python3 job_archive.py --compile --output epa_jobs.pyz dir [dir...]
+# With --compile every module is stored as unchecked-hash bytecode next to its
+# source, so tasks skip compiling. Bytecode is specific to the Python version,
+# so compile with the interpreter the cluster nodes run (the GUI builds the
+# archive on the EMR master).
+# Every module sits at the archive root, which is on sys.path when the archive
+# runs, so the scripts import the shared modules without any path setup.
+
+ARCHIVE_NAME = "epa_jobs.pyz"
+MAIN_MODULE = "from epa_job import main\nmain()\n"
+
+def collect_sources(directories):
+    sources = {}
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py') and name not in sources:
+                sources[name] = os.path.join(directory, name)
+    sources['__main__.py'] = None
+    return sources
+
+def compiled_bytes(name, source_text, work_dir):
+    source_path = os.path.join(work_dir, name)
+    with open(source_path, 'w', encoding='utf-8') as f:
+        f.write(source_text)
+    # The archive path keeps tracebacks readable, the hash keeps zipimport
+    # from comparing it with the zip entry timestamps
+    cfile = py_compile.compile(source_path, cfile=source_path + 'c', dfile=name, doraise=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    with open(cfile, 'rb') as f:
+        return f.read()
+
+def build_archive(directories, output, compile_bytecode=False):
+    sources = collect_sources(directories)
+    output_dir = os.path.dirname(os.path.abspath(output))
+    fd, temp_output = tempfile.mkstemp(dir=output_dir, suffix='.pyz')
+    os.close(fd)
+    try:
+        with tempfile.TemporaryDirectory() as work_dir, \
+                zipfile.ZipFile(temp_output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, path in sources.items():
+                if path is None:
+                    source_text = MAIN_MODULE
+                else:
+                    with open(path, encoding='utf-8') as f:
+                        source_text = f.read()
+                archive.writestr(name, source_text)
+                if compile_bytecode:
+                    archive.writestr(name + 'c', compiled_bytes(name, source_text, work_dir))
+        os.replace(temp_output, output)
+    except BaseException:
+        os.unlink(temp_output)
+        raise
+    return sorted(sources)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the single-file job archive")
+    parser.add_argument("directories", nargs="*", default=["."])
+    parser.add_argument("--output", default=ARCHIVE_NAME)
+    parser.add_argument("--compile", action="store_true", help="store bytecode for this Python version")
+    args = parser.parse_args()
+    modules = build_archive(args.directories, args.output, args.compile)
+    print(f"{args.output}: {len(modules)} modules{' with bytecode' if args.compile else ''}", file=sys.stderr)
@@ -0,0 +1,153 @@
+import sys
+import json
+import time
+
+from records import split_source
+from wire import RecordWriter
+
+# Machine readable job results. Mappers report their row/skip counts and run
+# time in a TASK_META line; reducers fold those into a result record that also
+# carries the statistics and the merged internal state (moments, histograms)
+# and print it as the last line of their output:
+#   RESULT_JSON\t{"schema_version": 1, "job": ..., "results": {...}, ...}
+# The human readable report is rendered from the same record. In a
+# comparison run results are keyed source::key and the report ends with the
+# results of every source side by side.
+
+SCHEMA_VERSION = 1
+RECORD_KEY = "RESULT_JSON"
+TASK_META_KEY = "TASK_META"
+
+class TaskCounters:
+
+    def __init__(self, columns):
+        self.started = time.time()
+        self.rows = 0
+        self.valid = dict.fromkeys(columns, 0)
+        self.dedup = None   # a records.RowDedup when EPA_DEDUP is set
+        self.weight = None  # the EPA_WEIGHT column of a weighted job
+
+    def add_block(self, num_rows, columns, blocks):
+        self.rows += num_rows
+        for column, values in zip(columns, blocks):
+            self.valid[column] += len(values)
+
+    def emit(self, writer=None):
+        meta = {
+            "rows": self.rows,
+            "valid": self.valid,
+            "seconds": round(time.time() - self.started, 6),
+        }
+        if self.dedup is not None:
+            meta["duplicates"] = self.dedup.dropped
+            meta["dedup_fp_rate"] = self.dedup.fp_rate
+        if self.weight:
+            meta["weight"] = self.weight
+        writer = writer or RecordWriter()
+        if writer.source:
+            meta["source"] = writer.source
+        writer.write(TASK_META_KEY, json.dumps(meta, separators=(',', ':')))
+
+def new_record(job):
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "job": job,
+        "results": {},
+        "state": {},
+        "counts": {"map_tasks": 0, "rows": 0, "valid": {}, "skipped": {}},
+        "timings": {"map_seconds_total": 0.0, "map_seconds_max": 0.0, "reduce_started": time.time()},
+    }
+
+def merge_task_meta(record, meta_json):
+    meta = json.loads(meta_json)
+    counts = record["counts"]
+    timings = record["timings"]
+    counts["map_tasks"] += 1
+    counts["rows"] += meta.get("rows", 0)
+    for column, valid in meta.get("valid", {}).items():
+        counts["valid"][column] = counts["valid"].get(column, 0) + valid
+    if "duplicates" in meta:
+        counts["duplicates"] = counts.get("duplicates", 0) + meta["duplicates"]
+        counts["dedup_fp_rate"] = max(counts.get("dedup_fp_rate", 0.0), meta["dedup_fp_rate"])
+    if "weight" in meta:
+        counts["weight"] = meta["weight"]
+    if "source" in meta:
+        sources = counts.setdefault("sources", {})
+        sources[meta["source"]] = sources.get(meta["source"], 0) + meta.get("rows", 0)
+    timings["map_seconds_total"] += meta.get("seconds", 0.0)
+    timings["map_seconds_max"] = max(timings["map_seconds_max"], meta.get("seconds", 0.0))
+
+def finish_record(record):
+    counts = record["counts"]
+    counts["skipped"] = {column: counts["rows"] - valid for column, valid in counts["valid"].items()}
+    timings = record["timings"]
+    timings["reduce_seconds"] = round(time.time() - timings.pop("reduce_started"), 6)
+    return record
+
+def emit_record(record, stream=None):
+    print(f"{RECORD_KEY}\t{json.dumps(record, separators=(',', ':'))}", file=stream or sys.stdout)
+
+def print_counts(record):
+    counts = record["counts"]
+    if counts["map_tasks"]:
+        print(f"\nRows read: {counts['rows']} in {counts['map_tasks']} map task(s)")
+        for column, skipped in counts["skipped"].items():
+            print(f"Skipped rows ({column}): {skipped}")
+        if "duplicates" in counts:
+            print(f"Suspected duplicates dropped (site, date): {counts['duplicates']} "
+                  f"(false-positive rate <= {counts['dedup_fp_rate']:g} per row)")
+        if "weight" in counts:
+            print(f"Weighted by {counts['weight']}: each row counts {counts['weight']} times "
+                  f"in the statistics and the record totals")
+        for source, rows in counts.get("sources", {}).items():
+            print(f"Rows read from {source}: {rows}")
+
+def comparison_table(record):
+    # {key: {source: result}} of a comparison run, {} otherwise
+    table = {}
+    for result_key, result in record["results"].items():
+        source, key = split_source(result_key)
+        if source is not None:
+            table.setdefault(key, {})[source] = result
+    return table
+
+def print_comparison(record, width=16):
+    # The scalar results of every key, one column per source
+    table = comparison_table(record)
+    if not table:
+        return
+    print("\n=== Comparison by Source ===")
+    for key, by_source in table.items():
+        sources = list(by_source)
+        fields = [name for result in by_source.values() for name, value in result.items()
+                  if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        fields = list(dict.fromkeys(fields))
+        label_width = max([len(field) for field in fields] + [len(key)]) + 2
+        print(f"\n{key:<{label_width}}" + "".join(f"{source[:width - 1]:>{width}}" for source in sources))
+        for field in fields:
+            cells = []
+            for source in sources:
+                value = by_source[source].get(field)
+                cells.append(f"{value:>{width}.6g}" if isinstance(value, (int, float)) else f"{'-':>{width}}")
+            print(f"{field:<{label_width}}" + "".join(cells))
+
+def split_output(text):
+    # Separates the structured records from the human readable report
+    records = []
+    report_lines = []
+    for line in text.splitlines():
+        if line.startswith(RECORD_KEY + "\t"):
+            try:
+                records.append(json.loads(line.split("\t", 1)[1]))
+                continue
+            except ValueError:
+                pass
+        report_lines.append(line)
+    return records, "\n".join(report_lines)
+
+def load_record(text, job=None):
+    records, _ = split_output(text)
+    for record in reversed(records):
+        if job is None or record.get("job") == job:
+            return record
+    return None
@@ -0,0 +1,120 @@
+import sys
+import io
+import os
+import shlex
+import runpy
+import argparse
+import subprocess
+
+from records import INPUT_FILE_ENVS
+from wire import TEXT, TYPED_BYTES, encode_value, read_pairs, wire_format
+
+# Runs a streaming mapper/reducer pair in-process, without YARN:
+#   hdfs dfs -cat input.csv | python3 local_runner.py --mapper './m.py cols' --reducer './r.py'
+# The mapper reads stdin directly, its output is sorted by key like the
+# shuffle would do and fed to the reducer, whose output goes to stdout.
+# With EPA_WIRE=typedbytes the map output is typed bytes pairs, sorted by the
+# bytes of their keys like Hadoop's typed bytes shuffle (see wire.py).
+# With --input (repeatable) the runner reads the inputs itself, one mapper
+# run per input with mapreduce_map_input_file set as streaming sets it per
+# map task, so comparison runs (EPA_SOURCES) tag their records the same way.
+# --key-fields N sorts text map output on its first N fields, as
+# stream.num.map.output.key.fields does (the anomaly job's secondary sort).
+# Meant for inputs small enough that the job's intermediate output fits in
+# memory; the execution planner only routes such inputs here.
+
+def run_script(command, stdin, stdout):
+    argv = shlex.split(command)
+    if argv and argv[0] in ("python", "python3"):
+        argv = argv[1:]
+    script = argv[0]
+    if script.startswith("./"):
+        script = script[2:]
+    saved = sys.stdin, sys.stdout, sys.argv
+    sys.stdin, sys.stdout, sys.argv = stdin, stdout, [script] + argv[1:]
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    finally:
+        sys.stdin, sys.stdout, sys.argv = saved
+
+def shuffle(map_output, key_fields=1):
+    lines = map_output.splitlines(keepends=True)
+    lines.sort(key=lambda line: line.rstrip('\n').split('\t', key_fields)[:key_fields])
+    return "".join(lines)
+
+def shuffle_typed(map_output):
+    pairs = [(bytes(encode_value(key, bytearray())), value) for key, value in read_pairs(io.BytesIO(map_output))]
+    pairs.sort(key=lambda pair: pair[0])
+    return b"".join(key + encode_value(value, bytearray()) for key, value in pairs)
+
+def binary_text_stream(data=b""):
+    # A text stream with a .buffer, as sys.stdin/sys.stdout have
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', write_through=True)
+
+def open_input(path):
+    # A local file, or an HDFS file or directory through hdfs dfs -cat
+    if os.path.exists(path):
+        return open(path, encoding='utf-8', newline=''), None
+    is_dir = subprocess.run(['hdfs', 'dfs', '-test', '-d', path]).returncode == 0
+    process = subprocess.Popen(['hdfs', 'dfs', '-cat', f"{path.rstrip('/')}/*" if is_dir else path],
+                               stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    return process.stdout, process
+
+def run_mappers(mapper_command, stdin, stdout, inputs):
+    if not inputs:
+        run_script(mapper_command, stdin, stdout)
+        return
+    saved = {name: os.environ.get(name) for name in INPUT_FILE_ENVS}
+    try:
+        for path in inputs:
+            for name in INPUT_FILE_ENVS:
+                os.environ[name] = path
+            stream, process = open_input(path)
+            try:
+                run_script(mapper_command, stream, stdout)
+            finally:
+                stream.close()
+                if process is not None and process.wait() != 0:
+                    raise RuntimeError(f"could not read {path}")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def run_job(mapper_command, reducer_command, stdin, stdout, wire=TEXT, inputs=None, key_fields=1):
+    if not reducer_command:
+        run_mappers(mapper_command, stdin, stdout, inputs)
+        return
+    if wire == TYPED_BYTES:
+        map_output = binary_text_stream()
+        run_mappers(mapper_command, stdin, map_output, inputs)
+        map_output.flush()
+        reduce_input = binary_text_stream(shuffle_typed(map_output.buffer.getvalue()))
+    else:
+        map_output = io.StringIO()
+        run_mappers(mapper_command, stdin, map_output, inputs)
+        reduce_input = io.StringIO(shuffle(map_output.getvalue(), key_fields))
+    run_script(reducer_command, reduce_input, stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a streaming job in-process")
+    parser.add_argument("--mapper", required=True)
+    parser.add_argument("--reducer", default="")
+    parser.add_argument("--input", action="append", default=[], help="read this input instead of stdin (repeatable)")
+    parser.add_argument("--key-fields", type=int, default=1, help="leading tab separated fields of the sort key")
+    parser.add_argument("--workdir", default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args()
+    os.chdir(args.workdir)
+    # The job scripts import the shared modules from the task directory (flat
+    # on the EMR master) or from common/ next to this runner in the repository
+    sys.path[:0] = [os.getcwd(), os.path.dirname(os.path.abspath(__file__))]
+    run_job(args.mapper, args.reducer, sys.stdin, sys.stdout, wire_format(), args.input, args.key_fields)
+    sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
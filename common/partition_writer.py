@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from collections import OrderedDict
+
+# Writes rows into one file per partition (a tile, a year/month, ...) below
+# an output root:   {root}/{partition}/part-{task:05d}.csv
+# On HDFS the files are staged below the task's working directory (on a
+# cluster the NodeManager local directories, sized for task data, rather
+# than /tmp) and uploaded with a single `hdfs dfs -put` when the writer is
+# closed. The file names carry the reduce task number, so several reducers
+# write side by side; the layout jobs run without speculative reducers, and
+# a retried attempt overwrites its task's files with the same rows. Partitions that
+# arrive grouped (sorted reducer input) keep one file open at a time; at most
+# MAX_OPEN_FILES stay open otherwise.
+
+MAX_OPEN_FILES = 64
+
+def task_number():
+    # Hadoop streaming exports the job configuration with '.' replaced by '_'
+    try:
+        return int(os.environ.get("mapreduce_task_partition", "0"))
+    except ValueError:
+        return 0
+
+class PartitionWriter:
+
+    def __init__(self, output_root, use_hdfs=True, max_open=MAX_OPEN_FILES):
+        self.output_root = output_root.rstrip('/')
+        self.use_hdfs = use_hdfs
+        self.max_open = max_open
+        self.local_root = (tempfile.mkdtemp(prefix="epa_partitions_", dir=os.getcwd()) if use_hdfs
+                           else self.output_root)
+        self.file_name = f"part-{task_number():05d}.csv"
+        self.open_files = OrderedDict()
+        self.partitions = set()
+
+    def _file(self, partition):
+        handle = self.open_files.get(partition)
+        if handle is not None:
+            self.open_files.move_to_end(partition)
+            return handle
+        directory = os.path.join(self.local_root, partition)
+        os.makedirs(directory, exist_ok=True)
+        if len(self.open_files) >= self.max_open:
+            _, oldest = self.open_files.popitem(last=False)
+            oldest.close()
+        mode = 'a' if partition in self.partitions else 'w'
+        handle = open(os.path.join(directory, self.file_name), mode, encoding='utf-8', newline='')
+        self.open_files[partition] = handle
+        self.partitions.add(partition)
+        return handle
+
+    def write(self, partition, line):
+        self._file(partition).write(line)
+
+    def path(self, partition):
+        return f"{self.output_root}/{partition}/{self.file_name}"
+
+    def close(self):
+        for handle in self.open_files.values():
+            handle.close()
+        self.open_files.clear()
+        if not self.use_hdfs or not self.partitions:
+            return
+        try:
+            # Top level entries are uploaded in one command; directories that
+            # already exist (nested partitions, other tasks) are merged into
+            sources = [os.path.join(self.local_root, name) for name in sorted(os.listdir(self.local_root))]
+            subprocess.run(["hdfs", "dfs", "-mkdir", "-p", self.output_root], check=True)
+            subprocess.run(["hdfs", "dfs", "-put", "-f"] + sources + [self.output_root], check=True)
+        finally:
+            shutil.rmtree(self.local_root, ignore_errors=True)
@@ -0,0 +1,45 @@
+import csv
+import argparse
+
+from records import column_indexes, is_header, parse_columns, parse_values
+from histogram import sample_layout
+from block_reader import open_source, read_block, shuffled_blocks
+
+# Sampling pre-pass of the histogram jobs: reads a few random blocks of the
+# input and prints a histogram layout fitted to each column,
+#   LAYOUT  column  spec  sampled_values
+# which the GUI passes on to the median and percentile mappers:
+#   python3 range_probe.py arithmetic_mean,aqi --input /path/file.csv --webhdfs http://localhost:9870
+
+DEFAULT_BLOCKS = 8
+
+def probe(columns, size, read_range, num_blocks, seed):
+    values = {column: [] for column in columns}
+    indexes = column_indexes(None, columns)
+    for block_idx in shuffled_blocks(size, seed)[:num_blocks]:
+        rows = list(csv.reader(read_block(read_range, block_idx)))
+        if rows and is_header(rows[0]):
+            indexes = column_indexes(rows[0], columns)
+            rows = rows[1:]
+        for column, index in zip(columns, indexes):
+            values[column].extend(parse_values(rows, index))
+    return values
+
+def main():
+    parser = argparse.ArgumentParser(description="Fits histogram layouts to a sample of the input")
+    parser.add_argument("columns", nargs="?", default="")
+    parser.add_argument("--input", required=True, help="HDFS path (with --webhdfs) or local file")
+    parser.add_argument("--webhdfs", default="", help="e.g. http://localhost:9870")
+    parser.add_argument("--user", default="hadoop")
+    parser.add_argument("--blocks", type=int, default=DEFAULT_BLOCKS)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    columns = parse_columns([args.columns])
+    size, read_range = open_source(args.input, args.webhdfs, args.user)
+    for column, values in probe(columns, size, read_range, args.blocks, args.seed).items():
+        layout = sample_layout(values)
+        if layout is not None:
+            print(f"LAYOUT\t{column}\t{layout.spec()}\t{len(values)}")
+
+if __name__ == "__main__":
+    main()
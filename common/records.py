@@ -0,0 +1,327 @@
+import os
+import sys
+from array import array
+from itertools import chain, islice
+
+# Row parsing shared by the statistic mappers. Input splits other than the
+# first one carry no CSV header, so column positions fall back to the fixed
+# EPA extract layout when the first row is not a header.
+
+EXPECTED_FIELDNAMES = ['date_local', 'state_name', 'county_name', 'arithmetic_mean', 'aqi', 'first_max_value', 'observation_count', 'latitude', 'longitude']
+NUMERIC_COLUMNS = ['arithmetic_mean', 'aqi', 'first_max_value', 'observation_count']
+DEFAULT_COLUMNS = ['arithmetic_mean']
+COLUMN_LABELS = {'arithmetic_mean': 'PM2.5', 'aqi': 'AQI', 'first_max_value': 'Daily Max Value', 'observation_count': 'Observation Count'}
+COLUMN_UNITS = {'arithmetic_mean': ' μg/m³', 'first_max_value': ' μg/m³'}
+BLOCK_SIZE = 4096
+REGION_ENV = 'EPA_REGION'   # see spatial.parse_region; passed with -cmdenv
+DATE_RANGE_ENV = 'EPA_DATE_RANGE'   # see date_partitions.parse_date_range
+FILTER_ENV = 'EPA_FILTER'   # see row_filters.py
+DEDUP_ENV = 'EPA_DEDUP'   # FP_RATE or FP_RATE:FILTER_FILE, see row_dedup
+DEDUP_FIELDS = ['latitude', 'longitude', 'date_local']   # one measurement per site and day
+WEIGHT_ENV = 'EPA_WEIGHT'   # numeric column of frequency weights, see iter_weighted_blocks
+SOURCES_ENV = 'EPA_SOURCES'   # label=path;... of a comparison run, see input_source
+SOURCE_SEPARATOR = '::'       # source::key in the output of a comparison run
+INPUT_FILE_ENVS = ('mapreduce_map_input_file', 'map_input_file')   # set by streaming per map task
+# Named key expressions for grouping jobs; any other key is a '+' joined list
+# of fields, e.g. county_name+date_local
+KEY_EXPRESSIONS = {
+    'site': ['latitude', 'longitude'],
+    'county': ['state_name', 'county_name'],
+    'state': ['state_name'],
+    'date': ['date_local'],
+    'state_date': ['state_name', 'date_local'],
+    'site_date': ['latitude', 'longitude', 'date_local'],
+}
+DEFAULT_KEYS = ['site', 'county', 'site_date']
+KEY_SEPARATOR = '\x1f'
+
+def parse_columns(args):
+    columns = []
+    for arg in args:
+        for name in arg.split(','):
+            name = name.strip()
+            if name and name not in columns:
+                columns.append(name)
+    if not columns:
+        return list(DEFAULT_COLUMNS)
+    unknown = [c for c in columns if c not in EXPECTED_FIELDNAMES]
+    if unknown:
+        print(f"ERROR: Unknown column(s): {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+    return columns
+
+def parse_key_expressions(arg, default_keys=DEFAULT_KEYS):
+    keys = {}
+    for name in arg.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        fields = KEY_EXPRESSIONS.get(name, name.split('+'))
+        unknown = [f for f in fields if f not in EXPECTED_FIELDNAMES]
+        if unknown:
+            print(f"ERROR: Unknown key field(s): {', '.join(unknown)}", file=sys.stderr)
+            sys.exit(1)
+        keys[name] = fields
+    return keys or {name: KEY_EXPRESSIONS[name] for name in default_keys}
+
+def ordered_columns(columns):
+    # Field order, grouped by source in a comparison run
+    def order(key):
+        source, column = split_source(key)
+        return (source or "", EXPECTED_FIELDNAMES.index(column) if column in EXPECTED_FIELDNAMES else len(EXPECTED_FIELDNAMES))
+    return sorted(columns, key=order)
+
+def is_header(row):
+    return 'date_local' in row
+
+def column_indexes(header, columns):
+    fieldnames = header if header and is_header(header) else EXPECTED_FIELDNAMES
+    return [fieldnames.index(c) if c in fieldnames else -1 for c in columns]
+
+def format_sources(sources):
+    # [(label, path)] -> EPA_SOURCES value; quoted, -cmdenv splits on spaces
+    from urllib.parse import quote
+    return ';'.join(f"{quote(label, safe='')}={quote(path, safe='/:')}" for label, path in sources)
+
+def comparison_sources(hdfs_input_path, compare_text):
+    # [(label, path)]: the main input first, then every "[label=]path" item;
+    # labels default to the file name and are made unique. Paths may hold
+    # '=' themselves (year=2019/month=06), so only a first '=' with no '/'
+    # before it ends a label.
+    items = [("", hdfs_input_path)]
+    for item in compare_text.split(','):
+        label, sep, path = item.strip().partition('=')
+        if not sep or '/' in label:
+            label, path = "", item.strip()
+        if path.strip():
+            items.append((label.strip(), path.strip()))
+    sources = []
+    used = set()
+    for label, path in items:
+        base = label or os.path.splitext(os.path.basename(path.rstrip('/')))[0] or "input"
+        label, suffix = base, 2
+        while label in used:
+            label, suffix = f"{base}_{suffix}", suffix + 1
+        used.add(label)
+        sources.append((label, path))
+    return sources
+
+def parse_sources(spec):
+    from urllib.parse import unquote
+    sources = []
+    for item in spec.split(';'):
+        label, sep, path = item.partition('=')
+        if sep:
+            sources.append((unquote(label), unquote(path)))
+    return sources
+
+def hdfs_path(path):
+    # hdfs://namenode:8020/user/x -> /user/x
+    if '://' in path:
+        from urllib.parse import urlparse
+        return urlparse(path).path
+    return path
+
+def input_source():
+    # Label of the dataset this map task reads in a comparison run (None
+    # otherwise): the longest EPA_SOURCES path that holds the task's input
+    # file, or the file name when none does
+    spec = os.environ.get(SOURCES_ENV)
+    if not spec:
+        return None
+    input_file = hdfs_path(next((os.environ[name] for name in INPUT_FILE_ENVS if os.environ.get(name)), ""))
+    matches = []
+    for label, path in parse_sources(spec):
+        path = hdfs_path(path).rstrip('/')
+        if input_file == path or input_file.startswith(path + '/'):
+            matches.append((len(path), label))
+    if matches:
+        return max(matches)[1]
+    return os.path.splitext(os.path.basename(input_file))[0] or "input"
+
+def source_key(source, key):
+    return f"{source}{SOURCE_SEPARATOR}{key}" if source else key
+
+def split_source(key):
+    # source::key -> (source, key); (None, key) outside comparison runs
+    source, sep, rest = key.partition(SOURCE_SEPARATOR)
+    return (source, rest) if sep else (None, key)
+
+def row_filter(header):
+    # Rows outside the EPA_REGION region, the EPA_DATE_RANGE dates or the
+    # EPA_FILTER expression are dropped before any job sees them
+    region_spec = os.environ.get(REGION_ENV)
+    date_spec = os.environ.get(DATE_RANGE_ENV)
+    filter_spec = os.environ.get(FILTER_ENV)
+    if not region_spec and not date_spec and not filter_spec:
+        return None
+    checks = []
+    if filter_spec:
+        from row_filters import compile_filter
+        checks.append(compile_filter(filter_spec, header))
+        if not region_spec and not date_spec:
+            return checks[0]
+    lat_index, lon_index, date_index = column_indexes(header, ['latitude', 'longitude', 'date_local'])
+    if region_spec:
+        from spatial import parse_coordinates, parse_region
+        region = parse_region(region_spec)
+        checks.append(lambda row: region.contains(*parse_coordinates(row[lat_index], row[lon_index])))
+    if date_spec:
+        from date_partitions import parse_date_range
+        # ISO dates compare correctly as strings
+        start, end = (d.isoformat() for d in parse_date_range(date_spec))
+        checks.append(lambda row: start <= row[date_index][:10] <= end)
+
+    def keep(row):
+        try:
+            return all(check(row) for check in checks)
+        except (ValueError, IndexError):
+            return False
+    return keep
+
+def line_filter():
+    # Raw line test derived from EPA_FILTER, applied before the CSV parsing
+    filter_spec = os.environ.get(FILTER_ENV)
+    if not filter_spec:
+        return None
+    from row_filters import compile_line_filter
+    return compile_line_filter(filter_spec)
+
+class RowDedup:
+    # Keeps the first row of every (latitude, longitude, date_local) a map
+    # task sees, in a scalable Bloom filter, and drops the rows of keys in a
+    # prebuilt filter of another input. Suspected duplicates are dropped: a
+    # row is wrongly dropped with at most the configured probability.
+
+    def __init__(self, indexes, fp_rate, prebuilt=None):
+        from bloom import ScalableBloomFilter
+        self.indexes = indexes
+        self.seen = ScalableBloomFilter(fp_rate)
+        self.prebuilt = prebuilt
+        self.fp_rate = fp_rate + (prebuilt.fp_rate if prebuilt is not None else 0.0)
+        self.dropped = 0
+
+    def keep(self, row):
+        try:
+            key = KEY_SEPARATOR.join([row[i].strip() for i in self.indexes])
+        except IndexError:
+            return True
+        if (self.prebuilt is not None and key in self.prebuilt) or self.seen.add(key):
+            self.dropped += 1
+            return False
+        return True
+
+def row_dedup(header):
+    # RowDedup from EPA_DEDUP, or None. A prebuilt filter (shipped to the task
+    # directory with -files) is skipped by the map tasks of its own source,
+    # which keep the rows it was built from.
+    spec = os.environ.get(DEDUP_ENV)
+    if not spec:
+        return None
+    rate, _, filter_file = spec.partition(':')
+    prebuilt = None
+    if filter_file:
+        from bloom import load_filter
+        prebuilt = load_filter(filter_file)
+        input_file = hdfs_path(next((os.environ[name] for name in INPUT_FILE_ENVS if os.environ.get(name)), ""))
+        source = hdfs_path(prebuilt.source).rstrip('/')
+        if source and (input_file == source or input_file.startswith(source + '/')):
+            prebuilt = None
+    return RowDedup(column_indexes(header, DEDUP_FIELDS), float(rate), prebuilt)
+
+def iter_row_blocks(stream, columns, block_size=BLOCK_SIZE, counters=None):
+    # csv (and the re module it loads) is imported here so that reducers,
+    # which only need the column metadata, start faster
+    import csv
+    keep_line = line_filter()
+    if keep_line is not None:
+        # The first line may be the header, which must reach the reader
+        lines = iter(stream)
+        stream = chain(islice(lines, 1), filter(keep_line, lines))
+    reader = csv.reader(stream)
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    indexes = column_indexes(first_row, columns)
+    rows = reader if is_header(first_row) else chain([first_row], reader)
+    keep = row_filter(first_row)
+    if keep is not None:
+        rows = filter(keep, rows)
+    dedup = row_dedup(first_row)
+    if dedup is not None:
+        # After the row filters: only rows that are analyzed claim their key
+        rows = filter(dedup.keep, rows)
+        if counters is not None:
+            counters.dedup = dedup
+    while True:
+        block = list(islice(rows, block_size))
+        if not block:
+            break
+        yield indexes, block
+
+def parse_values(rows, index, non_negative=True):
+    values = array('d')
+    if index < 0:
+        return values
+    append = values.append
+    for row in rows:
+        try:
+            value = float(row[index])
+        except (ValueError, IndexError):
+            continue
+        if value >= 0 or not non_negative:
+            append(value)
+    return values
+
+def iter_column_blocks(stream, columns, block_size=BLOCK_SIZE, non_negative=True, counters=None):
+    # Each CSV row is parsed once; every block yields one array of valid
+    # values per requested column, in the order of `columns`. `counters`
+    # (a job_output.TaskCounters) is told how many rows each block held.
+    for indexes, rows in iter_row_blocks(stream, columns, block_size, counters):
+        blocks = [parse_values(rows, index, non_negative) for index in indexes]
+        if counters is not None:
+            counters.add_block(len(rows), columns, blocks)
+        yield blocks
+
+def parse_weighted_values(rows, index, weight_index, non_negative=True):
+    # Valid values with their weights rounded to whole numbers; rows whose
+    # weight is missing or rounds to zero or less are skipped
+    values = array('d')
+    weights = array('q')
+    if index < 0 or weight_index < 0:
+        return values, weights
+    append_value = values.append
+    append_weight = weights.append
+    for row in rows:
+        try:
+            value = float(row[index])
+            weight = round(float(row[weight_index]))
+        except (ValueError, IndexError, OverflowError):
+            continue
+        if weight > 0 and (value >= 0 or not non_negative):
+            append_value(value)
+            append_weight(weight)
+    return values, weights
+
+def iter_weighted_blocks(stream, columns, block_size=BLOCK_SIZE, non_negative=True, counters=None):
+    # iter_column_blocks with the EPA_WEIGHT column: yields (blocks, weights)
+    # with one weight array per column, or None weights without EPA_WEIGHT.
+    # observation_count makes each daily mean count once per hourly sample.
+    weight = os.environ.get(WEIGHT_ENV)
+    if not weight:
+        unweighted = [None] * len(columns)
+        for blocks in iter_column_blocks(stream, columns, block_size, non_negative, counters):
+            yield blocks, unweighted
+        return
+    if weight not in NUMERIC_COLUMNS:
+        print(f"ERROR: {WEIGHT_ENV} must name a numeric column, not {weight!r}", file=sys.stderr)
+        sys.exit(1)
+    if counters is not None:
+        counters.weight = weight
+    for indexes, rows in iter_row_blocks(stream, columns + [weight], block_size, counters):
+        *indexes, weight_index = indexes
+        pairs = [parse_weighted_values(rows, index, weight_index, non_negative) for index in indexes]
+        blocks = [values for values, _ in pairs]
+        if counters is not None:
+            counters.add_block(len(rows), columns, blocks)
+        yield blocks, [weights for _, weights in pairs]
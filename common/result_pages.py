@@ -0,0 +1,54 @@
+import sys
+import argparse
+
+from block_reader import read_lines, webhdfs_list_status, webhdfs_source
+
+# Paged access to the output directory of a job, run on the master node for
+# the GUI so that outputs of any size open without being read whole:
+#   python3 result_pages.py list /output/dir --webhdfs http://localhost:9870
+#       PART  path  size          one line per part-* file, in order
+#   python3 result_pages.py page /output/dir/part-00003 --offset 262144 --length 262144 --webhdfs ...
+#       the rows starting inside the byte range
+# A page is a fixed-size byte range of one part file, so every page, the
+# last one included, costs a single ranged WebHDFS read.
+
+PAGE_BYTES = 256 * 1024
+
+def parse_part_listing(text):
+    parts = []
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 3 and fields[0] == "PART":
+            parts.append((fields[1], int(fields[2])))
+    return parts
+
+def page_ranges(parts, page_bytes=PAGE_BYTES):
+    # (path, offset, length) of every page; empty parts have none
+    return [(path, offset, min(page_bytes, size - offset))
+            for path, size in parts for offset in range(0, size, page_bytes)]
+
+def list_parts(base_url, output_dir, user):
+    statuses = webhdfs_list_status(base_url, output_dir, user)
+    names = sorted(s["pathSuffix"] for s in statuses if s["type"] == "FILE" and s["pathSuffix"].startswith("part-"))
+    sizes = {s["pathSuffix"]: s["length"] for s in statuses}
+    return [(f"{output_dir.rstrip('/')}/{name}", sizes[name]) for name in names]
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists and pages the part files of a job output")
+    parser.add_argument("action", choices=["list", "page"])
+    parser.add_argument("path", help="output directory (list) or part file (page)")
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--length", type=int, default=PAGE_BYTES)
+    parser.add_argument("--webhdfs", default="http://localhost:9870")
+    parser.add_argument("--user", default="hadoop")
+    args = parser.parse_args()
+    if args.action == "list":
+        for path, size in list_parts(args.webhdfs, args.path, args.user):
+            print(f"PART\t{path}\t{size}")
+        return
+    _, read_range = webhdfs_source(args.webhdfs, args.path, args.user)
+    for line in read_lines(read_range, args.offset, args.length):
+        sys.stdout.write(line + '\n')
+
+if __name__ == "__main__":
+    main()
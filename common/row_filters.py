@@ -0,0 +1,229 @@
+import re
+import math
+import base64
+
+from records import EXPECTED_FIELDNAMES, column_indexes
+
+# Row filter expressions over the CSV columns, passed to the mappers in the
+# EPA_FILTER environment variable:
+#   state_name = 'California' and aqi > 100
+#   county_name in ('Los Angeles', 'Orange') and date_local between '2019-06-01' and '2019-08-31'
+#   not (state_name = 'Texas' or arithmetic_mean >= 35.5)
+# Operators: = == != < <= > >= in (...) between ... and ..., combined with
+# and / or / not and parentheses. Numeric columns compare as numbers, the
+# others as text (ISO dates compare correctly as text; date_local compares its
+# first ten characters). A row whose compared field is missing or not a
+# number is rejected.
+#
+# An expression is compiled once per task into a single Python function over
+# the raw CSV fields, so only the fields it names are touched and nothing is
+# converted to float before the row has passed. Text equalities that every
+# row must satisfy also give substrings the raw line must contain, which lets
+# iter_row_blocks skip most rejected lines before they are even split.
+
+NUMERIC_FIELDS = {'arithmetic_mean', 'aqi', 'first_max_value', 'observation_count', 'latitude', 'longitude'}
+ENCODED_PREFIX = "b64:"   # -cmdenv values cannot contain spaces
+COMPARISONS = {'=': '==', '==': '==', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+TOKEN_PATTERN = re.compile(r"""\s*(?:(?P<string>'[^']*'|"[^"]*")|(?P<op><=|>=|!=|==|=|<|>)|(?P<punct>[(),])|(?P<word>[^\s(),'"<>=!]+))""")
+KEYWORDS = {'and', 'or', 'not', 'in', 'between'}
+
+class FilterError(ValueError):
+    pass
+
+def encode_filter(text):
+    return ENCODED_PREFIX + base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+def decode_filter(spec):
+    if spec.startswith(ENCODED_PREFIX):
+        return base64.urlsafe_b64decode(spec[len(ENCODED_PREFIX):].encode('ascii')).decode('utf-8')
+    return spec
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise FilterError(f"unexpected character at position {position}: {text[position:position + 10]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            tokens.append(("literal", value[1:-1]))
+        elif kind == "word" and value.lower() in KEYWORDS:
+            tokens.append(("keyword", value.lower()))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+class Parser:
+    # Recursive descent over the tokens; nodes are tuples:
+    #   ("or", [nodes]) ("and", [nodes]) ("not", node)
+    #   ("compare", field, op, literal) ("in", field, [literals])
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind or "more input"
+            raise FilterError(f"expected {expected}, found {token[1] or 'the end'}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterError("empty filter")
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise FilterError(f"unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ("keyword", "or"):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == ("keyword", "and"):
+            self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.take()
+            return ("not", self.parse_not())
+        if self.peek() == ("punct", "("):
+            self.take()
+            node = self.parse_or()
+            self.take("punct", ")")
+            return node
+        return self.parse_comparison()
+
+    def parse_literal(self, field):
+        kind, value = self.peek()
+        if kind not in ("literal", "word"):
+            raise FilterError(f"expected a value for {field}, found {value or 'the end'}")
+        self.take()
+        if field in NUMERIC_FIELDS:
+            try:
+                number = float(value)
+            except ValueError:
+                number = None
+            if number is None or not math.isfinite(number):
+                raise FilterError(f"{field} is numeric, {value!r} is not a number")
+            return number
+        return value
+
+    def parse_comparison(self):
+        _, field = self.take("word")
+        if field not in EXPECTED_FIELDNAMES:
+            raise FilterError(f"unknown column {field!r}")
+        kind, op = self.peek()
+        if kind == "op":
+            self.take()
+            return ("compare", field, COMPARISONS[op], self.parse_literal(field))
+        if (kind, op) == ("keyword", "in"):
+            self.take()
+            self.take("punct", "(")
+            values = [self.parse_literal(field)]
+            while self.peek() == ("punct", ","):
+                self.take()
+                values.append(self.parse_literal(field))
+            self.take("punct", ")")
+            return ("in", field, values)
+        if (kind, op) == ("keyword", "between"):
+            self.take()
+            low = self.parse_literal(field)
+            self.take("keyword", "and")
+            high = self.parse_literal(field)
+            return ("and", [("compare", field, ">=", low), ("compare", field, "<=", high)])
+        raise FilterError(f"expected an operator after {field}")
+
+def parse_filter(text):
+    return Parser(decode_filter(text)).parse()
+
+def field_source(field, index):
+    if field in NUMERIC_FIELDS:
+        return f"float(row[{index}])"
+    if field == "date_local":
+        return f"row[{index}][:10]"
+    return f"row[{index}].strip()"
+
+def node_source(node, indexes):
+    kind = node[0]
+    if kind in ("and", "or"):
+        parts = node[1]
+        if kind == "and":
+            # Text checks first: they are cheaper than a float conversion
+            parts = sorted(parts, key=lambda part: part[0] in ("compare", "in") and part[1] in NUMERIC_FIELDS)
+        return "(" + f" {kind} ".join(node_source(part, indexes) for part in parts) + ")"
+    if kind == "not":
+        return f"(not {node_source(node[1], indexes)})"
+    field = node[1]
+    value = field_source(field, indexes[field])
+    if kind == "in":
+        return f"({value} in {frozenset(node[2])!r})"
+    return f"({value} {node[2]} {node[3]!r})"
+
+def node_fields(node, fields):
+    if node[0] in ("and", "or"):
+        for part in node[1]:
+            node_fields(part, fields)
+    elif node[0] == "not":
+        node_fields(node[1], fields)
+    elif node[1] not in fields:
+        fields.append(node[1])
+    return fields
+
+def compile_filter(text, header=None):
+    # A function of one parsed CSV row, True for the rows to keep
+    node = parse_filter(text)
+    fields = node_fields(node, [])
+    indexes = dict(zip(fields, column_indexes(header, fields)))
+    missing = [f for f in fields if indexes[f] < 0]
+    if missing:
+        raise FilterError(f"column(s) not in the input: {', '.join(missing)}")
+    source = (f"def keep(row):\n"
+              f"    try:\n"
+              f"        return {node_source(node, indexes)}\n"
+              f"    except (ValueError, IndexError):\n"
+              f"        return False\n")
+    namespace = {}
+    exec(compile(source, "<EPA_FILTER>", "exec"), namespace)
+    return namespace["keep"]
+
+def required_terms(node):
+    # Alternatives of substrings of which a kept line contains at least one,
+    # for each text equality every kept row must satisfy
+    if node[0] == "and":
+        return [terms for part in node[1] for terms in required_terms(part)]
+    if node[0] == "compare" and node[2] == "==" and node[1] not in NUMERIC_FIELDS:
+        values = [node[3]]
+    elif node[0] == "in" and node[1] not in NUMERIC_FIELDS:
+        values = node[2]
+    else:
+        return []
+    if any(not value or '"' in value for value in values):
+        return []
+    return [tuple(values)]
+
+def compile_line_filter(text):
+    # A cheap test on the raw input line, or None when the expression gives
+    # none. One regular expression search runs in C with no Python call per
+    # line; the set with the longest terms is likely the most selective.
+    term_sets = required_terms(parse_filter(text))
+    if not term_sets:
+        return None
+    terms = max(term_sets, key=lambda terms: min(len(term) for term in terms))
+    return re.compile('|'.join(re.escape(term) for term in terms)).search
@@ -0,0 +1,50 @@
+import math
+
+# Daily series per site for the anomaly job. Map output is keyed by the
+# composite key  site \t date  (two key fields); the shuffle partitions on the
+# site alone and sorts on both fields, so every reducer reads each site's days
+# in date order (ISO dates sort as text) and needs state for one site at a
+# time. On a cluster that takes the options below; local_runner.py sorts on
+# the same key fields with --key-fields.
+#   site \t date \t column \t value \t place
+
+KEY_FIELDS = 2
+HADOOP_OPTIONS = ['-D', f'stream.num.map.output.key.fields={KEY_FIELDS}',
+                  '-D', 'mapreduce.partition.keypartitioner.options=-k1,1']
+PARTITIONER = 'org.apache.hadoop.mapred.lib.KeyFieldBasedPartitioner'
+
+DEFAULT_ALPHA = 0.1          # weight of the newest day, about a ten day memory
+DEFAULT_THRESHOLD = 4.0      # z-score of a flagged day
+DEFAULT_WARMUP = 14          # days of a series before any day can be flagged
+DEFAULT_MAX_GAP = 30         # days without data after which a series restarts
+MIN_RELATIVE_SD = 0.1        # spread floor, relative to the baseline mean
+
+class EWMeanVariance:
+    # Exponentially weighted mean and variance (West 1979; Finch 2009):
+    # O(1) state, one update per day
+
+    __slots__ = ("alpha", "mean", "variance", "count")
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.count += 1
+
+    def spread(self):
+        # Standard deviation with a floor, so that a flat stretch of a series
+        # does not turn every small step into an anomaly
+        return max(math.sqrt(self.variance), MIN_RELATIVE_SD * abs(self.mean), 1e-9)
+
+    def zscore(self, value):
+        return (value - self.mean) / self.spread()
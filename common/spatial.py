@@ -0,0 +1,133 @@
+import math
+
+# Fixed latitude/longitude grid used by the spatial tile layout, and the
+# regions (bounding box or polygon) that queries prune tiles and rows with.
+#
+# Region syntax, also used in the EPA_REGION environment variable:
+#   bbox:min_lat,min_lon,max_lat,max_lon     (or just the four numbers)
+#   polygon:lat lon;lat lon;lat lon;...      (or lat,lon;lat,lon;...)
+# Region.spec() gives the form without spaces, as -cmdenv values cannot
+# contain any.
+
+TILE_DEGREES = 1.0
+TILE_UNLOCATED = "unlocated"   # rows without valid coordinates
+
+def tile_id(lat, lon, size=TILE_DEGREES):
+    row = int(math.floor((lat + 90.0) / size))
+    col = int(math.floor((lon + 180.0) / size))
+    return f"r{row:04d}c{col:04d}"
+
+def tile_bounds(tile, size=TILE_DEGREES):
+    row = int(tile[1:5])
+    col = int(tile[6:10])
+    min_lat = row * size - 90.0
+    min_lon = col * size - 180.0
+    return min_lat, min_lon, min_lat + size, min_lon + size
+
+def parse_coordinates(lat_str, lon_str):
+    lat = float(lat_str)
+    lon = float(lon_str)
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError("coordinates out of range")
+    return lat, lon
+
+def point_in_polygon(lat, lon, polygon):
+    # Ray casting along the longitude axis
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) / (lat_j - lat_i) * (lon_j - lon_i)
+            if lon < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+def segments_intersect(p1, p2, q1, q2):
+    def orientation(a, b, c):
+        value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        return (value > 0) - (value < 0)
+    d1 = orientation(q1, q2, p1)
+    d2 = orientation(q1, q2, p2)
+    d3 = orientation(p1, p2, q1)
+    d4 = orientation(p1, p2, q2)
+    return d1 * d2 <= 0 and d3 * d4 <= 0
+
+class Region:
+
+    def __init__(self, bbox=None, polygon=None):
+        self.polygon = polygon
+        if polygon:
+            lats = [p[0] for p in polygon]
+            lons = [p[1] for p in polygon]
+            bbox = (min(lats), min(lons), max(lats), max(lons))
+        self.bbox = bbox
+
+    def spec(self):
+        if self.polygon:
+            return "polygon:" + ";".join(f"{lat!r},{lon!r}" for lat, lon in self.polygon)
+        return "bbox:" + ",".join(repr(v) for v in self.bbox)
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        return self.polygon is None or point_in_polygon(lat, lon, self.polygon)
+
+    def overlaps(self, extent):
+        # extent = (min_lat, min_lon, max_lat, max_lon) of a tile or its rows
+        min_lat, min_lon, max_lat, max_lon = extent
+        r_min_lat, r_min_lon, r_max_lat, r_max_lon = self.bbox
+        if min_lat > r_max_lat or max_lat < r_min_lat or min_lon > r_max_lon or max_lon < r_min_lon:
+            return False
+        if self.polygon is None:
+            return True
+        corners = [(min_lat, min_lon), (min_lat, max_lon), (max_lat, max_lon), (max_lat, min_lon)]
+        if any(self.contains(lat, lon) for lat, lon in corners):
+            return True
+        if any(min_lat <= lat <= max_lat and min_lon <= lon <= max_lon for lat, lon in self.polygon):
+            return True
+        edges = list(zip(self.polygon, self.polygon[1:] + self.polygon[:1]))
+        sides = list(zip(corners, corners[1:] + corners[:1]))
+        return any(segments_intersect(a, b, c, d) for a, b in edges for c, d in sides)
+
+def parse_region(text):
+    text = text.strip()
+    kind, _, spec = text.partition(':') if ':' in text else ("bbox", "", text)
+    if kind == "bbox":
+        values = [float(v) for v in spec.replace(' ', ',').split(',') if v]
+        if len(values) != 4:
+            raise ValueError("bbox needs min_lat,min_lon,max_lat,max_lon")
+        min_lat, min_lon, max_lat, max_lon = values
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("bbox minimum is larger than its maximum")
+        return Region(bbox=(min_lat, min_lon, max_lat, max_lon))
+    if kind == "polygon":
+        polygon = []
+        for point in spec.split(';'):
+            if point.strip():
+                lat, lon = point.replace(',', ' ').split()
+                polygon.append((float(lat), float(lon)))
+        if len(polygon) < 3:
+            raise ValueError("polygon needs at least three points")
+        return Region(polygon=polygon)
+    raise ValueError(f"unknown region type {kind}")
+
+def parse_tile_index(text):
+    # TILE lines written by the layout reducer:
+    #   TILE  tile  rows  min_lat  min_lon  max_lat  max_lon  path
+    tiles = []
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if parts[0] != "TILE" or len(parts) != 8:
+            continue
+        extent = None
+        if parts[3]:
+            extent = tuple(float(v) for v in parts[3:7])
+        tiles.append({"tile": parts[1], "rows": int(parts[2]), "extent": extent, "path": parts[7]})
+    return tiles
+
+def select_tiles(tiles, region):
+    return [t for t in tiles if t["extent"] is not None and region.overlaps(t["extent"])]
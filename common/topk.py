@@ -0,0 +1,104 @@
+import heapq
+
+# Bounded top-K summaries, O(K) memory per task.
+#
+# TopKHeap keeps the K largest (value, context) pairs; merging two heaps is
+# exact. SpaceSaving (Metwally et al. 2005) keeps `capacity` counters for the
+# most frequent keys; every count overestimates the true count by at most its
+# error, and summaries merge as described by Agarwal et al. 2012. With fewer
+# distinct keys than `capacity` the counts are exact.
+
+class TopKHeap:
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+
+    def add(self, value, context):
+        # context is a JSON string, which also breaks ties between equal values
+        item = (value, context)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def would_accept(self, value):
+        return len(self.heap) < self.k or value >= self.heap[0][0]
+
+    def merge(self, other):
+        for value, context in other.heap:
+            self.add(value, context)
+
+    def items(self):
+        return sorted(self.heap, reverse=True)
+
+class SpaceSaving:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._min_heap = []
+
+    def add(self, key, count=1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+        else:
+            evicted, min_count = self._pop_min()
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[key] = min_count + count
+            self.errors[key] = min_count
+        heapq.heappush(self._min_heap, (counts[key], key))
+        if len(self._min_heap) > 4 * self.capacity:
+            self._min_heap = [(c, k) for k, c in counts.items()]
+            heapq.heapify(self._min_heap)
+
+    def _pop_min(self):
+        # Heap entries go stale when a counter grows; skip those
+        while True:
+            count, key = heapq.heappop(self._min_heap)
+            if self.counts.get(key) == count:
+                return key, count
+
+    def min_count(self):
+        # Upper bound for the count of any key that is not tracked
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        own_min = self.min_count()
+        other_min = other.min_count()
+        counts = {}
+        errors = {}
+        for key in set(self.counts) | set(other.counts):
+            counts[key] = self.counts.get(key, own_min) + other.counts.get(key, other_min)
+            errors[key] = self.errors.get(key, own_min) + other.errors.get(key, other_min)
+        kept = heapq.nlargest(self.capacity, counts, key=counts.get)
+        self.counts = {key: counts[key] for key in kept}
+        self.errors = {key: errors[key] for key in kept}
+        self._min_heap = [(c, k) for k, c in self.counts.items()]
+        heapq.heapify(self._min_heap)
+
+    def items(self):
+        # (key, count, error) by descending count
+        return [(key, self.counts[key], self.errors[key])
+                for key in sorted(self.counts, key=self.counts.get, reverse=True)]
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "items": [list(item) for item in self.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data["capacity"])
+        for key, count, error in data["items"]:
+            summary.counts[key] = count
+            summary.errors[key] = error
+        summary._min_heap = [(c, k) for k, c in summary.counts.items()]
+        heapq.heapify(summary._min_heap)
+        return summary
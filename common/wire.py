@@ -0,0 +1,163 @@
+import os
+import sys
+import base64
+import struct
+
+from records import input_source, source_key
+
+# Intermediate records of the statistic jobs (map output, reduce input), as
+# tab separated text lines or as Hadoop typed bytes pairs:
+#   text:         TAG \t field \t field ...      (bytes fields base64 encoded)
+#   typed bytes:  key = TAG (string), value = vector of the fields
+# Typed bytes fields keep their type: str as string, bytes as raw bytes,
+# int as long, float as double, so packed aggregates travel without base64
+# and nothing is formatted or parsed as text. The format is chosen per job
+# with the EPA_WIRE variable (-cmdenv) together with
+#   -D stream.map.output=typedbytes -D stream.reduce.input=typedbytes
+# on a cluster, or EPA_WIRE in the environment of local_runner.py, which
+# shuffles the same framing. Input rows and job output stay text.
+# In a comparison run (EPA_SOURCES) record keys carry the task's source
+# dataset, see records.input_source.
+
+WIRE_ENV = "EPA_WIRE"
+TEXT = "text"
+TYPED_BYTES = "typedbytes"
+HADOOP_OPTIONS = ['-D', 'stream.map.output=typedbytes', '-D', 'stream.reduce.input=typedbytes']
+
+# Type codes of org.apache.hadoop.typedbytes.Type, values big endian
+BYTES, BYTE, BOOL, INT, LONG, FLOAT, DOUBLE, STRING, VECTOR, LIST, MAP = range(11)
+LIST_END = 255
+
+def wire_format():
+    return TYPED_BYTES if os.environ.get(WIRE_ENV) == TYPED_BYTES else TEXT
+
+def encode_value(value, out):
+    if isinstance(value, bool):
+        out += struct.pack('>BB', BOOL, value)
+    elif isinstance(value, int):
+        out += struct.pack('>Bq', LONG, value)
+    elif isinstance(value, float):
+        out += struct.pack('>Bd', DOUBLE, value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out += struct.pack('>Bi', STRING, len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        out += struct.pack('>Bi', BYTES, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out += struct.pack('>Bi', VECTOR, len(value))
+        for item in value:
+            encode_value(item, out)
+    elif isinstance(value, dict):
+        out += struct.pack('>Bi', MAP, len(value))
+        for key, item in value.items():
+            encode_value(key, out)
+            encode_value(item, out)
+    else:
+        raise TypeError(f"no typed bytes type for {type(value).__name__}")
+    return out
+
+def read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("truncated typed bytes record")
+    return data
+
+def decode_value(stream, type_code=None):
+    # Next value of a binary stream, None at a clean end of the stream
+    if type_code is None:
+        code = stream.read(1)
+        if not code:
+            return None
+        type_code = code[0]
+    if type_code in (BYTES, STRING):
+        (length,) = struct.unpack('>i', read_exactly(stream, 4))
+        data = read_exactly(stream, length)
+        return data.decode('utf-8') if type_code == STRING else data
+    if type_code == LONG:
+        return struct.unpack('>q', read_exactly(stream, 8))[0]
+    if type_code == DOUBLE:
+        return struct.unpack('>d', read_exactly(stream, 8))[0]
+    if type_code == INT:
+        return struct.unpack('>i', read_exactly(stream, 4))[0]
+    if type_code == FLOAT:
+        return struct.unpack('>f', read_exactly(stream, 4))[0]
+    if type_code == BYTE:
+        return struct.unpack('>b', read_exactly(stream, 1))[0]
+    if type_code == BOOL:
+        return read_exactly(stream, 1) != b'\x00'
+    if type_code == VECTOR:
+        (count,) = struct.unpack('>i', read_exactly(stream, 4))
+        return [decode_item(stream) for _ in range(count)]
+    if type_code == LIST:
+        items = []
+        while True:
+            code = read_exactly(stream, 1)[0]
+            if code == LIST_END:
+                return items
+            items.append(decode_value(stream, code))
+    if type_code == MAP:
+        (count,) = struct.unpack('>i', read_exactly(stream, 4))
+        return dict((decode_item(stream), decode_item(stream)) for _ in range(count))
+    raise ValueError(f"unsupported typed bytes type {type_code}")
+
+def decode_item(stream):
+    # A value inside a container: the stream must not end here
+    return decode_value(stream, read_exactly(stream, 1)[0])
+
+def encode_pair(key, value):
+    out = bytearray()
+    encode_value(key, out)
+    encode_value(value, out)
+    return bytes(out)
+
+def read_pairs(stream):
+    # (key, value) pairs of a binary typed bytes stream
+    while True:
+        key = decode_value(stream)
+        if key is None:
+            return
+        yield key, decode_item(stream)
+
+def text_field(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    return value if isinstance(value, str) else repr(value)
+
+class RecordWriter:
+
+    def __init__(self, stream=None, wire=None):
+        stream = stream or sys.stdout
+        self.wire = wire or wire_format()
+        self.source = input_source()
+        if self.wire == TYPED_BYTES:
+            stream.flush()
+            self.out = stream.buffer
+        else:
+            self.out = stream
+
+    def tagged(self, key):
+        # The key of a record of this task, source::key in a comparison run
+        return source_key(self.source, key)
+
+    def write(self, tag, *fields):
+        if self.wire == TYPED_BYTES:
+            self.out.write(encode_pair(tag, list(fields)))
+        else:
+            self.out.write('\t'.join([tag] + [text_field(field) for field in fields]) + '\n')
+
+def read_records(stream=None, wire=None):
+    # [tag, field, ...] per record; text fields are strings, typed bytes
+    # fields keep the type they were written with
+    stream = stream or sys.stdin
+    if (wire or wire_format()) == TYPED_BYTES:
+        binary = stream.buffer
+        while True:
+            tag = decode_value(binary)
+            if tag is None:
+                return
+            yield [tag] + decode_item(binary)
+    else:
+        for line in stream:
+            yield line.rstrip('\n').split('\t')
@@ -0,0 +1,61 @@
+import sys
+from array import array
+
+from aggregates import CoMoments, write_aggregate
+from records import NUMERIC_COLUMNS, iter_row_blocks, parse_columns
+from job_output import TaskCounters
+from wire import RecordWriter
+
+ALL_ROWS_GROUP = "ALL"
+
+def split_block(rows, value_indexes, group_index, groups):
+    # Listwise deletion: a row only counts if every column parses and is non-negative
+    valid = 0
+    for row in rows:
+        try:
+            values = [float(row[i]) for i in value_indexes]
+        except (ValueError, IndexError):
+            continue
+        if min(values) < 0:
+            continue
+        group = row[group_index] if group_index >= 0 else ALL_ROWS_GROUP
+        if group not in groups:
+            groups[group] = [array('d') for _ in value_indexes]
+        for column_values, value in zip(groups[group], values):
+            column_values.append(value)
+        valid += 1
+    return valid
+
+def mapper(columns, group_column):
+    accumulators = {}
+    counters = TaskCounters(columns)
+    lookup_columns = columns + ([group_column] if group_column else [])
+    for indexes, rows in iter_row_blocks(sys.stdin, lookup_columns, counters=counters):
+        value_indexes = indexes[:len(columns)]
+        counters.rows += len(rows)
+        if min(value_indexes) < 0:
+            continue
+        group_index = indexes[-1] if group_column else -1
+        groups = {}
+        valid = split_block(rows, value_indexes, group_index, groups)
+        for column in columns:
+            counters.valid[column] += valid
+        for group, column_values in groups.items():
+            if group not in accumulators:
+                accumulators[group] = CoMoments(columns)
+            accumulators[group].update_block(column_values)
+
+    writer = RecordWriter()
+    for group, accumulator in accumulators.items():
+        if accumulator.result()[0] > 0:
+            write_aggregate(writer, group, accumulator)
+    counters.emit(writer)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    columns = parse_columns(args[:1]) if args else list(NUMERIC_COLUMNS)
+    group_column = parse_columns(args[1:2])[0] if len(args) > 1 else None
+    if len(columns) < 2:
+        print("ERROR: At least two columns are required.", file=sys.stderr)
+        sys.exit(1)
+    mapper(columns, group_column)
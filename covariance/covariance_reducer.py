@@ -0,0 +1,88 @@
+import sys
+import math
+
+from aggregates import AGGREGATE_KEY, decode
+from moments import triangle_index
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
+
+def process_record(parts, accumulators, record):
+    try:
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+            return
+        if parts[0] != AGGREGATE_KEY or len(parts) != 3:
+            return
+        group = parts[1]
+        comoments = decode(parts[2])
+        if group not in accumulators:
+            accumulators[group] = comoments
+        elif accumulators[group].columns != comoments.columns:
+            print(f"DEBUG: column mismatch for group {group}, skipped", file=sys.stderr)
+        else:
+            accumulators[group].merge(comoments)
+    except (ValueError, IndexError):
+        error_logged = True
+
+def print_matrix(title, columns, value_at):
+    width = max(len(c) for c in columns) + 2
+    print(f"\n--- {title} ---")
+    print(" " * width + "".join(f"{c:>{width}}" for c in columns))
+    for i, row_name in enumerate(columns):
+        cells = "".join(f"{value_at(i, j):>{width}.4f}" for j in range(len(columns)))
+        print(f"{row_name:<{width}}{cells}")
+
+def group_result(columns, n, means, C):
+    k = len(columns)
+    ddof = 1 if n > 1 else 0
+
+    def correlation(i, j):
+        denominator = math.sqrt(C[triangle_index(i, i, k)] * C[triangle_index(j, j, k)])
+        # None marks an undefined correlation (constant column)
+        return C[triangle_index(i, j, k)] / denominator if denominator > 0 else None
+
+    return {
+        "columns": columns,
+        "total_records": n,
+        "means": list(means),
+        "covariance": [[C[triangle_index(i, j, k)] / (n - ddof) for j in range(k)] for i in range(k)],
+        "correlation": [[correlation(i, j) for j in range(k)] for i in range(k)],
+    }
+
+def report_group(group, result):
+    columns = result["columns"]
+    covariance = result["covariance"]
+    correlation = result["correlation"]
+
+    print(f"=== Covariance and Correlation ({group}) ===")
+    print(f"Total number of records: {result['total_records']}")
+    for column, mean in zip(columns, result["means"]):
+        print(f"Mean {column}: {mean:.4f}")
+    print_matrix("Sample Covariance (divide by N-1)", columns, lambda i, j: covariance[i][j])
+    print_matrix("Pearson Correlation", columns,
+                 lambda i, j: float('nan') if correlation[i][j] is None else correlation[i][j])
+
+def reducer():
+    accumulators = {}
+    record = new_record("covariance")
+    for parts in read_records():
+        process_record(parts, accumulators, record)
+
+    for group in sorted(accumulators):
+        n, means, C = accumulators[group].result()
+        record["results"][group] = group_result(accumulators[group].columns, n, means, C)
+        record["state"][group] = {"comoments": [n, list(means), list(C)]}
+    finish_record(record)
+
+    for i, (group, result) in enumerate(record["results"].items()):
+        if i > 0:
+            print()
+        report_group(group, result)
+    if not record["results"]:
+        print("ERROR: No valid data found!")
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
+
+if __name__ == "__main__":
+    reducer()
@@ -0,0 +1,42 @@
+import sys
+
+from aggregates import Distinct, write_aggregate
+from hyperloglog import DEFAULT_PRECISION
+from records import EXPECTED_FIELDNAMES, KEY_SEPARATOR, iter_row_blocks, parse_key_expressions
+from job_output import TaskCounters
+from wire import RecordWriter
+
+def add_block(rows, field_indexes, distinct):
+    valid = 0
+    for row in rows:
+        try:
+            values = [row[i].strip() for i in field_indexes]
+        except IndexError:
+            continue
+        if all(values):
+            distinct.update(KEY_SEPARATOR.join(values))
+            valid += 1
+    return valid
+
+def mapper(keys, precision):
+    names = list(keys)
+    fields = sorted({f for key_fields in keys.values() for f in key_fields}, key=EXPECTED_FIELDNAMES.index)
+    sketches = {name: Distinct(precision) for name in names}
+    counters = TaskCounters(names)
+    for indexes, rows in iter_row_blocks(sys.stdin, fields, counters=counters):
+        counters.rows += len(rows)
+        position = dict(zip(fields, indexes))
+        for name in names:
+            field_indexes = [position[f] for f in keys[name]]
+            if min(field_indexes) >= 0:
+                counters.valid[name] += add_block(rows, field_indexes, sketches[name])
+
+    writer = RecordWriter()
+    for name in names:
+        write_aggregate(writer, name, sketches[name])
+    counters.emit(writer)
+
+if __name__ == "__main__":
+    keys = parse_key_expressions(sys.argv[1] if len(sys.argv) > 1 else "")
+    precision = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PRECISION
+    mapper(keys, precision)
@@ -0,0 +1,57 @@
+import sys
+
+from aggregates import AGGREGATE_KEY, decode, merge_into
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
+
+Z_95 = 1.96
+
+def process_record(parts, sketches, record):
+    try:
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+            return
+        if parts[0] != AGGREGATE_KEY or len(parts) != 3:
+            return
+        merge_into(sketches, parts[1], decode(parts[2]))
+    except (ValueError, IndexError) as e:
+        print(f"DEBUG: sketch skipped: {e}", file=sys.stderr)
+
+def key_result(sketch):
+    estimate = sketch.estimate()
+    error = sketch.relative_error()
+    return {
+        "distinct_estimate": round(estimate),
+        "relative_standard_error": error,
+        "low_95": max(0, round(estimate * (1 - Z_95 * error))),
+        "high_95": round(estimate * (1 + Z_95 * error)),
+    }
+
+def print_results(name, result):
+    print(f"{name}: ~{result['distinct_estimate']:,} distinct "
+          f"(95% interval {result['low_95']:,} - {result['high_95']:,}, "
+          f"±{result['relative_standard_error'] * 100:.1f}% standard error)")
+
+def reducer():
+    sketches = {}
+    record = new_record("distinct_count")
+    for parts in read_records():
+        process_record(parts, sketches, record)
+
+    for name in sorted(sketches):
+        sketch = sketches[name].sketch
+        record["results"][name] = key_result(sketch)
+        record["state"][name] = {"precision": sketch.precision, "registers": sketch.serialize()}
+    finish_record(record)
+
+    print("=== Distinct Counts (HyperLogLog) ===")
+    for name, result in record["results"].items():
+        print_results(name, result)
+    if not record["results"]:
+        print("ERROR: No valid data found!")
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
+
+if __name__ == "__main__":
+    reducer()
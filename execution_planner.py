@@ -0,0 +1,174 @@
+import shlex
+
+from run_history import mode_history
+
+# Cost-based choice between running a job in-process on the master node,
+# as a small (uber) YARN job, or as a normal cluster job. Every mode is
+# modeled as `startup + bytes / throughput`; the two parameters start from
+# the measurements in the README and are refitted from the finished runs in
+# the run history database (run_history.py).
+
+MODE_LOCAL = "local"
+MODE_UBER = "uber"
+MODE_CLUSTER = "cluster"
+
+MODE_DESCRIPTIONS = {
+    MODE_LOCAL: "In-process on the EMR master node (no YARN)",
+    MODE_UBER: "Cluster job in uber mode (single small-job container)",
+    MODE_CLUSTER: "Normal cluster job with tuned split size",
+}
+
+DEFAULT_MODE_COSTS = {
+    # mode: (startup seconds, throughput bytes/sec)
+    MODE_LOCAL: (4.0, 8 * 1024 * 1024),
+    MODE_UBER: (25.0, 10 * 1024 * 1024),
+    MODE_CLUSTER: (50.0, 100 * 1024 * 1024),
+}
+
+LOCAL_MAX_BYTES = 512 * 1024 * 1024   # intermediate output is held in memory
+ROW_OUTPUT_LOCAL_MAX_BYTES = 32 * 1024 * 1024   # when it holds every row, as Python strings
+UBER_MAX_BYTES = 128 * 1024 * 1024    # one HDFS block, the uber-mode default limit
+MIN_SPLIT_BYTES = 64 * 1024 * 1024
+MAX_SPLIT_BYTES = 1024 * 1024 * 1024
+TARGET_MAP_TASKS = 16
+LAYOUT_BYTES_PER_REDUCER = 256 * 1024 * 1024   # rows each layout reducer writes out
+MAX_LAYOUT_REDUCERS = 16
+BYTES_PER_RECORD = 157                # 1K records = 157 KB in the test datasets
+HISTORY_SIZE = 50
+
+def load_history():
+    return mode_history(HISTORY_SIZE)
+
+def fit_mode_costs(mode, history):
+    startup, throughput = DEFAULT_MODE_COSTS[mode]
+    runs = history.get(mode, [])
+    if not runs:
+        return startup, throughput
+    xs = [r["bytes"] for r in runs]
+    ys = [r["seconds"] for r in runs]
+    n = len(runs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if n >= 3 and var_x > 0:
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        intercept = mean_y - slope * mean_x
+        if slope > 0 and intercept >= 0:
+            return intercept, 1.0 / slope
+    # Too few or too similar runs for a line: keep the throughput and
+    # move the startup cost to what was observed
+    observed_startup = min(y - x / throughput for x, y in zip(xs, ys))
+    return max(observed_startup, 0.0), throughput
+
+def estimate_seconds(mode, input_bytes, history):
+    startup, throughput = fit_mode_costs(mode, history)
+    return startup + input_bytes / throughput
+
+def candidate_modes(input_bytes, row_output=False):
+    # row_output: the map output of the job is about as large as its input
+    # and goes through the local runner's in-memory sort
+    modes = [MODE_CLUSTER]
+    if input_bytes <= UBER_MAX_BYTES:
+        modes.append(MODE_UBER)
+    if input_bytes <= (ROW_OUTPUT_LOCAL_MAX_BYTES if row_output else LOCAL_MAX_BYTES):
+        modes.append(MODE_LOCAL)
+    return modes
+
+def split_size(input_bytes):
+    split = input_bytes // TARGET_MAP_TASKS
+    return max(MIN_SPLIT_BYTES, min(MAX_SPLIT_BYTES, split))
+
+def layout_reducers(input_bytes):
+    return max(1, min(MAX_LAYOUT_REDUCERS, -(-input_bytes // LAYOUT_BYTES_PER_REDUCER)))
+
+def choose_plan(input_bytes, map_only=False, forced_mode=None, history=None, row_output=False, writes_files=False):
+    # writes_files: the reducers write the job's rows as side files
+    # (partition_writer.py), so a cluster job spreads them over several
+    # reducers and runs no speculative attempts that would write them twice
+    if history is None:
+        history = load_history()
+    if forced_mode:
+        modes = [forced_mode]
+    else:
+        modes = candidate_modes(input_bytes, row_output and not map_only)
+    estimates = {mode: estimate_seconds(mode, input_bytes, history) for mode in modes}
+    mode = min(estimates, key=estimates.get)
+    reducers = 0 if map_only else 1
+    if writes_files and reducers and mode == MODE_CLUSTER:
+        reducers = layout_reducers(input_bytes)
+    return {
+        "mode": mode,
+        "input_bytes": input_bytes,
+        "estimated_seconds": estimates[mode],
+        "alternatives": estimates,
+        "reducers": reducers,
+        "speculative": not writes_files,
+        "split_bytes": split_size(input_bytes),
+    }
+
+def hadoop_options(plan):
+    reducers = plan["reducers"]
+    if plan["mode"] == MODE_UBER:
+        return [
+            '-D', 'mapreduce.job.ubertask.enable=true',
+            '-D', f'mapreduce.job.ubertask.maxmaps={TARGET_MAP_TASKS}',
+            '-D', 'mapreduce.job.ubertask.maxreduces=1',
+            '-D', f'mapreduce.job.ubertask.maxbytes={max(plan["input_bytes"] + 1, UBER_MAX_BYTES)}',
+            '-D', f'mapreduce.job.reduces={reducers}',
+        ]
+    if plan["mode"] == MODE_CLUSTER:
+        options = [
+            '-D', f'mapreduce.input.fileinputformat.split.minsize={plan["split_bytes"]}',
+            '-D', f'mapreduce.job.reduces={reducers}',
+        ]
+        if not plan.get("speculative", True):
+            options.extend(['-D', 'mapreduce.reduce.speculative=false'])
+        return options
+    return []
+
+def local_command(script_dir, mapper_command, reducer_command, input_paths, hdfs_output_path, env=None,
+                  per_input=False, key_fields=1):
+    # env mirrors the -cmdenv variables of a cluster job; with per_input the
+    # runner reads every input itself, as its own map task (comparison runs);
+    # key_fields mirrors stream.num.map.output.key.fields
+    runner = ['python3', f'{script_dir}/local_runner.py', '--workdir', script_dir,
+               '--mapper', mapper_command]
+    if reducer_command:
+        runner.extend(['--reducer', reducer_command])
+    if key_fields != 1:
+        runner.extend(['--key-fields', str(key_fields)])
+    if per_input:
+        for path in input_paths:
+            runner.extend(['--input', path])
+    runner_cmd = ' '.join([f'{name}={shlex.quote(value)}' for name, value in (env or {}).items()] +
+                          [shlex.quote(c) for c in runner])
+    output = shlex.quote(hdfs_output_path)
+    inputs = ' '.join(shlex.quote(path) for path in input_paths)
+    source = runner_cmd if per_input else f"hdfs dfs -cat {inputs} | {runner_cmd}"
+    return (f"set -o pipefail; hdfs dfs -rm -r -f {output} >/dev/null 2>&1; "
+            f"hdfs dfs -mkdir -p {output} && "
+            f"{source} | "
+            f"hdfs dfs -put -f - {output}/part-00000")
+
+def format_bytes(num_bytes):
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GB"
+
+def format_plan(plan):
+    lines = [
+        "=== Execution Plan ===",
+        f"Input size: {format_bytes(plan['input_bytes'])} (~{plan['input_bytes'] // BYTES_PER_RECORD:,} records)",
+        f"Chosen mode: {plan['mode']} - {MODE_DESCRIPTIONS[plan['mode']]}",
+        f"Estimated time: {plan['estimated_seconds']:.1f} seconds",
+    ]
+    if plan["mode"] == MODE_CLUSTER:
+        lines.append(f"Split size: {format_bytes(plan['split_bytes'])}, reducers: {plan['reducers']}")
+    if len(plan["alternatives"]) > 1:
+        lines.append("Alternatives:")
+        for mode, seconds in sorted(plan["alternatives"].items(), key=lambda item: item[1]):
+            lines.append(f"   • {mode}: {seconds:.1f} seconds")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import os
+import time
+from collections import deque
+from itertools import islice
+
+# GUI log store: the last `capacity` lines in a ring buffer for the log view,
+# and every line appended to a spill file on disk, so long jobs cost neither
+# unbounded memory nor a slow widget. Entries are (seq, timestamp, level, text);
+# seq numbers let the view fetch only what it has not rendered yet.
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+DEFAULT_CAPACITY = 20000
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".epa_big_data", "logs")
+
+def message_level(message):
+    # Untagged messages carry their level as a prefix, as they always have
+    head = message.lstrip()[:8].upper()
+    if head.startswith(("ERROR", "HATA")):
+        return ERROR
+    if head.startswith("WARNING"):
+        return WARNING
+    return INFO
+
+def default_spill_path():
+    return os.path.join(LOG_DIR, time.strftime("gui-%Y%m%d-%H%M%S.log"))
+
+class LogBuffer:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, spill_path=None):
+        self.entries = deque(maxlen=capacity)
+        self.next_seq = 0
+        self.spill_path = spill_path
+        self.spill = None
+        if spill_path:
+            try:
+                os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+                self.spill = open(spill_path, 'a', encoding='utf-8', buffering=1)
+            except OSError:
+                self.spill_path = None
+
+    def add(self, message, level=None):
+        level = message_level(message) if level is None else level
+        now = time.time()
+        for text in str(message).splitlines() or [""]:
+            self.entries.append((self.next_seq, now, level, text))
+            self.next_seq += 1
+            if self.spill is not None:
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+                self.spill.write(f"{stamp} {LEVEL_NAMES[level]:<7} {text}\n")
+
+    @property
+    def dropped(self):
+        # Lines that fell out of the ring buffer, still in the spill file
+        return self.next_seq - len(self.entries)
+
+    def since(self, seq):
+        count = min(max(0, self.next_seq - seq), len(self.entries))
+        return list(islice(self.entries, len(self.entries) - count, None))
+
+    def select(self, min_level=DEBUG, text_filter="", entries=None):
+        text_filter = text_filter.lower()
+        return [entry for entry in (self.entries if entries is None else entries)
+                if entry[2] >= min_level and (not text_filter or text_filter in entry[3].lower())]
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+def format_entry(entry):
+    _, timestamp, _, text = entry
+    return f"[{time.strftime('%H:%M:%S', time.localtime(timestamp))}] {text}"
@@ -0,0 +1,33 @@
+import sys
+
+from aggregates import BucketStats, write_aggregate
+from records import iter_weighted_blocks, parse_columns
+from histogram import parse_column_layouts
+from job_output import TaskCounters
+from wire import RecordWriter
+
+def mapper(columns, layouts):
+    # One pass: bucket counts with the exact min/max of every bucket are
+    # enough for the reducer to place both the median and the deviations
+    # around it, so no samples are kept
+    histograms = [BucketStats(layouts[column], 0) for column in columns]
+    counters = TaskCounters(columns)
+    for blocks, weights in iter_weighted_blocks(sys.stdin, columns, counters=counters):
+        for histogram, block, block_weights in zip(histograms, blocks, weights):
+            histogram.update_block(block, block_weights)
+
+    writer = RecordWriter()
+    for column, histogram in zip(columns, histograms):
+        if histogram.total():
+            write_aggregate(writer, column, histogram)
+    counters.emit(writer)
+
+if __name__ == "__main__":
+    # mad_iqr_mapper.py [columns] [layouts]
+    columns = parse_columns(sys.argv[1:2])
+    try:
+        layouts = parse_column_layouts(sys.argv[2] if len(sys.argv) > 2 else "", columns)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    mapper(columns, layouts)
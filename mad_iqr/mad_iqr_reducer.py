@@ -0,0 +1,165 @@
+import sys
+
+from aggregates import AGGREGATE_KEY, decode, merge_into
+from records import COLUMN_UNITS, ordered_columns
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
+
+# Median absolute deviation and interquartile range from one histogram pass.
+# Every bucket knows the exact min and max of its values, so its values are
+# spread over [min, max] (assumed uniformly for the estimates) and their
+# absolute deviations from the median over a known interval as well: the
+# deviation distribution is a sum of at most two intervals per bucket and
+# its median is found by bisection, with no second pass over the data.
+# The bounds hold whatever the spread inside the buckets is.
+
+MAD_SCALE = 1.4826   # MAD -> standard deviation for normal data
+IQR_SCALE = 1.349    # IQR -> standard deviation for normal data
+BISECTION_STEPS = 60
+
+def process_record(parts, histograms, record):
+    try:
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+        elif len(parts) == 3 and parts[0] == AGGREGATE_KEY:
+            merge_into(histograms, parts[1], decode(parts[2]))
+    except (ValueError, IndexError) as e:
+        print(f"Skipping invalid line: {e}", file=sys.stderr)
+
+def bucket_at_rank(buckets, rank):
+    # (cumulative count before, [count, min, max, ...]) of the bucket holding
+    # the rank-th value; buckets is the sorted list of bucket stats
+    cumulative = 0
+    for bucket in buckets:
+        if cumulative + bucket[0] >= rank:
+            return cumulative, bucket
+        cumulative += bucket[0]
+    return cumulative - buckets[-1][0], buckets[-1]
+
+def quantile(buckets, rank):
+    # Estimate inside the bucket's exact [min, max], and that range as bounds
+    cumulative, bucket = bucket_at_rank(buckets, rank)
+    count, low, high = bucket[:3]
+    fraction = max(0.0, min(1.0, (rank - cumulative) / count))
+    return low + fraction * (high - low), [low, high]
+
+def deviation_pieces(buckets, center):
+    # (count, lowest, highest) deviation intervals, values spread uniformly
+    pieces = []
+    for count, low, high, *_ in buckets:
+        if high <= center or low >= center or high == low:
+            pieces.append((count, min(abs(low - center), abs(high - center)), max(abs(low - center), abs(high - center))))
+        else:
+            below = count * (center - low) / (high - low)
+            pieces.append((below, 0.0, center - low))
+            pieces.append((count - below, 0.0, high - center))
+    return pieces
+
+def count_below(pieces, deviation):
+    total = 0.0
+    for count, low, high in pieces:
+        if deviation >= high:
+            total += count
+        elif deviation > low:
+            total += count * (deviation - low) / (high - low)
+    return total
+
+def median_deviation(pieces, rank):
+    low, high = 0.0, max(piece[2] for piece in pieces)
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        if count_below(pieces, middle) >= rank:
+            high = middle
+        else:
+            low = middle
+    return high
+
+def order_statistic(values, rank):
+    # rank-th smallest of (value, count) pairs
+    cumulative = 0
+    for value, count in sorted(values):
+        cumulative += count
+        if cumulative >= rank:
+            return value
+    return None
+
+def column_result(histogram):
+    buckets = [histogram.stats[i] for i in sorted(histogram.stats)]
+    total = histogram.total()
+    median_rank = total / 2.0
+    median, _ = quantile(buckets, median_rank)
+    # The median's order statistic(s) lie between these two bucket edges
+    lower_rank, upper_rank = max(1, total // 2), total // 2 + 1
+    median_bounds = [bucket_at_rank(buckets, lower_rank)[1][1], bucket_at_rank(buckets, min(upper_rank, total))[1][2]]
+
+    mad = median_deviation(deviation_pieces(buckets, median), median_rank)
+    center_low, center_high = median_bounds
+    lowest = [(max(0.0, low - center_high, center_low - high), count) for count, low, high, *_ in buckets]
+    highest = [(max(high - center_low, center_high - low), count) for count, low, high, *_ in buckets]
+    mad_bounds = [order_statistic(lowest, lower_rank), order_statistic(highest, min(upper_rank, total))]
+
+    q1, q1_bounds = quantile(buckets, total * 0.25)
+    q3, q3_bounds = quantile(buckets, total * 0.75)
+    return {
+        "total_records": total,
+        "buckets_used": len(buckets),
+        "median": median,
+        "median_bounds": median_bounds,
+        "mad": mad,
+        "mad_bounds": mad_bounds,
+        "scaled_mad": MAD_SCALE * mad,
+        "q1": q1,
+        "q3": q3,
+        "q1_bounds": q1_bounds,
+        "q3_bounds": q3_bounds,
+        "iqr": q3 - q1,
+        "iqr_bounds": [max(0.0, q3_bounds[0] - q1_bounds[1]), q3_bounds[1] - q1_bounds[0]],
+        "iqr_sigma": (q3 - q1) / IQR_SCALE,
+    }
+
+def histogram_state(bucket_counts, layout):
+    return {"layout": layout.spec(), "num_buckets": layout.num_buckets,
+            "counts": {str(i): bucket_counts[i] for i in sorted(bucket_counts)}}
+
+def report_dispersion(column, result, histogram):
+    unit = COLUMN_UNITS.get(column, "")
+    print(f"=== Robust Dispersion (MAD / IQR) ===")
+    print(f"Column: {column}")
+    print(f"Total number of records: {result['total_records']}")
+    print(f"Bucket layout: {histogram['layout']}")
+    print(f"Number of buckets used: {result['buckets_used']}")
+    print(f"\nMedian: {result['median']:.4f}{unit}   (between {result['median_bounds'][0]:.4g} and {result['median_bounds'][1]:.4g})")
+    print(f"*** Median absolute deviation: {result['mad']:.4f}{unit} ***   (between {result['mad_bounds'][0]:.4g} and {result['mad_bounds'][1]:.4g})")
+    print(f"Q1: {result['q1']:.4f}{unit}   Q3: {result['q3']:.4f}{unit}")
+    print(f"*** Interquartile range: {result['iqr']:.4f}{unit} ***   (between {result['iqr_bounds'][0]:.4g} and {result['iqr_bounds'][1]:.4g})")
+    print(f"\nRobust standard deviation estimates (exact for normal data):")
+    print(f"1.4826 x MAD: {result['scaled_mad']:.4f}{unit}")
+    print(f"IQR / 1.349:  {result['iqr_sigma']:.4f}{unit}")
+
+def reducer():
+    histograms = {}
+    record = new_record("mad_iqr")
+    for parts in read_records():
+        process_record(parts, histograms, record)
+
+    for column in ordered_columns(histograms):
+        histogram = histograms[column]
+        if not histogram.total():
+            continue
+        record["results"][column] = column_result(histogram)
+        record["state"][column] = {"histogram": histogram_state(histogram.bucket_counts(), histogram.layout)}
+    finish_record(record)
+
+    if not record["results"]:
+        print("=== Robust Dispersion (MAD / IQR) ===")
+        print("ERROR: No data processed!")
+    for i, column in enumerate(record["results"]):
+        if i > 0:
+            print()
+        report_dispersion(column, record["results"][column], record["state"][column]["histogram"])
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
+
+if __name__ == "__main__":
+    reducer()
@@ -1,13 +1,19 @@
 import sys
 import shlex
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLabel, QComboBox, QTextEdit, QListWidget,
-                             QFileDialog, QMessageBox, QLineEdit, QInputDialog)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                             QPushButton, QLabel, QComboBox, QTextEdit, QPlainTextEdit, QListWidget,
+                             QFileDialog, QMessageBox, QLineEdit, QInputDialog,
+                             QAbstractItemView, QDoubleSpinBox, QCheckBox, QDateEdit, QSpinBox,
+                             QDialog, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate, QTimer, QPointF
+from PyQt5.QtGui import QTextCursor, QPainter, QPen, QColor
 import subprocess
 import os
 import stat 
 import time
+import queue
+import tempfile
+import threading
 
 try:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,6 +25,69 @@ try:
 except ImportError:
     print("WARNING: config.py not found. Using default values.")
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common'))
+from records import (DATE_RANGE_ENV, DEDUP_ENV, DEFAULT_COLUMNS, FILTER_ENV, NUMERIC_COLUMNS, REGION_ENV, SOURCES_ENV,
+                     WEIGHT_ENV, comparison_sources, format_sources, split_source)
+from row_filters import FilterError, encode_filter, parse_filter
+from bloom import DEFAULT_FP_RATE
+from wire import HADOOP_OPTIONS as TYPED_BYTES_OPTIONS, TYPED_BYTES, WIRE_ENV
+from site_series import HADOOP_OPTIONS as SECONDARY_SORT_OPTIONS, KEY_FIELDS, PARTITIONER
+from spatial import parse_region, parse_tile_index, select_tiles
+from date_partitions import parse_date_range, parse_manifest, select_partitions
+from epa_job import AGGREGATE_JOBS, LAYOUT_JOBS, ROW_OUTPUT_JOBS, TYPED_BYTES_JOBS, script_subcommand
+from job_archive import ARCHIVE_NAME
+from job_output import RECORD_KEY, load_record, split_output
+from histogram import format_column_layouts, parse_layout_lines, range_layout
+from density import binned_kde, distribution_table, record_histograms, typed_bytes_histograms, write_kde_csv, write_table_csv
+from result_pages import page_ranges, parse_part_listing
+from log_buffer import DEBUG, INFO, WARNING, ERROR, LogBuffer, default_spill_path, format_entry
+from execution_planner import (MODE_LOCAL, MODE_UBER, MODE_CLUSTER, choose_plan, format_bytes, format_plan,
+                               hadoop_options, local_command)
+from run_history import (STATUS_FAILED, STATUS_OK, dataset_fingerprint, flag_slow_runs, format_rate,
+                         list_series, parse_hadoop_counters, record_run, series_runs, slow_run_report)
+
+MODE_APPROXIMATE = "approximate"
+
+EXECUTION_MODES = {
+    "Auto (cost-based planner)": None,
+    "Local (EMR master, no YARN)": MODE_LOCAL,
+    "Cluster - uber mode": MODE_UBER,
+    "Cluster - full job": MODE_CLUSTER,
+    "Approximate (progressive sampling)": MODE_APPROXIMATE,
+}
+APPROXIMATE_FUNCTIONS = ["Skewness", "Median", "Standard Deviation", "90th Percentile"]
+WEBHDFS_URL = "http://localhost:9870"  # NameNode web port on the EMR master (Hadoop 3)
+TILES_ROOT = "/user/hadoop/epa_air_quality/tiles"
+TILE_INDEX_PATH = "/user/hadoop/epa_air_quality/results/gui_tile_index"
+PARTITIONS_ROOT = "/user/hadoop/epa_air_quality/partitions"
+PARTITION_MANIFEST_PATH = "/user/hadoop/epa_air_quality/results/gui_partition_manifest"
+HISTOGRAM_FUNCTIONS = ["Median", "90th Percentile", "Robust Dispersion (MAD / IQR)"]  # mappers take fitted bucket layouts
+WEIGHTED_FUNCTIONS = ["Standard Deviation", "Skewness", "Median", "90th Percentile", "Robust Dispersion (MAD / IQR)"]
+WEIGHT_COLUMN = "observation_count"   # hourly samples behind each daily mean
+NO_FILTER_FUNCTIONS = ["Min-Max Normalization", "Spatial Tile Layout", "Date Partitioning"]
+REMOTE_TIMEOUT_SECONDS = 600
+LOG_RENDER_INTERVAL_MS = 100   # the log view is updated in batches on a timer
+LOG_VIEW_LINES = 5000          # lines kept in the widget, the buffer and spill file keep more
+EVENT_PUMP_SECONDS = 0.1
+LOG_LEVELS = {"All": DEBUG, "Info": INFO, "Warnings": WARNING, "Errors": ERROR}
+INLINE_OUTPUT_BYTES = 1024 * 1024   # larger outputs are shown one page at a time
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DOWNLOAD_DIR = os.path.join(os.path.expanduser("~"), ".epa_big_data", "results")
+HISTORY_TABLE_COLUMNS = ["Started", "Application", "Input", "Rows", "Preparation s", "Execution s",
+                         "Total s", "Throughput", "Rows/s", "Slow"]
+
+def build_ssh_command(command_str):
+    return [
+        "ssh",
+        "-o", "StrictHostKeyChecking=no",
+        "-o", "UserKnownHostsFile=/dev/null",
+        "-o", "PasswordAuthentication=no",
+        "-o", "IdentitiesOnly=yes",
+        "-i", EMR_KEY_PATH,
+        f"{EMR_SSH_USER}@{EMR_MASTER_DNS}",
+        command_str
+    ]
+
 def execute_remote_ssh_command(command_str, window_for_logging=None):
     if not EMR_MASTER_DNS or not EMR_KEY_PATH:
         if window_for_logging:
@@ -53,16 +122,7 @@ def execute_remote_ssh_command(command_str, window_for_logging=None):
         if window_for_logging:
             log_message(window_for_logging, f"WARNING: Failed to check file permissions: {e}")
 
-    ssh_command = [
-        "ssh",
-        "-o", "StrictHostKeyChecking=no",
-        "-o", "UserKnownHostsFile=/dev/null",
-        "-o", "PasswordAuthentication=no",
-        "-o", "IdentitiesOnly=yes",
-        "-i", EMR_KEY_PATH,
-        f"{EMR_SSH_USER}@{EMR_MASTER_DNS}",
-        command_str
-    ]
+    ssh_command = build_ssh_command(command_str)
     
     if window_for_logging:
         log_message(window_for_logging, f"SSH command prepared.") 
@@ -76,15 +136,7 @@ def execute_remote_ssh_command(command_str, window_for_logging=None):
             text=True,
             env=os.environ.copy()
         )
-        stdout, stderr = process.communicate(timeout=600)
-        
-        if window_for_logging:
-            if stdout:
-                log_message(window_for_logging, "--- Uzak Komut STDOUT ---")
-                log_message(window_for_logging, stdout)
-            if stderr:
-                log_message(window_for_logging, "--- Uzak Komut STDERR ---")
-                log_message(window_for_logging, stderr)
+        stdout, stderr = collect_process_output(process, window_for_logging, REMOTE_TIMEOUT_SECONDS)
         
         if process.returncode != 0:
             if window_for_logging:
@@ -97,14 +149,155 @@ def execute_remote_ssh_command(command_str, window_for_logging=None):
         if window_for_logging:
             log_message(window_for_logging, "ERROR: The remote command timed out.")
         process.kill()
-        stdout, stderr = process.communicate()
-        return None, "Time out" + stderr
+        process.wait()
+        return None, "Time out"
     except Exception as e:
         if window_for_logging:
             log_message(window_for_logging, f"ERROR: Exception while running subprocess: {type(e).__name__}: {e}")
         return None, str(e)
+def collect_process_output(process, window, timeout):
+    # Both pipes are drained on reader threads, so a chatty stderr (the Hadoop
+    # client) cannot fill up and block the command; lines go to the log as
+    # they arrive while the event loop keeps running
+    lines = queue.Queue()
+    outputs = {"stdout": [], "stderr": []}
+
+    def read_stream(stream, name):
+        for line in stream:
+            lines.put((name, line))
+        lines.put((name, None))
+
+    for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=read_stream, args=(stream, name), daemon=True).start()
+    deadline = time.time() + timeout
+    open_streams = 2
+    while open_streams:
+        try:
+            name, line = lines.get(timeout=0.05)
+        except queue.Empty:
+            if window:
+                pump_events(window)
+            if time.time() > deadline:
+                raise subprocess.TimeoutExpired(process.args, timeout)
+            continue
+        if line is None:
+            open_streams -= 1
+            continue
+        outputs[name].append(line)
+        if window:
+            log_message(window, f"[{name}] {line.rstrip()}", DEBUG)
+    process.wait()
+    return ''.join(outputs["stdout"]), ''.join(outputs["stderr"])
+
+def stream_remote_ssh_command(command_str, window, on_line):
+    # Runs a remote command and hands its stdout to on_line as lines arrive,
+    # keeping the GUI responsive. Stops early (killing the remote pipeline)
+    # when on_line returns False or the user presses Stop.
+    process = subprocess.Popen(
+        build_ssh_command(command_str),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=os.environ.copy()
+    )
+    lines = queue.Queue()
+    stderr_lines = []
+
+    def read_stream(stream, name):
+        for line in stream:
+            lines.put((name, line))
+        lines.put((name, None))
+
+    # stderr is drained on its own reader thread as in collect_process_output,
+    # so a chatty remote stderr cannot fill its pipe and stall the command
+    readers = [threading.Thread(target=read_stream, args=(stream, name), daemon=True)
+               for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr"))]
+    for reader in readers:
+        reader.start()
+    completed = False
+    while True:
+        try:
+            name, line = lines.get(timeout=0.05)
+        except queue.Empty:
+            QApplication.processEvents()
+            if window.stop_requested:
+                break
+            continue
+        if name == "stderr":
+            if line is not None:
+                stderr_lines.append(line)
+                log_message(window, f"[stderr] {line.rstrip()}", DEBUG)
+            continue
+        if line is None:
+            completed = process.wait() == 0
+            break
+        if on_line(line.rstrip('\n')) is False or window.stop_requested:
+            break
+        pump_events(window)
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+    readers[1].join(timeout=5)
+    while not lines.empty():
+        name, line = lines.get_nowait()
+        if name == "stderr" and line is not None:
+            stderr_lines.append(line)
+    return completed, "".join(stderr_lines)
+
+class OutputDownload(QThread):
+    # Streams every part file of a job output into a local file in chunks,
+    # off the GUI thread; the file appears under its name once complete
+    progress = pyqtSignal(int)
+    finished_download = pyqtSignal(str, str)   # local path, error ("" on success)
+
+    def __init__(self, hdfs_output_path, local_path):
+        super().__init__()
+        self.hdfs_output_path = hdfs_output_path
+        self.local_path = local_path
+        self.cancelled = False
+
+    def run(self):
+        temp_path = self.local_path + ".part"
+        error = ""
+        try:
+            with open(temp_path, 'wb') as output, tempfile.TemporaryFile() as stderr:
+                command = f"hdfs dfs -cat {shlex.quote(self.hdfs_output_path.rstrip('/'))}/part-*"
+                process = subprocess.Popen(build_ssh_command(command), stdout=subprocess.PIPE, stderr=stderr)
+                written = 0
+                while not self.cancelled:
+                    chunk = process.stdout.read(DOWNLOAD_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    written += len(chunk)
+                    self.progress.emit(written)
+                if self.cancelled:
+                    process.kill()
+                    error = "cancelled"
+                elif process.wait() != 0:
+                    stderr.seek(0)
+                    error = stderr.read().decode('utf-8', errors='replace').strip() or "hdfs dfs -cat failed"
+                process.wait()
+        except OSError as e:
+            error = str(e)
+        if error:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        else:
+            os.replace(temp_path, self.local_path)
+        self.finished_download.emit(self.local_path, error)
+
 app = None
 
+def get_hdfs_input_size(input_paths, window):
+    paths = ' '.join(shlex.quote(path) for path in input_paths)
+    stdout_du, stderr_du = execute_remote_ssh_command(f"hdfs dfs -du -s {paths}", window)
+    try:
+        return sum(int(line.split()[0]) for line in stdout_du.strip().splitlines())
+    except (AttributeError, IndexError, ValueError):
+        log_message(window, f"WARNING: Could not determine the input size, assuming a large dataset. {stderr_du}")
+        return 10 * 1024 ** 3
+
 def init_ui(window):
     window.setWindowTitle('BLM4120/4821 - Big Data Analysis Tool')
     window.setGeometry(100, 100, 900, 700)  
@@ -163,12 +356,114 @@ def init_ui(window):
         "Skewness", 
         "Median", 
         "Standard Deviation", 
-        "90th Percentile"
+        "90th Percentile",
+        "Robust Dispersion (MAD / IQR)",
+        "Covariance / Correlation",
+        "Distinct Counts (HyperLogLog)",
+        "Top-K Heavy Hitters",
+        "Spike Detection (per site)",
+        "Spatial Tile Layout",
+        "Date Partitioning"
     ]
     combo_functions.addItems(functions)
     function_layout.addWidget(lbl_function)
     function_layout.addWidget(combo_functions)
     main_layout.addLayout(function_layout)
+    columns_layout = QHBoxLayout()
+    lbl_columns = QLabel('Columns:')
+    lbl_columns.setMinimumWidth(120)
+    list_columns = QListWidget()
+    list_columns.setSelectionMode(QAbstractItemView.MultiSelection)
+    list_columns.setMaximumHeight(80)
+    list_columns.addItems(NUMERIC_COLUMNS)
+    for i in range(list_columns.count()):
+        if list_columns.item(i).text() in DEFAULT_COLUMNS:
+            list_columns.item(i).setSelected(True)
+    columns_layout.addWidget(lbl_columns)
+    columns_layout.addWidget(list_columns)
+    main_layout.addLayout(columns_layout)
+    region_layout = QHBoxLayout()
+    lbl_region = QLabel('Region (optional):')
+    lbl_region.setMinimumWidth(120)
+    entry_region = QLineEdit()
+    entry_region.setPlaceholderText("bbox:min_lat,min_lon,max_lat,max_lon  or  polygon:lat lon;lat lon;lat lon")
+    entry_region.setToolTip("Only rows inside the region are analyzed; with a spatial tile layout only the overlapping tiles are read")
+    region_layout.addWidget(lbl_region)
+    region_layout.addWidget(entry_region)
+    main_layout.addLayout(region_layout)
+    date_layout = QHBoxLayout()
+    check_dates = QCheckBox('Date range:')
+    check_dates.setMinimumWidth(120)
+    check_dates.setToolTip("Only rows in the date range are analyzed; with a date partitioning only the matching months are read")
+    date_start = QDateEdit(QDate(2018, 1, 1))
+    date_end = QDateEdit(QDate(2020, 12, 31))
+    for date_edit in (date_start, date_end):
+        date_edit.setCalendarPopup(True)
+        date_edit.setDisplayFormat("yyyy-MM-dd")
+        date_edit.setEnabled(False)
+        check_dates.toggled.connect(date_edit.setEnabled)
+    date_layout.addWidget(check_dates)
+    date_layout.addWidget(date_start)
+    date_layout.addWidget(QLabel('to'))
+    date_layout.addWidget(date_end)
+    date_layout.addStretch()
+    main_layout.addLayout(date_layout)
+    filter_layout = QHBoxLayout()
+    lbl_filter = QLabel('Row filter (optional):')
+    lbl_filter.setMinimumWidth(120)
+    entry_filter = QLineEdit()
+    entry_filter.setPlaceholderText("e.g. state_name = 'California' and aqi > 100 and date_local between '2019-06-01' and '2019-08-31'")
+    entry_filter.setToolTip("Only rows matching the expression are analyzed; the mappers apply it while scanning, "
+                            "no filtered copy is written. Operators: = != < <= > >= in (...) between, and / or / not")
+    filter_layout.addWidget(lbl_filter)
+    filter_layout.addWidget(entry_filter)
+    main_layout.addLayout(filter_layout)
+    compare_layout = QHBoxLayout()
+    lbl_compare = QLabel('Compare with (optional):')
+    lbl_compare.setMinimumWidth(120)
+    entry_compare = QLineEdit()
+    entry_compare.setPlaceholderText("e.g. ozone=/user/hadoop/epa_air_quality/ozone.csv, /user/hadoop/epa_air_quality/national.csv")
+    entry_compare.setToolTip("Further HDFS inputs, comma separated, optionally as label=path: one job computes the "
+                             "statistic for the HDFS Path above and every input listed here, side by side")
+    compare_layout.addWidget(lbl_compare)
+    compare_layout.addWidget(entry_compare)
+    main_layout.addLayout(compare_layout)
+    dedup_layout = QHBoxLayout()
+    check_dedup = QCheckBox('Drop duplicate site-days')
+    check_dedup.setMinimumWidth(120)
+    check_dedup.setToolTip("The mappers keep the first row of every (latitude, longitude, date) they read and drop "
+                           f"the others, using a Bloom filter: a row is wrongly dropped with probability <= {DEFAULT_FP_RATE:g}")
+    entry_dedup_filter = QLineEdit()
+    entry_dedup_filter.setPlaceholderText("Prebuilt filter (optional), e.g. /user/hadoop/epa_air_quality/national.bloom")
+    entry_dedup_filter.setToolTip("HDFS path of a filter made with 'python3 bloom.py build': rows of site-days it holds "
+                                  "are dropped from every input except the one it was built from")
+    dedup_layout.addWidget(check_dedup)
+    dedup_layout.addWidget(entry_dedup_filter)
+    check_weighted = QCheckBox('Weight rows by observation count')
+    check_weighted.setToolTip("Each daily mean counts once per hourly sample behind it (moments and quantiles "
+                              f"of {', '.join(WEIGHTED_FUNCTIONS)})")
+    dedup_layout.addWidget(check_weighted)
+    main_layout.addLayout(dedup_layout)
+    execution_layout = QHBoxLayout()
+    lbl_execution = QLabel('Execution Mode:')
+    lbl_execution.setMinimumWidth(120)
+    combo_execution = QComboBox()
+    combo_execution.addItems(list(EXECUTION_MODES))
+    execution_layout.addWidget(lbl_execution)
+    execution_layout.addWidget(combo_execution)
+    lbl_target = QLabel('Approx. target ±%:')
+    spin_target = QDoubleSpinBox()
+    spin_target.setRange(0.0, 50.0)
+    spin_target.setSingleStep(0.5)
+    spin_target.setValue(1.0)
+    spin_target.setToolTip("Progressive mode stops once mean and std dev are within this relative interval (0 = read everything)")
+    execution_layout.addWidget(lbl_target)
+    execution_layout.addWidget(spin_target)
+    check_typed_bytes = QCheckBox('Binary map output (typed bytes)')
+    check_typed_bytes.setToolTip("Statistic jobs ship their partial aggregates as Hadoop typed bytes "
+                                 "instead of base64 text lines; other jobs always use text")
+    execution_layout.addWidget(check_typed_bytes)
+    main_layout.addLayout(execution_layout)
     btn_run = QPushButton('Start Analysis')
     btn_run.setStyleSheet("""
         QPushButton {
@@ -185,14 +480,41 @@ def init_ui(window):
             background-color: #cccccc;
         }
     """)
-    main_layout.addWidget(btn_run)
+    btn_stop = QPushButton('Stop')
+    btn_stop.setEnabled(False)
+    btn_stop.setToolTip("Accept the current approximate estimate and stop reading")
+    run_layout = QHBoxLayout()
+    btn_history = QPushButton('Run History...')
+    btn_history.setToolTip("Latency and throughput of earlier runs per dataset and algorithm")
+    run_layout.addWidget(btn_run, 4)
+    run_layout.addWidget(btn_stop, 1)
+    run_layout.addWidget(btn_history, 1)
+    btn_distribution = QPushButton('Distribution...')
+    btn_distribution.setToolTip("Histogram and kernel density of the last median, percentile or MAD/IQR result, "
+                                "drawn from its merged bucket counts")
+    btn_distribution.setEnabled(False)
+    run_layout.addWidget(btn_distribution, 1)
+    main_layout.addLayout(run_layout)
     lbl_status = QLabel('Durum ve Loglar:')
     lbl_status.setStyleSheet("font-weight: bold; margin-top: 10px;")
-    text_status_log = QTextEdit()
+    log_filter_layout = QHBoxLayout()
+    combo_log_level = QComboBox()
+    combo_log_level.addItems(list(LOG_LEVELS))
+    combo_log_level.setToolTip("Hide log lines below this level (remote command output is 'All')")
+    entry_log_filter = QLineEdit()
+    entry_log_filter.setPlaceholderText("Filter log lines...")
+    lbl_log_file = QLabel()
+    lbl_log_file.setStyleSheet("color: #888888;")
+    log_filter_layout.addWidget(QLabel('Level:'))
+    log_filter_layout.addWidget(combo_log_level)
+    log_filter_layout.addWidget(entry_log_filter, 1)
+    log_filter_layout.addWidget(lbl_log_file)
+    text_status_log = QPlainTextEdit()
     text_status_log.setReadOnly(True)
+    text_status_log.setMaximumBlockCount(LOG_VIEW_LINES)
     text_status_log.setMaximumHeight(200) 
     text_status_log.setStyleSheet("""
-        QTextEdit {
+        QPlainTextEdit {
             background-color: #2b2b2b;
             color: #ffffff;
             font-family: 'Consolas', monospace;
@@ -201,6 +523,7 @@ def init_ui(window):
     """)
     
     main_layout.addWidget(lbl_status)
+    main_layout.addLayout(log_filter_layout)
     main_layout.addWidget(text_status_log)
     lbl_results = QLabel('Results:')
     lbl_results.setStyleSheet("font-weight: bold; margin-top: 10px;")
@@ -216,18 +539,84 @@ def init_ui(window):
             border-radius: 3px;
         }
     """)
+    pager_layout = QHBoxLayout()
+    btn_page_head = QPushButton('⏮ Head')
+    btn_page_prev = QPushButton('◀')
+    spin_page = QSpinBox()
+    spin_page.setMinimum(1)
+    lbl_page_count = QLabel('of 0')
+    btn_page_next = QPushButton('▶')
+    btn_page_tail = QPushButton('Tail ⏭')
+    btn_download = QPushButton('Download full output...')
+    btn_download.setToolTip("Write every part file of the output to a local file in the background")
+    for widget in (btn_page_head, btn_page_prev, QLabel('Page'), spin_page, lbl_page_count, btn_page_next, btn_page_tail):
+        pager_layout.addWidget(widget)
+    pager_layout.addStretch(1)
+    pager_layout.addWidget(btn_download)
     main_layout.addWidget(lbl_results)
     main_layout.addWidget(text_results)
+    main_layout.addLayout(pager_layout)
     window.combo_categories = combo_categories
     window.combo_datasets = combo_datasets  
     window.entry_hdfs_path = entry_hdfs_path
     window.combo_functions = combo_functions
+    window.list_columns = list_columns
+    window.entry_region = entry_region
+    window.check_dates = check_dates
+    window.date_start = date_start
+    window.date_end = date_end
+    window.entry_filter = entry_filter
+    window.entry_compare = entry_compare
+    window.check_dedup = check_dedup
+    window.entry_dedup_filter = entry_dedup_filter
+    window.check_weighted = check_weighted
+    window.combo_execution = combo_execution
+    window.spin_target = spin_target
+    window.check_typed_bytes = check_typed_bytes
+    window.btn_stop = btn_stop
+    window.stop_requested = False
+    window.last_result_record = None
+    window.btn_distribution = btn_distribution
     window.text_status_log = text_status_log
+    window.combo_log_level = combo_log_level
+    window.entry_log_filter = entry_log_filter
+    window.log_buffer = LogBuffer(spill_path=default_spill_path())
+    window.log_rendered_seq = 0
+    window.last_event_pump = 0.0
+    if window.log_buffer.spill_path:
+        lbl_log_file.setText("Full log: " + os.path.basename(window.log_buffer.spill_path))
+        lbl_log_file.setToolTip(window.log_buffer.spill_path)
+    log_timer = QTimer(window)
+    log_timer.setInterval(LOG_RENDER_INTERVAL_MS)
+    log_timer.timeout.connect(lambda: flush_log(window))
+    log_timer.start()
+    window.log_timer = log_timer
+    combo_log_level.currentTextChanged.connect(lambda: refresh_log_view(window))
+    entry_log_filter.textChanged.connect(lambda: refresh_log_view(window))
     window.text_results = text_results
     window.btn_run = btn_run
+    window.btn_page_head = btn_page_head
+    window.btn_page_prev = btn_page_prev
+    window.spin_page = spin_page
+    window.lbl_page_count = lbl_page_count
+    window.btn_page_next = btn_page_next
+    window.btn_page_tail = btn_page_tail
+    window.btn_download = btn_download
+    window.result_output = None
+    window.download = None
+    btn_page_head.clicked.connect(lambda: show_output_page(window, 0))
+    btn_page_prev.clicked.connect(lambda: show_output_page(window, window.result_output["page"] - 1))
+    btn_page_next.clicked.connect(lambda: show_output_page(window, window.result_output["page"] + 1))
+    btn_page_tail.clicked.connect(lambda: show_output_page(window, len(window.result_output["pages"]) - 1))
+    spin_page.editingFinished.connect(lambda: show_output_page(window, spin_page.value() - 1))
+    btn_download.clicked.connect(lambda: toggle_download(window))
+    update_pager(window)
     combo_categories.currentTextChanged.connect(lambda: update_dataset_options(window))
     combo_datasets.currentTextChanged.connect(lambda: update_hdfs_path_from_selection(window))
     btn_run.clicked.connect(lambda: handle_run_analysis(window))
+    btn_stop.clicked.connect(lambda: request_stop(window))
+    btn_history.clicked.connect(lambda: show_run_history(window))
+    btn_distribution.clicked.connect(lambda: show_distribution(window))
     update_dataset_options(window)  
     window.show()
 
@@ -326,14 +715,552 @@ def update_hdfs_path_from_selection(window):
         return
     window.entry_hdfs_path.setText(path)
 
-def log_message(window, message):
-    window.text_status_log.append(message)
-    QApplication.processEvents()
+def log_message(window, message, level=None):
+    # Only buffered here; the render timer draws new lines in batches
+    window.log_buffer.add(message, level)
+    pump_events(window)
+
+def pump_events(window):
+    # Analyses run on the GUI thread, so let the event loop (and the log
+    # timer) run every EVENT_PUMP_SECONDS rather than after every line
+    now = time.time()
+    if now - window.last_event_pump >= EVENT_PUMP_SECONDS:
+        window.last_event_pump = now
+        QApplication.processEvents()
+
+def log_view_entries(window, entries=None):
+    return window.log_buffer.select(LOG_LEVELS[window.combo_log_level.currentText()],
+                                    window.entry_log_filter.text().strip(), entries)
+
+def flush_log(window):
+    entries = window.log_buffer.since(window.log_rendered_seq)
+    if not entries:
+        return
+    window.log_rendered_seq = window.log_buffer.next_seq
+    shown = log_view_entries(window, entries)
+    if shown:
+        window.text_status_log.appendPlainText('\n'.join(format_entry(e) for e in shown))
+
+def refresh_log_view(window):
+    # Re-render the buffered lines after the level or the filter changed
+    shown = log_view_entries(window)[-LOG_VIEW_LINES:]
+    window.text_status_log.setPlainText('\n'.join(format_entry(e) for e in shown))
+    window.text_status_log.moveCursor(QTextCursor.End)
+    window.log_rendered_seq = window.log_buffer.next_seq
 
 def show_results(window, result_text):
     window.text_results.setText(result_text)
     QApplication.processEvents()
 
+def request_stop(window):
+    window.stop_requested = True
+    log_message(window, "Stop requested, keeping the current estimate...")
+
+def format_progressive_results(estimates, progress, finished):
+    blocks, bytes_read, total_bytes, rows, elapsed = progress
+    fraction = bytes_read / total_bytes * 100 if total_bytes else 0.0
+    status = "final" if finished else "updating"
+    lines = [
+        f"=== Progressive Estimate (95% confidence, {status}) ===",
+        f"Data read: {fraction:.1f}% ({blocks} random blocks, {rows:,} rows) in {elapsed:.1f} seconds",
+    ]
+    for column, statistics in estimates.items():
+        lines.append(f"\n--- {column} ---")
+        for statistic, (value, low, high) in statistics.items():
+            relative = (high - low) / 2 / abs(value) * 100 if value else 0.0
+            lines.append(f"{statistic:<9} {value:12.4f}   [{low:.4f}, {high:.4f}]   ±{relative:.2f}%")
+    return "\n".join(lines)
+
+def target_reached(estimates, target_percent):
+    if target_percent <= 0 or not estimates:
+        return False
+    for statistics in estimates.values():
+        for statistic in ("mean", "std_dev"):
+            if statistic not in statistics:
+                return False
+            value, low, high = statistics[statistic]
+            if value == 0 or (high - low) / 2 / abs(value) * 100 > target_percent:
+                return False
+    return True
+
+def run_progressive_analysis(window, script_dir, hdfs_input_path, columns_arg):
+    estimates = {}
+    progress = [0, 0, 0, 0, 0.0]
+    state = {"finished": False, "target": False}
+    target_percent = window.spin_target.value()
+
+    def on_line(line):
+        parts = line.split('\t')
+        try:
+            if parts[0] == "ESTIMATE" and len(parts) == 6:
+                estimates.setdefault(parts[1], {})[parts[2]] = tuple(float(v) for v in parts[3:6])
+            elif parts[0] == "PROGRESS" and len(parts) == 6:
+                progress[:] = [int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]), float(parts[5])]
+                show_results(window, format_progressive_results(estimates, progress, False))
+                if target_reached(estimates, target_percent):
+                    state["target"] = True
+                    return False
+            elif parts[0] == "DONE":
+                state["finished"] = True
+        except ValueError:
+            pass
+        return True
+
+    command = (f"cd {shlex.quote(script_dir)} && set -o pipefail && "
+               f"python3 sampling_mapper.py {shlex.quote(columns_arg)} --input {shlex.quote(hdfs_input_path)} "
+               f"--webhdfs {WEBHDFS_URL} --user {shlex.quote(EMR_SSH_USER)} | "
+               f"python3 progressive_reducer.py")
+    log_message(window, "Starting progressive sampling on the EMR master node...")
+    window.stop_requested = False
+    window.btn_stop.setEnabled(True)
+    try:
+        completed, stderr = stream_remote_ssh_command(command, window, on_line)
+    finally:
+        window.btn_stop.setEnabled(False)
+    if state["target"]:
+        log_message(window, f"Target precision of ±{target_percent:.2f}% reached, sampling stopped.")
+    elif window.stop_requested:
+        log_message(window, "Sampling stopped by the user.")
+    elif not completed and not state["finished"]:
+        log_message(window, f"ERROR: Progressive sampling failed. {stderr}")
+    if estimates:
+        show_results(window, format_progressive_results(estimates, progress, state["finished"]))
+    else:
+        show_results(window, f"No estimate could be computed.\n{stderr}")
+
+def task_command(script, args, use_archive):
+    # One archive for every task when it was built, the loose script otherwise
+    subcommand = script_subcommand(script) if use_archive else None
+    if subcommand:
+        return f"python3 {ARCHIVE_NAME} {subcommand}{args}"
+    return f"./{script}{args}"
+
+def read_layout_index(window, index_path, job, hdfs_input_path):
+    # Index output of the last layout job, if it was built from this input
+    index_output, _ = execute_remote_ssh_command(f"hdfs dfs -cat {index_path}/part-*", window)
+    index_record = load_record(index_output or "", job=job)
+    if index_record is None or index_record["state"].get("source") != hdfs_input_path:
+        return None
+    return index_output
+
+def region_layout_inputs(window, region, hdfs_input_path):
+    index_output = read_layout_index(window, TILE_INDEX_PATH, "spatial_layout", hdfs_input_path)
+    if index_output is None:
+        return None
+    tiles = parse_tile_index(index_output)
+    selected = select_tiles(tiles, region)
+    log_message(window, f"Region overlaps {len(selected)} of {len(tiles)} tiles.")
+    return sum(t["rows"] for t in selected), [t["path"] for t in selected], "spatial tiles"
+
+def date_layout_inputs(window, date_range, hdfs_input_path):
+    index_output = read_layout_index(window, PARTITION_MANIFEST_PATH, "date_partitioning", hdfs_input_path)
+    if index_output is None:
+        return None
+    partitions = parse_manifest(index_output)
+    selected = select_partitions(partitions, *date_range)
+    log_message(window, f"Date range matches {len(selected)} of {len(partitions)} monthly partitions.")
+    return sum(p["rows"] for p in selected), [p["path"] for p in selected], "date partitions"
+
+def catalog_layouts(manifest_records, columns):
+    # Exact column ranges from the min/max the partitioning job recorded,
+    # one record per reduce task
+    ranges = {}
+    for stats in (s for record in manifest_records for s in record["results"].values()):
+        for column in columns:
+            if column not in stats.get("min", {}):
+                continue
+            low, high = ranges.get(column, (stats["min"][column], stats["max"][column]))
+            ranges[column] = (min(low, stats["min"][column]), max(high, stats["max"][column]))
+    # The mappers drop negative values
+    return {column: range_layout(max(low, 0.0), high) for column, (low, high) in ranges.items()}
+
+def histogram_layouts(window, script_dir, hdfs_input_path, columns):
+    # Bucket layouts from the partition catalog of this input when there is
+    # one, from a sampling pre-pass over a few blocks otherwise
+    manifest_output = read_layout_index(window, PARTITION_MANIFEST_PATH, "date_partitioning", hdfs_input_path)
+    if manifest_output is not None:
+        records, _ = split_output(manifest_output)
+        layouts = catalog_layouts([r for r in records if r.get("job") == "date_partitioning"], columns)
+        if layouts:
+            log_message(window, "Histogram ranges taken from the date partition catalog.")
+            return layouts
+    command = (f"cd {shlex.quote(script_dir)} && python3 range_probe.py {shlex.quote(','.join(columns))} "
+               f"--input {shlex.quote(hdfs_input_path)} --webhdfs {WEBHDFS_URL} --user {shlex.quote(EMR_SSH_USER)}")
+    log_message(window, "Sampling a few blocks of the input to fit the histogram ranges...")
+    probe_output, probe_stderr = execute_remote_ssh_command(command, window)
+    try:
+        return parse_layout_lines(probe_output or "")
+    except ValueError as layout_error:
+        log_message(window, f"WARNING: Invalid histogram layout from the sampling pass: {layout_error}")
+        return {}
+
+def minmax_bounds(record):
+    # {column: (min, max)} of a Min-Max stage 1 record, and the sources of a
+    # comparison run (keyed source::column), whose bounds are merged so the
+    # one stage 2 input is scaled over every compared dataset
+    bounds = {}
+    sources = []
+    for key, result in record["results"].items():
+        if 'global_min' not in result or 'global_max' not in result:
+            continue
+        source, column = split_source(key)
+        if source is not None and source not in sources:
+            sources.append(source)
+        low, high = bounds.get(column, (result['global_min'], result['global_max']))
+        bounds[column] = (min(low, result['global_min']), max(high, result['global_max']))
+    return bounds, sources
+
+def result_pages_command(script_dir, action, path, extra=""):
+    return (f"cd {shlex.quote(script_dir)} && python3 result_pages.py {action} {shlex.quote(path)}{extra} "
+            f"--webhdfs {WEBHDFS_URL} --user {shlex.quote(EMR_SSH_USER)}")
+
+def read_job_output(window, script_dir, hdfs_output_path):
+    # Every part file counts. Small outputs are read whole; larger ones open
+    # on their first page (plus the rows of the last page, where reducers put
+    # their RESULT_JSON record) and the pager fetches other pages on demand
+    listing, stderr = execute_remote_ssh_command(result_pages_command(script_dir, "list", hdfs_output_path), window)
+    parts = parse_part_listing(listing or "")
+    total_bytes = sum(size for _, size in parts)
+    window.result_output = {"script_dir": script_dir, "path": hdfs_output_path, "parts": parts,
+                            "pages": page_ranges(parts), "page": 0, "total_bytes": total_bytes}
+    update_pager(window)
+    if listing is None or total_bytes <= INLINE_OUTPUT_BYTES:
+        if listing is None:
+            log_message(window, "WARNING: Could not list the output over WebHDFS, reading it whole.")
+        return execute_remote_ssh_command(f"hdfs dfs -cat {shlex.quote(hdfs_output_path.rstrip('/'))}/part-*", window)
+    log_message(window, f"Output holds {format_bytes(total_bytes)} in {len(parts)} part file(s), showing it page by page.")
+    head_text, stderr = fetch_output_page(window, 0)
+    if head_text is None:
+        return None, stderr
+    tail_text, _ = fetch_output_page(window, len(window.result_output["pages"]) - 1)
+    record_lines = [line for line in (tail_text or "").splitlines() if line.startswith(RECORD_KEY + "\t")]
+    return '\n'.join([output_page_header(window.result_output), head_text.rstrip('\n')] + record_lines), stderr
+
+def fetch_output_page(window, page):
+    path, offset, length = window.result_output["pages"][page]
+    command = result_pages_command(window.result_output["script_dir"], "page", path,
+                                   f" --offset {offset} --length {length}")
+    return execute_remote_ssh_command(command, window)
+
+def output_page_header(output):
+    path, offset, length = output["pages"][output["page"]]
+    return (f"=== Output: {len(output['parts'])} part file(s), {format_bytes(output['total_bytes'])} - "
+            f"page {output['page'] + 1} of {len(output['pages'])} ({path.rsplit('/', 1)[-1]}, "
+            f"bytes {offset:,}-{offset + length:,}) ===")
+
+def show_output_page(window, page):
+    output = window.result_output
+    if not output or not output["pages"]:
+        return
+    page = max(0, min(page, len(output["pages"]) - 1))
+    text, stderr = fetch_output_page(window, page)
+    if text is None:
+        log_message(window, f"ERROR: Could not read page {page + 1}. {stderr}")
+        return
+    output["page"] = page
+    _, report = split_output(text)
+    show_results(window, output_page_header(output) + "\n" + report)
+    update_pager(window)
+
+def update_pager(window):
+    output = window.result_output
+    num_pages = len(output["pages"]) if output else 0
+    paged = output is not None and output["total_bytes"] > INLINE_OUTPUT_BYTES
+    page = output["page"] if output else 0
+    window.spin_page.blockSignals(True)
+    window.spin_page.setMaximum(max(1, num_pages))
+    window.spin_page.setValue(page + 1)
+    window.spin_page.blockSignals(False)
+    window.lbl_page_count.setText(f"of {num_pages}")
+    window.spin_page.setEnabled(paged)
+    for widget in (window.btn_page_head, window.btn_page_prev):
+        widget.setEnabled(paged and page > 0)
+    for widget in (window.btn_page_next, window.btn_page_tail):
+        widget.setEnabled(paged and page < num_pages - 1)
+    window.btn_download.setEnabled(window.download is not None or (output is not None and bool(output["parts"])))
+
+def toggle_download(window):
+    if window.download is not None:
+        window.download.cancelled = True
+        return
+    output = window.result_output
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    default_path = os.path.join(DOWNLOAD_DIR, output["path"].rstrip('/').rsplit('/', 1)[-1] + ".txt")
+    local_path, _ = QFileDialog.getSaveFileName(window, "Save Full Output", default_path)
+    if not local_path:
+        return
+    download = OutputDownload(output["path"], local_path)
+    total = format_bytes(output["total_bytes"])
+    download.progress.connect(lambda written: window.btn_download.setText(
+        f"Cancel download ({format_bytes(written)} of {total})"))
+    download.finished_download.connect(lambda path, error: download_finished(window, path, error))
+    window.download = download
+    window.btn_download.setText("Cancel download")
+    log_message(window, f"Downloading {output['path']} ({total}) to {local_path} in the background...")
+    download.start()
+
+def download_finished(window, local_path, error):
+    window.download.wait()
+    window.download = None
+    window.btn_download.setText('Download full output...')
+    if error:
+        log_message(window, f"WARNING: Download of the full output stopped: {error}")
+    else:
+        log_message(window, f"Full output saved to {local_path}")
+    update_pager(window)
+
+def dataset_label(window, hdfs_input_path, region_spec, date_spec, filter_text, sources=()):
+    label = hdfs_input_path
+    if window.combo_categories.currentText() != "Manual Path Entry" and window.combo_datasets.currentText():
+        label = window.combo_datasets.currentText()
+    if region_spec:
+        label += f" | region {region_spec}"
+    if date_spec:
+        label += f" | dates {date_spec}"
+    if filter_text:
+        label += f" | where {filter_text}"
+    if sources:
+        label += " | vs " + ", ".join(path for _, path in sources[1:])
+    return label
+
+def save_run(window, run):
+    if record_run(run) is None:
+        log_message(window, "WARNING: The run could not be saved to the run history.")
+        return
+    if run["status"] != STATUS_OK:
+        return
+    previous = series_runs(run["fingerprint"], run["algorithm"], run["mode"], before=run["started"])
+    report = slow_run_report(run, previous)
+    if report:
+        log_message(window, f"WARNING: Slower than the history of {run['algorithm']} on this dataset: {report}")
+
+class TrendChart(QWidget):
+    # Latency (top) and throughput (bottom) of one run series over time;
+    # runs slower than their history are drawn in red
+
+    MARGIN = 48
+
+    def __init__(self):
+        super().__init__()
+        self.runs = []
+        self.setMinimumHeight(260)
+
+    def set_runs(self, runs):
+        self.runs = runs
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), QColor("white"))
+        if not self.runs:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No runs recorded for this selection")
+            return
+        half = self.height() // 2
+        panels = [
+            ("Execution (s)", [r["execution_seconds"] for r in self.runs], 0),
+            ("Throughput (MB/s)", [(r["bytes_per_second"] or 0.0) / (1024 * 1024) for r in self.runs], half),
+        ]
+        for title, values, top in panels:
+            self.draw_panel(painter, title, values, top, half)
+
+    def draw_panel(self, painter, title, values, top, height):
+        left, right = self.MARGIN, self.width() - 12
+        bottom = top + height - 20
+        top += 20
+        high = max(values) * 1.1 or 1.0
+        painter.setPen(QPen(QColor("#888888"), 1))
+        painter.drawLine(left, bottom, right, bottom)
+        painter.drawLine(left, top, left, bottom)
+        painter.setPen(QColor("black"))
+        painter.drawText(left + 4, top - 6, title)
+        painter.drawText(2, top + 10, f"{high:.3g}")
+        painter.drawText(2, bottom, "0")
+        step = (right - left) / max(1, len(values) - 1)
+        points = [QPointF(left + i * step if len(values) > 1 else (left + right) / 2,
+                          bottom - value / high * (bottom - top)) for i, value in enumerate(values)]
+        painter.setPen(QPen(QColor("#2E7D32"), 2))
+        for start, end in zip(points, points[1:]):
+            painter.drawLine(start, end)
+        for run, point in zip(self.runs, points):
+            color = QColor("#C62828") if run.get("slow") else QColor("#2E7D32")
+            painter.setPen(QPen(color, 1))
+            painter.setBrush(color)
+            painter.drawEllipse(point, 4 if run.get("slow") else 3, 4 if run.get("slow") else 3)
+        painter.setBrush(Qt.NoBrush)
+
+def fill_history_table(table, runs):
+    table.setRowCount(len(runs))
+    for row, run in enumerate(reversed(runs)):
+        stages = run["stages"]
+        cells = [
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started"])),
+            run["application_id"] or "-",
+            format_bytes(run["input_bytes"]),
+            f"{run['rows']:,}" if run["rows"] is not None else "-",
+            f"{stages['preparation']:.1f}" if "preparation" in stages else "-",
+            f"{run['execution_seconds']:.1f}",
+            f"{run['total_seconds']:.1f}" if run["total_seconds"] else "-",
+            format_rate(run["bytes_per_second"]),
+            f"{run['rows_per_second']:,.0f}" if run["rows_per_second"] else "-",
+            "SLOW" if run["slow"] else "",
+        ]
+        for column, text in enumerate(cells):
+            item = QTableWidgetItem(text)
+            if run["slow"]:
+                item.setForeground(QColor("#C62828"))
+            table.setItem(row, column, item)
+
+def show_run_history(window):
+    dialog = QDialog(window)
+    dialog.setWindowTitle("Run History")
+    dialog.resize(900, 640)
+    layout = QVBoxLayout(dialog)
+    combo_series = QComboBox()
+    series = list_series()
+    for dataset, fingerprint, algorithm, mode, count in series:
+        combo_series.addItem(f"{dataset} · {algorithm} · {mode} ({count} runs)", (fingerprint, algorithm, mode))
+    chart = TrendChart()
+    table = QTableWidget(0, len(HISTORY_TABLE_COLUMNS))
+    table.setHorizontalHeaderLabels(HISTORY_TABLE_COLUMNS)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+    def show_series():
+        key = combo_series.currentData()
+        runs = flag_slow_runs(series_runs(*key)) if key else []
+        chart.set_runs(runs)
+        fill_history_table(table, runs)
+
+    combo_series.currentIndexChanged.connect(show_series)
+    layout.addWidget(QLabel("Dataset · algorithm · execution mode:"))
+    layout.addWidget(combo_series)
+    layout.addWidget(chart, 1)
+    layout.addWidget(table, 1)
+    show_series()
+    dialog.exec_()
+
+class DensityChart(QWidget):
+    # Bucket densities as bars and the binned kernel density estimate as a
+    # curve, for one column of a histogram result
+
+    MARGIN = 56
+
+    def __init__(self):
+        super().__init__()
+        self.table = None
+        self.curve = ([], [])
+        self.setMinimumHeight(320)
+
+    def set_distribution(self, table, grid, density):
+        self.table = table
+        self.curve = (grid, density)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), QColor("white"))
+        if not self.table or not self.table["count"]:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No distribution in the last result")
+            return
+        grid, density = self.curve
+        low = min([self.table["lower"][0]] + grid[:1])
+        high = max([self.table["upper"][-1]] + grid[-1:])
+        top_value = max(self.table["density"] + density) * 1.1 or 1.0
+        left, right = self.MARGIN, self.width() - 12
+        top, bottom = 24, self.height() - 28
+
+        def x_of(value):
+            return left + (value - low) / (high - low) * (right - left) if high > low else left
+
+        def y_of(value):
+            return bottom - value / top_value * (bottom - top)
+
+        painter.setPen(QPen(QColor("#888888"), 1))
+        painter.drawLine(left, bottom, right, bottom)
+        painter.drawLine(left, top, left, bottom)
+        painter.setPen(QColor("black"))
+        painter.drawText(2, top + 10, f"{top_value:.3g}")
+        painter.drawText(2, bottom, "0")
+        painter.drawText(left, self.height() - 8, f"{low:.4g}")
+        painter.drawText(right - 60, self.height() - 8, f"{high:.4g}")
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#90CAF9"))
+        for lower, upper, value in zip(self.table["lower"], self.table["upper"], self.table["density"]):
+            x = x_of(lower)
+            painter.drawRect(int(x), int(y_of(value)), max(1, int(x_of(upper) - x)), int(bottom - y_of(value)))
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(QPen(QColor("#C62828"), 2))
+        points = [QPointF(x_of(x), y_of(y)) for x, y in zip(grid, density)]
+        for start, end in zip(points, points[1:]):
+            painter.drawLine(start, end)
+
+def show_distribution(window):
+    histograms = record_histograms(window.last_result_record or {})
+    if not histograms:
+        QMessageBox.information(window, "Distribution", "The last result holds no histogram.")
+        return
+    dialog = QDialog(window)
+    dialog.setWindowTitle(f"Distribution - {window.last_result_record.get('job', '')}")
+    dialog.resize(900, 560)
+    layout = QVBoxLayout(dialog)
+    controls = QHBoxLayout()
+    combo_column = QComboBox()
+    combo_column.addItems(list(histograms))
+    spin_bandwidth = QDoubleSpinBox()
+    spin_bandwidth.setDecimals(4)
+    spin_bandwidth.setRange(0.0, 1000.0)
+    spin_bandwidth.setSpecialValueText("auto")
+    spin_bandwidth.setToolTip("Kernel bandwidth; auto uses Silverman's rule on the bucket counts")
+    btn_export = QPushButton('Export...')
+    controls.addWidget(QLabel("Column:"))
+    controls.addWidget(combo_column, 1)
+    controls.addWidget(QLabel("Bandwidth:"))
+    controls.addWidget(spin_bandwidth)
+    controls.addWidget(btn_export)
+    chart = DensityChart()
+    lbl_summary = QLabel()
+
+    def redraw():
+        column = combo_column.currentText()
+        bucket_layout, bucket_counts = histograms[column]
+        grid, density, bandwidth = binned_kde(bucket_layout, bucket_counts, spin_bandwidth.value() or None)
+        chart.set_distribution(distribution_table(bucket_layout, bucket_counts), grid, density)
+        lbl_summary.setText(f"{sum(bucket_counts.values()):,} values in {len(bucket_counts)} buckets "
+                            f"({bucket_layout.spec()}), bandwidth {bandwidth:.4g}, {len(grid)} grid points")
+
+    def export():
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        path, selected = QFileDialog.getSaveFileName(
+            dialog, "Export Distribution", os.path.join(DOWNLOAD_DIR, f"{window.last_result_record.get('job', 'distribution')}.csv"),
+            "Bucket table (*.csv);;Density curve (*.csv);;Typed bytes histograms (*.tb)")
+        if not path:
+            return
+        try:
+            if selected.startswith("Typed bytes"):
+                with open(path, 'wb') as f:
+                    f.write(typed_bytes_histograms(histograms))
+            else:
+                with open(path, 'w', newline='') as f:
+                    if selected.startswith("Density"):
+                        write_kde_csv(f, histograms, spin_bandwidth.value() or None)
+                    else:
+                        write_table_csv(f, histograms)
+        except OSError as export_error:
+            QMessageBox.warning(dialog, "Export Error", f"Could not write {path}: {export_error}")
+            return
+        log_message(window, f"Distribution exported to {path}")
+
+    combo_column.currentIndexChanged.connect(redraw)
+    spin_bandwidth.editingFinished.connect(redraw)
+    btn_export.clicked.connect(export)
+    layout.addLayout(controls)
+    layout.addWidget(chart, 1)
+    layout.addWidget(lbl_summary)
+    redraw()
+    dialog.exec_()
+
 def handle_run_analysis(window):
     selected_category = window.combo_categories.currentText()
     if selected_category == "Performance Testing":
@@ -344,7 +1271,13 @@ def handle_run_analysis(window):
         show_performance_metrics = False
         
     log_message(window, "Starting analysis...")
+    run_started = time.time()
     selected_function = window.combo_functions.currentText()
+    selected_columns = [item.text() for item in window.list_columns.selectedItems()]
+    if not selected_columns:
+        selected_columns = list(DEFAULT_COLUMNS)
+    selected_columns = [c for c in NUMERIC_COLUMNS if c in selected_columns]
+    columns_arg = ','.join(selected_columns)
     hdfs_input_path = window.entry_hdfs_path.text()
     if not hdfs_input_path:
         QMessageBox.warning(window, "Login Error", "Please specify HDFS login path.")
@@ -352,24 +1285,100 @@ def handle_run_analysis(window):
         return
       
     log_message(window, f"Selected Function: {selected_function}")
+    log_message(window, f"Columns: {columns_arg}")
     log_message(window, f"Entryway: {hdfs_input_path}")
+    approximate = EXECUTION_MODES[window.combo_execution.currentText()] == MODE_APPROXIMATE
+    if approximate and selected_function not in APPROXIMATE_FUNCTIONS:
+        QMessageBox.warning(window, "Selection Error", f"Approximate mode supports {', '.join(APPROXIMATE_FUNCTIONS)}.")
+        log_message(window, f"ERROR: No approximate mode for '{selected_function}'.")
+        return
+    region_spec = window.entry_region.text().strip()
+    region = None
+    if region_spec:
+        try:
+            region = parse_region(region_spec)
+        except ValueError as region_error:
+            QMessageBox.warning(window, "Region Error", f"Invalid region: {region_error}")
+            return
+        if approximate or selected_function in NO_FILTER_FUNCTIONS:
+            QMessageBox.warning(window, "Selection Error", f"A region cannot be used with '{selected_function}' or approximate mode.")
+            return
+        log_message(window, f"Region: {region_spec}")
+    date_spec = ""
+    date_range = None
+    if window.check_dates.isChecked():
+        date_spec = f"{window.date_start.date().toString('yyyy-MM-dd')},{window.date_end.date().toString('yyyy-MM-dd')}"
+        try:
+            date_range = parse_date_range(date_spec)
+        except ValueError as date_error:
+            QMessageBox.warning(window, "Date Range Error", f"Invalid date range: {date_error}")
+            return
+        if approximate or selected_function in NO_FILTER_FUNCTIONS:
+            QMessageBox.warning(window, "Selection Error", f"A date range cannot be used with '{selected_function}' or approximate mode.")
+            return
+        log_message(window, f"Date range: {date_spec}")
+    filter_text = window.entry_filter.text().strip()
+    if filter_text:
+        try:
+            parse_filter(filter_text)
+        except FilterError as filter_error:
+            QMessageBox.warning(window, "Filter Error", f"Invalid row filter: {filter_error}")
+            return
+        if approximate or selected_function in NO_FILTER_FUNCTIONS:
+            QMessageBox.warning(window, "Selection Error", f"A row filter cannot be used with '{selected_function}' or approximate mode.")
+            return
+        log_message(window, f"Row filter: {filter_text}")
+    compare_text = window.entry_compare.text().strip()
+    sources = []
+    if compare_text:
+        if approximate:
+            QMessageBox.warning(window, "Selection Error", "Approximate mode cannot compare datasets.")
+            return
+        sources = comparison_sources(hdfs_input_path, compare_text)
+        log_message(window, "Comparing: " + ", ".join(f"{label} ({path})" for label, path in sources))
+    dedup_filter_path = window.entry_dedup_filter.text().strip()
+    if window.check_dedup.isChecked():
+        if approximate or selected_function in NO_FILTER_FUNCTIONS:
+            QMessageBox.warning(window, "Selection Error", f"Duplicates cannot be dropped with '{selected_function}' or approximate mode.")
+            return
+        log_message(window, "Dropping duplicate site-days" + (f" and those in {dedup_filter_path}." if dedup_filter_path else "."))
+    elif dedup_filter_path:
+        log_message(window, "The prebuilt filter is used only when duplicate site-days are dropped.", WARNING)
+        dedup_filter_path = ""
+    if window.check_weighted.isChecked():
+        if approximate or selected_function not in WEIGHTED_FUNCTIONS:
+            QMessageBox.warning(window, "Selection Error", f"'{selected_function}' cannot weight rows (or approximate mode is selected).")
+            return
+        log_message(window, f"Rows are weighted by {WEIGHT_COLUMN}.")
     window.btn_run.setEnabled(False)
     window.text_results.clear()
+    window.result_output = None
+    update_pager(window)
     QApplication.processEvents()
-    if show_performance_metrics:
-        mr_prep_start = time.time()
+    mr_prep_start = time.time()
     mr_script_source_s3_path = ""
     emr_mr_script_target_dir = ""
     local_mapper_path_on_emr = ""
     local_reducer_path_on_emr = ""
     hdfs_output_path = ""
     job_name = ""
-    if selected_function == "Skewness":
+    shared_modules = ["records.py", "job_output.py", "wire.py"]  # common/ modules the scripts import
+    mapper_args = columns_arg
+    use_archive = False
+    combiner_args = None  # reducer arguments that turn it into a combiner
+    key_fields = 1        # leading fields of the map output key
+    reducer_args = ""
+    if approximate:
+        job_name = "GUI_Progressive_Estimate"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/approximate/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/approximate"
+    elif selected_function == "Skewness":
         job_name = "GUI_Skewness_Analysis"
         mr_script_source_s3_path = f"{S3_CODE_BUCKET}/skewness/"
         emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/skewness"  # Tam yol
         local_mapper_path_on_emr = "skewness_stats_mapper.py"
         local_reducer_path_on_emr = "skewness_stats_reducer.py"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
         hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_skewness_{selected_function.lower().replace(' ','_')}"
     
     elif selected_function == "Min-Max Normalization":
@@ -386,6 +1395,7 @@ def handle_run_analysis(window):
                 job_name = "GUI_MinMax_Find_Values"
                 local_mapper_path_on_emr = "min_max_finder_mapper.py"
                 local_reducer_path_on_emr = "min_max_finder_reducer.py"
+                shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
                 hdfs_output_path = "/user/hadoop/epa_air_quality/results/gui_minmax_values"
             else:  
                 job_name = "GUI_MinMax_Normalize"
@@ -398,6 +1408,7 @@ def handle_run_analysis(window):
         emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/median"
         local_mapper_path_on_emr = "median_histogram_mapper.py"
         local_reducer_path_on_emr = "median_histogram_reducer.py"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
         hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_median"
     elif selected_function == "Standard Deviation":
         job_name = "GUI_StdDev_Analysis"
@@ -405,6 +1416,7 @@ def handle_run_analysis(window):
         emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/stddev"
         local_mapper_path_on_emr = "stddev_welford_mapper.py"
         local_reducer_path_on_emr = "stddev_welford_reducer.py"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
         hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_stddev"
     elif selected_function == "90th Percentile":
         job_name = "GUI_90th_Percentile_Analysis"
@@ -412,12 +1424,114 @@ def handle_run_analysis(window):
         emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/percentile"
         local_mapper_path_on_emr = "percentile_90_mapper.py"
         local_reducer_path_on_emr = "percentile_90_reducer.py"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
         hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_percentile"
+    elif selected_function == "Robust Dispersion (MAD / IQR)":
+        job_name = "GUI_MAD_IQR_Analysis"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/mad_iqr/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/mad_iqr"
+        local_mapper_path_on_emr = "mad_iqr_mapper.py"
+        local_reducer_path_on_emr = "mad_iqr_reducer.py"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
+        hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_mad_iqr"
+    elif selected_function == "Covariance / Correlation":
+        items = ["All rows", "Per state (state_name)"]
+        item, ok = QInputDialog.getItem(window, "Grouping",
+                                    "Compute the matrices for all rows or per state?",
+                                    items, 0, False)
+        if not ok:
+            window.btn_run.setEnabled(True)
+            return
+        job_name = "GUI_Covariance_Analysis"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/covariance/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/covariance"
+        local_mapper_path_on_emr = "covariance_mapper.py"
+        local_reducer_path_on_emr = "covariance_reducer.py"
+        hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_covariance"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "job_output.py", "wire.py"]
+        if len(selected_columns) < 2:
+            log_message(window, "Covariance needs at least two columns, using all numeric columns.")
+            mapper_args = ','.join(NUMERIC_COLUMNS)
+        if "state" in item:
+            mapper_args += " state_name"
+    elif selected_function == "Distinct Counts (HyperLogLog)":
+        items = ["site,county,site_date", "site,county,state_date", "county,date", "state_name+county_name+date_local"]
+        item, ok = QInputDialog.getItem(window, "Distinct Keys",
+                                    "Comma separated keys (site, county, state, date, state_date, site_date or field+field):",
+                                    items, 0, True)
+        if not ok:
+            window.btn_run.setEnabled(True)
+            return
+        job_name = "GUI_Distinct_Count_Analysis"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/distinct/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/distinct"
+        local_mapper_path_on_emr = "hll_distinct_mapper.py"
+        local_reducer_path_on_emr = "hll_distinct_reducer.py"
+        hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_distinct"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "hyperloglog.py", "job_output.py", "wire.py"]
+        mapper_args = shlex.quote(item.replace(' ', ''))
+    elif selected_function == "Top-K Heavy Hitters":
+        items = ["100 highest daily values (with county and date)",
+                 "Counties most often above 35 μg/m³",
+                 "Sites most often above 35 μg/m³"]
+        item, ok = QInputDialog.getItem(window, "Top-K Query", "Which ranking do you want?", items, 0, False)
+        if not ok:
+            window.btn_run.setEnabled(True)
+            return
+        job_name = "GUI_TopK_Analysis"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/top_k/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/top_k"
+        local_mapper_path_on_emr = "top_k_mapper.py"
+        local_reducer_path_on_emr = "top_k_reducer.py"
+        hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_top_k"
+        shared_modules = ["records.py", "aggregates.py", "moments.py", "histogram.py", "topk.py", "job_output.py", "wire.py"]
+        combiner_args = "--combine"
+        if item.startswith("100"):
+            mapper_args = f"{columns_arg} --mode max --k 100"
+        else:
+            key = "county" if item.startswith("Counties") else "site"
+            mapper_args = f"{columns_arg} --mode frequent --k 20 --threshold 35 --key {key}"
+    elif selected_function == "Spike Detection (per site)":
+        job_name = "GUI_Spike_Detection"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/anomaly/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/anomaly"
+        local_mapper_path_on_emr = "anomaly_mapper.py"
+        local_reducer_path_on_emr = "anomaly_reducer.py"
+        hdfs_output_path = f"/user/hadoop/epa_air_quality/results/gui_anomaly"
+        shared_modules = ["records.py", "site_series.py", "topk.py", "job_output.py", "wire.py"]
+        mapper_args = f"{columns_arg} --key site"
+        # Site \t date keys: partitioned by site, sorted by date within it
+        key_fields = KEY_FIELDS
+    elif selected_function == "Spatial Tile Layout":
+        job_name = "GUI_Spatial_Tile_Layout"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/spatial/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/spatial"
+        local_mapper_path_on_emr = "spatial_tile_mapper.py"
+        local_reducer_path_on_emr = "spatial_tile_reducer.py"
+        hdfs_output_path = TILE_INDEX_PATH
+        shared_modules = ["records.py", "spatial.py", "partition_writer.py", "job_output.py", "wire.py"]
+        mapper_args = ""
+        reducer_args = f" --output-root {TILES_ROOT} --source {shlex.quote(hdfs_input_path)}"
+    elif selected_function == "Date Partitioning":
+        job_name = "GUI_Date_Partitioning"
+        mr_script_source_s3_path = f"{S3_CODE_BUCKET}/partitioning/"
+        emr_mr_script_target_dir = "/home/hadoop/mr_scripts_for_gui/partitioning"
+        local_mapper_path_on_emr = "date_partition_mapper.py"
+        local_reducer_path_on_emr = "date_partition_reducer.py"
+        hdfs_output_path = PARTITION_MANIFEST_PATH
+        shared_modules = ["records.py", "date_partitions.py", "partition_writer.py", "job_output.py", "wire.py"]
+        mapper_args = ""
+        reducer_args = f" --output-root {PARTITIONS_ROOT} --source {shlex.quote(hdfs_input_path)}"
     else:
         QMessageBox.warning(window, "Selection Error", f"MapReduce function for '{selected_function}' is not defined yet.")
         log_message(window, f"ERROR: No MR function for '{selected_function}'.")
         window.btn_run.setEnabled(True)
         return
+    if sources and (script_subcommand(local_mapper_path_on_emr) or "").split(' ')[0] not in AGGREGATE_JOBS:
+        QMessageBox.warning(window, "Selection Error", f"'{selected_function}' cannot compare datasets.")
+        log_message(window, f"ERROR: No dataset comparison for '{selected_function}'.")
+        window.btn_run.setEnabled(True)
+        return
 
     if mr_script_source_s3_path:
         cmd_list_s3_files = f"aws s3 ls {mr_script_source_s3_path}"
@@ -433,6 +1547,8 @@ def handle_run_analysis(window):
             echo "Directory created: {emr_mr_script_target_dir}" && \\
             aws s3 cp {mr_script_source_s3_path} {emr_mr_script_target_dir}/ --recursive && \\
             echo "Files copied from S3" && \\
+            aws s3 cp {S3_CODE_BUCKET}/common/ {emr_mr_script_target_dir}/ --recursive && \\
+            echo "Shared modules copied from S3" && \\
             ls -la {emr_mr_script_target_dir}/ && \\
             if [ -n "$(ls -A {emr_mr_script_target_dir}/*.py 2>/dev/null)" ]; then
                 chmod +x {emr_mr_script_target_dir}/*.py && \\
@@ -440,6 +1556,8 @@ def handle_run_analysis(window):
             else
                 echo "WARNING: Python files not found"
             fi && \\
+            {{ (cd {emr_mr_script_target_dir} && python3 job_archive.py --compile --output {ARCHIVE_NAME} . && echo "Job archive built") || \\
+              echo "WARNING: Job archive could not be built, shipping loose scripts"; }} && \\
             echo 'MR scripts for {selected_function} were prepared on the EMR master node.'
         """
         log_message(window, f"Preparing MR scripts for {selected_function} to EMR master node...")
@@ -448,87 +1566,210 @@ def handle_run_analysis(window):
             log_message(window, f"ERROR: MR scripts could not be prepared for EMR.{stderr}")
             window.btn_run.setEnabled(True)
             return
+        use_archive = "Job archive built" in stdout
+    mr_prep_time = time.time() - mr_prep_start
+    planning_start = time.time()
     if show_performance_metrics:
-        mr_prep_time = time.time() - mr_prep_start
         log_message(window, f"⏱️ MR script preparation time: {mr_prep_time:.2f} seconds")
-    if show_performance_metrics:
-        mapreduce_start = time.time()
-    cmd_delete_hdfs_output_on_emr = f"hdfs dfs -rm -r {hdfs_output_path} 2>/dev/null || true"
-    log_message(window, f"Legacy HDFS output directory '{hdfs_output_path}' is deleting (If it is available)...")
-    stdout_del, stderr_del = execute_remote_ssh_command(cmd_delete_hdfs_output_on_emr, window)
-    cmd_find_streaming_jar = "find /usr/lib/hadoop-mapreduce/ -name 'hadoop-streaming*.jar' | head -1"
-    log_message(window, "Searching for Hadoop streaming JAR file...")
-    stdout_jar, stderr_jar = execute_remote_ssh_command(cmd_find_streaming_jar, window)
-    
-    if stdout_jar and stdout_jar.strip():
-        streaming_jar_path = stdout_jar.strip()
-        log_message(window, f"Streaming JAR found: {streaming_jar_path}")
-    else:
-        log_message(window, "ERROR: Hadoop streaming JAR file not found!")
+    if approximate:
+        run_progressive_analysis(window, emr_mr_script_target_dir, hdfs_input_path, columns_arg)
         window.btn_run.setEnabled(True)
+        log_message(window, "Analysis process completed")
         return
-    hadoop_command_parts = [
-        'hadoop', 'jar', streaming_jar_path,
-        '-D', f'mapreduce.job.name={job_name}',
-    ]
-    if selected_function in ["Skewness", "Min-Max Normalization", "Median", "Standard Deviation", "90th Percentile"]:
-        hadoop_command_parts.extend(['-D', 'mapreduce.job.reduces=1'])
-    abs_mapper_on_emr = f"{emr_mr_script_target_dir}/{local_mapper_path_on_emr}"
-    files_for_hadoop_cmd = [abs_mapper_on_emr]
-    if local_reducer_path_on_emr and local_reducer_path_on_emr != "None":
-        abs_reducer_on_emr = f"{emr_mr_script_target_dir}/{local_reducer_path_on_emr}"
-        files_for_hadoop_cmd.append(abs_reducer_on_emr)
-    if local_reducer_path_on_emr and local_reducer_path_on_emr != "":
-        hadoop_command_parts.extend(['-reducer', f'./{local_reducer_path_on_emr}'])
-    else:
-        hadoop_command_parts.extend(['-D', 'mapreduce.job.reduces=0'])
-    for file_path in files_for_hadoop_cmd:
-        hadoop_command_parts.extend(['-file', file_path])
+    if selected_function in HISTOGRAM_FUNCTIONS:
+        layouts = histogram_layouts(window, emr_mr_script_target_dir, hdfs_input_path, selected_columns)
+        for column, layout in layouts.items():
+            log_message(window, f"Histogram layout ({column}): {layout.spec()}")
+        if layouts:
+            mapper_args = f"{columns_arg} {format_column_layouts(layouts)}"
+        else:
+            log_message(window, "WARNING: No histogram range could be fitted, using the fixed 0-500 buckets.")
     if selected_function == "Min-Max Normalization" and "2." in item:
-        minmax_result_path = "/user/hadoop/epa_air_quality/results/gui_minmax_values/part-00000"
-        cmd_read_minmax = f"hdfs dfs -cat {minmax_result_path}"
+        minmax_result_path = "/user/hadoop/epa_air_quality/results/gui_minmax_values"
         log_message(window, "Min-Max values ​​are read from the previous job...")
-        minmax_output, minmax_stderr = execute_remote_ssh_command(cmd_read_minmax, window)
+        minmax_output, minmax_stderr = read_job_output(window, emr_mr_script_target_dir, minmax_result_path)
         if minmax_output is None:  
             log_message(window, f"ERROR: Could not read Min-Max values. Run stage 1 first. {minmax_stderr}")
             window.btn_run.setEnabled(True)
             return
         try:
-            lines = minmax_output.strip().split('\n')
-            global_min = None
-            global_max = None
-            for line in lines:
-                if line.startswith('global_min'):
-                    global_min = float(line.split('\t')[1])
-                elif line.startswith('global_max'):
-                    global_max = float(line.split('\t')[1])
-            if global_min is None or global_max is None:
+            minmax_record = load_record(minmax_output, job="min_max")
+            if minmax_record is None:
+                log_message(window, "ERROR: No result record found in the Min-Max output. Run stage 1 again.")
+                window.btn_run.setEnabled(True)
+                return
+            bounds, bound_sources = minmax_bounds(minmax_record)
+            if bound_sources:
+                log_message(window, f"Stage 1 compared {', '.join(bound_sources)}: their bounds are merged.")
+            bounds_args = [f"{c}:{bounds[c][0]}:{bounds[c][1]}" for c in selected_columns if c in bounds]
+            if not bounds_args:
                 log_message(window, "HATA: Min-Max değerleri parse edilemedi.")
                 window.btn_run.setEnabled(True)
                 return
-            log_message(window, f"Dynamic Min-Max values: min={global_min}, max={global_max}")
-        except Exception as parse_error:
+            for bounds_arg in bounds_args:
+                column, min_str, max_str = bounds_arg.rsplit(':', 2)
+                log_message(window, f"Dynamic Min-Max values ({column}): min={min_str}, max={max_str}")
+        except (KeyError, TypeError) as parse_error:
             log_message(window, f"ERROR: Error while parsing Min-Max values: {parse_error}")
             window.btn_run.setEnabled(True)
             return
-        mapper_command_with_params = f'./{local_mapper_path_on_emr} {global_min} {global_max}'
-        hadoop_command_parts.extend(['-mapper', mapper_command_with_params])
+        mapper_command = task_command(local_mapper_path_on_emr, f' {" ".join(bounds_args)}', use_archive)
+    else:
+        mapper_command = task_command(local_mapper_path_on_emr, f' {mapper_args}', use_archive)
+    reducer_command = task_command(local_reducer_path_on_emr, reducer_args, use_archive) if local_reducer_path_on_emr else ""
+    input_paths = [hdfs_input_path]
+    job_env = {}
+    layouts = []
+    if region is not None:
+        # Normalized: streaming splits the -cmdenv variables on spaces
+        job_env[REGION_ENV] = region.spec()
+        shared_modules.append("spatial.py")
+        if not sources:
+            layouts.append(region_layout_inputs(window, region, hdfs_input_path))
+    if date_range is not None:
+        job_env[DATE_RANGE_ENV] = date_spec
+        shared_modules.append("date_partitions.py")
+        if not sources:
+            layouts.append(date_layout_inputs(window, date_range, hdfs_input_path))
+    if filter_text:
+        # Encoded: streaming splits the -cmdenv variables on spaces
+        job_env[FILTER_ENV] = encode_filter(filter_text)
+        shared_modules.append("row_filters.py")
+    if sources:
+        # One job over every input; each map task tags its records with the
+        # source of its input file. The layouts index the main input only,
+        # so the inputs are scanned in full with the row filters.
+        input_paths = [path for _, path in sources]
+        job_env[SOURCES_ENV] = format_sources(sources)
+    dedup_filter_name = ""
+    if window.check_dedup.isChecked():
+        # The prebuilt filter reaches the task directory under its own name
+        # (-files on a cluster, hdfs dfs -get for local runs)
+        dedup_filter_name = os.path.basename(dedup_filter_path)
+        job_env[DEDUP_ENV] = f"{DEFAULT_FP_RATE:g}" + (f":{dedup_filter_name}" if dedup_filter_name else "")
+        shared_modules.append("bloom.py")
+    if window.check_weighted.isChecked():
+        job_env[WEIGHT_ENV] = WEIGHT_COLUMN
+    layouts = [layout for layout in layouts if layout is not None]
+    if layouts:
+        # Read from whichever layout prunes more; the row filters make the result exact either way
+        selected_rows, input_paths, layout_name = min(layouts, key=lambda layout: layout[0])
+        log_message(window, f"Reading {len(input_paths)} {layout_name} ({selected_rows:,} rows).")
+        if not input_paths:
+            log_message(window, "No data inside the selected region and date range.")
+            show_results(window, "No data inside the selected region and date range.")
+            window.btn_run.setEnabled(True)
+            return
+    elif (region is not None or date_range is not None) and not sources:
+        log_message(window, "No tile or partition layout of this input, scanning the full input with the row filters.")
+    if selected_function == "Spatial Tile Layout":
+        log_message(window, f"Removing the previous tile layout in {TILES_ROOT}...")
+        execute_remote_ssh_command(f"hdfs dfs -rm -r -f {TILES_ROOT}", window)
+    elif selected_function == "Date Partitioning":
+        log_message(window, f"Removing the previous partitions in {PARTITIONS_ROOT}...")
+        execute_remote_ssh_command(f"hdfs dfs -rm -r -f {PARTITIONS_ROOT}", window)
+
+    # The wire format is not part of the dataset fingerprint, so it is kept apart from job_env
+    wire_env = {}
+    wire_job = (script_subcommand(local_mapper_path_on_emr) or "").split(' ')[0]
+    if window.check_typed_bytes.isChecked() and reducer_command:
+        if wire_job in TYPED_BYTES_JOBS:
+            wire_env[WIRE_ENV] = TYPED_BYTES
+            log_message(window, "Map output is exchanged as typed bytes.")
+        else:
+            log_message(window, f"{selected_function} exchanges text lines only, typed bytes not used.")
+
+    input_bytes = get_hdfs_input_size(input_paths, window)
+    forced_mode = EXECUTION_MODES[window.combo_execution.currentText()]
+    plan = choose_plan(input_bytes, map_only=not reducer_command, forced_mode=forced_mode,
+                       row_output=wire_job in ROW_OUTPUT_JOBS, writes_files=wire_job in LAYOUT_JOBS)
+    plan_text = format_plan(plan)
+    log_message(window, plan_text)
+    show_results(window, plan_text + "\n\nRunning...")
+
+    execution_start = time.time()
+    if show_performance_metrics:
+        mapreduce_start = execution_start
+    if plan["mode"] == MODE_LOCAL:
+        # A prebuilt filter is skipped by the tasks of its own input, so the
+        # runner reads each input itself to know which one a task reads
+        final_command_on_emr = local_command(emr_mr_script_target_dir, mapper_command, reducer_command,
+                                             input_paths, hdfs_output_path, {**job_env, **wire_env},
+                                             per_input=bool(sources or dedup_filter_name), key_fields=key_fields)
+        if dedup_filter_name:
+            final_command_on_emr = (f"hdfs dfs -get -f {shlex.quote(dedup_filter_path)} "
+                                    f"{shlex.quote(emr_mr_script_target_dir + '/' + dedup_filter_name)} || exit 1; "
+                                    + final_command_on_emr)
+        log_message(window, "Starting in-process job on the EMR master node...")
     else:
-        hadoop_command_parts.extend(['-mapper', f'./{local_mapper_path_on_emr}'])
-
-    if local_reducer_path_on_emr and local_reducer_path_on_emr != "None":
-        hadoop_command_parts.extend(['-reducer', f'./{local_reducer_path_on_emr}'])
-    hadoop_command_parts.extend(['-input', hdfs_input_path])
-    hadoop_command_parts.extend(['-output', hdfs_output_path])
-    final_hadoop_command_on_emr = ' '.join(shlex.quote(c) for c in hadoop_command_parts)
-    log_message(window, "Starting Hadoop streaming job on EMR...")
-    stdout_mr, stderr_mr = execute_remote_ssh_command(final_hadoop_command_on_emr, window)
+        cmd_delete_hdfs_output_on_emr = f"hdfs dfs -rm -r {hdfs_output_path} 2>/dev/null || true"
+        log_message(window, f"Legacy HDFS output directory '{hdfs_output_path}' is deleting (If it is available)...")
+        stdout_del, stderr_del = execute_remote_ssh_command(cmd_delete_hdfs_output_on_emr, window)
+        cmd_find_streaming_jar = "find /usr/lib/hadoop-mapreduce/ -name 'hadoop-streaming*.jar' | head -1"
+        log_message(window, "Searching for Hadoop streaming JAR file...")
+        stdout_jar, stderr_jar = execute_remote_ssh_command(cmd_find_streaming_jar, window)
+        
+        if stdout_jar and stdout_jar.strip():
+            streaming_jar_path = stdout_jar.strip()
+            log_message(window, f"Streaming JAR found: {streaming_jar_path}")
+        else:
+            log_message(window, "ERROR: Hadoop streaming JAR file not found!")
+            window.btn_run.setEnabled(True)
+            return
+        hadoop_command_parts = [
+            'hadoop', 'jar', streaming_jar_path,
+            '-D', f'mapreduce.job.name={job_name}',
+        ]
+        hadoop_command_parts.extend(hadoop_options(plan))
+        if wire_env:
+            hadoop_command_parts.extend(TYPED_BYTES_OPTIONS)
+        if key_fields != 1:
+            hadoop_command_parts.extend(SECONDARY_SORT_OPTIONS)
+        if dedup_filter_name:
+            # Without a scheme -files would look for a local file
+            filter_uri = dedup_filter_path if "://" in dedup_filter_path else f"hdfs://{dedup_filter_path}"
+            hadoop_command_parts.extend(['-files', f"{filter_uri}#{dedup_filter_name}"])
+        if use_archive:
+            files_for_hadoop_cmd = [f"{emr_mr_script_target_dir}/{ARCHIVE_NAME}"]
+        else:
+            abs_mapper_on_emr = f"{emr_mr_script_target_dir}/{local_mapper_path_on_emr}"
+            files_for_hadoop_cmd = [abs_mapper_on_emr]
+            if local_reducer_path_on_emr:
+                abs_reducer_on_emr = f"{emr_mr_script_target_dir}/{local_reducer_path_on_emr}"
+                files_for_hadoop_cmd.append(abs_reducer_on_emr)
+            for module_name in shared_modules:
+                files_for_hadoop_cmd.append(f"{emr_mr_script_target_dir}/{module_name}")
+        for file_path in files_for_hadoop_cmd:
+            hadoop_command_parts.extend(['-file', file_path])
+        hadoop_command_parts.extend(['-mapper', mapper_command])
+        if reducer_command and combiner_args:
+            hadoop_command_parts.extend(['-combiner', f'{reducer_command} {combiner_args}'])
+        if reducer_command:
+            hadoop_command_parts.extend(['-reducer', reducer_command])
+        if key_fields != 1:
+            hadoop_command_parts.extend(['-partitioner', PARTITIONER])
+        if not use_archive:
+            # The -file scripts are symlinks, so the shared modules next to
+            # them are found from the task directory, not the script's own
+            hadoop_command_parts.extend(['-cmdenv', 'PYTHONPATH=.'])
+        for name, value in {**job_env, **wire_env}.items():
+            hadoop_command_parts.extend(['-cmdenv', f'{name}={value}'])
+        for input_path in input_paths:
+            hadoop_command_parts.extend(['-input', input_path])
+        hadoop_command_parts.extend(['-output', hdfs_output_path])
+        final_command_on_emr = ' '.join(shlex.quote(c) for c in hadoop_command_parts)
+        log_message(window, "Starting Hadoop streaming job on EMR...")
+    stdout_mr, stderr_mr = execute_remote_ssh_command(final_command_on_emr, window)
+    execution_time = time.time() - execution_start
     if show_performance_metrics:
-        mapreduce_time = time.time() - mapreduce_start
+        mapreduce_time = execution_time
         log_message(window, f"⏱️ MapReduce process time: {mapreduce_time:.2f} saniye")
     application_id = None
     job_successful = False
-    if stderr_mr is not None and "completed successfully" in stderr_mr.lower():
+    if plan["mode"] == MODE_LOCAL and stdout_mr is not None:
+        job_successful = True
+        log_message(window, f"Job '{job_name}' completed successfully on the EMR master node.")
+    elif stderr_mr is not None and "completed successfully" in stderr_mr.lower():
         job_successful = True
         for line in stderr_mr.splitlines():
             if "Submitted application" in line:
@@ -545,14 +1786,38 @@ def handle_run_analysis(window):
         log_message(window, f"ERROR: MapReduce job '{job_name}' failed to run on EMR. {stderr_mr}")
     else:
         log_message(window, f"ERROR: MapReduce job '{job_name}' terminated with error on EMR.")
+    run = {
+        "started": run_started,
+        "dataset": dataset_label(window, hdfs_input_path, region_spec if region else "", date_spec, filter_text, sources),
+        "fingerprint": dataset_fingerprint(input_paths, input_bytes, [f"{k}={v}" for k, v in job_env.items()]),
+        "algorithm": job_name,
+        "mode": plan["mode"],
+        "application_id": application_id,
+        "status": STATUS_OK if job_successful else STATUS_FAILED,
+        "input_bytes": input_bytes,
+        "execution_seconds": execution_time,
+        "stages": {"preparation": mr_prep_time, "planning": execution_start - planning_start,
+                   "execution": execution_time},
+        "counters": parse_hadoop_counters(stderr_mr),
+    }
     if job_successful:
+        log_message(window, f"Execution time: {execution_time:.2f} seconds (estimated {plan['estimated_seconds']:.1f} seconds)")
         log_message(window, "Results are read from HDFS...")
-        result_file_hdfs_path = f"{hdfs_output_path}/part-00000"
-        cmd_read_results_on_emr = f"hdfs dfs -cat {result_file_hdfs_path}"
-        results_content, stderr_read = execute_remote_ssh_command(cmd_read_results_on_emr, window)
+        results_start = time.time()
+        results_content, stderr_read = read_job_output(window, emr_mr_script_target_dir, hdfs_output_path)
+        run["stages"]["results"] = time.time() - results_start
         
         if results_content:
             log_message(window, "Results read sucessfully.")
+            records, results_content = split_output(results_content)
+            window.last_result_record = records[-1] if records else None
+            window.btn_distribution.setEnabled(bool(window.last_result_record and record_histograms(window.last_result_record)))
+            if window.last_result_record:
+                counts = window.last_result_record["counts"]
+                run["rows"] = counts["rows"]
+                run["skipped_rows"] = counts["skipped"]
+                log_message(window, f"Result record: {counts['rows']} rows from {counts['map_tasks']} map task(s), "
+                                    f"skipped {counts['skipped']}")
             if show_performance_metrics and selected_category == "Performance Testing":
                 analysis_end_time = time.time()
                 total_duration = analysis_end_time - analysis_start_time
@@ -574,6 +1839,7 @@ def handle_run_analysis(window):
                 enhanced_results += f"📈 Dataset: {dataset_text}\n"
                 if processed_records > 0:
                     enhanced_results += f"⚡ Processing Rate: {processed_records/total_duration:.0f} records/sec\n"
+                enhanced_results += f"🧭 Execution Mode: {plan['mode']} (estimated {plan['estimated_seconds']:.1f} seconds)\n"
                 enhanced_results += f"\nDetailed Timing Breakdown:\n"
                 enhanced_results += f"   • MR Script Preparation: {mr_prep_time:.2f} seconds\n"
                 enhanced_results += f"   • MapReduce Execution: {mapreduce_time:.2f} seconds\n"
@@ -589,6 +1855,8 @@ def handle_run_analysis(window):
             show_results(window, f"ERROR: Failed to read results from HDFS.\n{stderr_read}")
     else:
         show_results(window, "The results could not be read because the MapReduce job failed.")
+    run["total_seconds"] = time.time() - run_started
+    save_run(window, run)
     window.btn_run.setEnabled(True)
     log_message(window, "Analysis process completed")
 
@@ -597,7 +1865,9 @@ def main():
     app = QApplication(sys.argv)
     main_window = QWidget()
     init_ui(main_window)
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    main_window.log_buffer.close()
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
@@ -1,34 +1,34 @@
 import sys
-import csv
 
-MIN_VALUE = 0.0      
-MAX_VALUE = 500.0    
-NUM_BUCKETS = 1000   
+from aggregates import BucketStats, write_aggregate
+from records import iter_weighted_blocks, parse_columns
+from histogram import parse_column_layouts
+from job_output import TaskCounters
+from wire import RecordWriter
 
-def get_bucket_index(value, min_val, max_val, num_buckets):
-    if value <= min_val:
-        return 0
-    elif value >= max_val:
-        return num_buckets - 1
-    else:
-        normalized = (value - min_val) / (max_val - min_val)
-        return int(normalized * (num_buckets - 1))
+SAMPLES_PER_BUCKET = 8   # validation values kept per bucket, see aggregates.BucketStats
 
-def mapper():
-    csv_reader = csv.DictReader(sys.stdin)
-    for row in csv_reader:
-        try:
-            value = float(row['arithmetic_mean'])
-            
-            if value >= 0:  # Geçerli değerler
-                bucket_idx = get_bucket_index(value, MIN_VALUE, MAX_VALUE, NUM_BUCKETS)
-                print(f"BUCKET_{bucket_idx:04d}\t1")
-                print(f"TOTAL_COUNT\t1")
-                if bucket_idx < 10:  # Sadece ilk birkaç bucket için
-                    print(f"SAMPLE_{bucket_idx:04d}\t{value}")
-                
-        except (ValueError, KeyError):
-            pass
+def mapper(columns, layouts):
+    # Bucket counts, exact bucket min/max/sum and bounded bucket samples are
+    # combined in the mapper, one aggregate per column
+    histograms = [BucketStats(layouts[column], SAMPLES_PER_BUCKET) for column in columns]
+    counters = TaskCounters(columns)
+    for blocks, weights in iter_weighted_blocks(sys.stdin, columns, counters=counters):
+        for histogram, block, block_weights in zip(histograms, blocks, weights):
+            histogram.update_block(block, block_weights)
+
+    writer = RecordWriter()
+    for column, histogram in zip(columns, histograms):
+        if histogram.total():
+            write_aggregate(writer, column, histogram)
+    counters.emit(writer)
 
 if __name__ == "__main__":
-    mapper()
+    # median_histogram_mapper.py [columns] [layouts]
+    columns = parse_columns(sys.argv[1:2])
+    try:
+        layouts = parse_column_layouts(sys.argv[2] if len(sys.argv) > 2 else "", columns)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    mapper(columns, layouts)
@@ -1,89 +1,112 @@
 import sys
-from collections import defaultdict
 
-MIN_VALUE = 0.0
-MAX_VALUE = 500.0
-NUM_BUCKETS = 1000
+from aggregates import AGGREGATE_KEY, decode, merge_into
+from records import ordered_columns
+from histogram import parse_layout, populated_window
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
 
-def get_bucket_range(bucket_idx, min_val, max_val, num_buckets):
-    bucket_width = (max_val - min_val) / num_buckets
-    bucket_start = min_val + (bucket_idx * bucket_width)
-    bucket_end = bucket_start + bucket_width
-    return bucket_start, bucket_end
-
-def process_line(line, bucket_counts, total_count, sample_values):
+def process_record(parts, histograms, record):
     try:
-        key, value = line.strip().split('\t')
-        
-        if key.startswith("BUCKET_"):
-            bucket_idx = int(key.split('_')[1])
-            bucket_counts[bucket_idx] += int(value)
-            
-        elif key == "TOTAL_COUNT":
-            total_count[0] += int(value)  
-            
-        elif key.startswith("SAMPLE_"):
-            bucket_idx = int(key.split('_')[1])
-            sample_values[bucket_idx].append(float(value))
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+            return
+        key, column, value = parts
+        if key == AGGREGATE_KEY:
+            merge_into(histograms, column, decode(value))
             
     except ValueError:
         _ = None  
 
-def reducer():
-    bucket_counts = defaultdict(int)
-    total_count = [0]  
-    sample_values = defaultdict(list)
-
-    for line in sys.stdin:
-        process_line(line, bucket_counts, total_count, sample_values)
-    
-    total_count_value = total_count[0]
+def column_result(bucket_counts, total_count_value, histogram, layout):
     median_position = total_count_value / 2.0
-    
-    print(f"=== Histogram Based Median Calculation ===")
-    print(f"Total number of records: {total_count_value}")
-    print(f"Median pozition: {median_position:.0f}")
-    print(f"Number of buckets used: {len(bucket_counts)}")
-    
+    result = {
+        "total_records": total_count_value,
+        "median_position": median_position,
+        "buckets_used": len(bucket_counts),
+        "median": None,
+    }
     cumulative_count = 0
-    median_bucket = None
-    median_value = None
-    
     for bucket_idx in sorted(bucket_counts.keys()):
         count_in_bucket = bucket_counts[bucket_idx]
         cumulative_count += count_in_bucket
-    
-        if cumulative_count >= median_position and median_bucket is None:
-            median_bucket = bucket_idx
-            bucket_start, bucket_end = get_bucket_range(
-                bucket_idx, MIN_VALUE, MAX_VALUE, NUM_BUCKETS
-            )
-            
+        if cumulative_count >= median_position:
+            bucket_start, bucket_end = layout.bucket_range(bucket_idx)
             position_in_bucket = median_position - (cumulative_count - count_in_bucket)
             fraction_in_bucket = position_in_bucket / count_in_bucket
-            median_value = bucket_start + (fraction_in_bucket * (bucket_end - bucket_start))
-            
-            print(f"\nMedian bucket: {bucket_idx}")
-            print(f"Bucket range: [{bucket_start:.4f}, {bucket_end:.4f}]")
-            print(f"Number of records in the bucket: {count_in_bucket}")
-            print(f"Position in bucket: {position_in_bucket:.0f}")
+            result["median"] = bucket_start + (fraction_in_bucket * (bucket_end - bucket_start))
+            result["median_bucket"] = bucket_idx
+            result["bucket_range"] = [bucket_start, bucket_end]
+            result["records_in_bucket"] = count_in_bucket
+            result["position_in_bucket"] = position_in_bucket
+            summary = histogram.bucket_summary(bucket_idx) if hasattr(histogram, "bucket_summary") else None
+            if summary:
+                result["bucket_samples"] = {"min": summary["min"], "max": summary["max"],
+                                            "average": summary["average"], "samples": summary["samples"]}
+            break
+    return result
+
+def histogram_state(bucket_counts, layout):
+    return {"layout": layout.spec(), "num_buckets": layout.num_buckets,
+            "counts": {str(i): bucket_counts[i] for i in sorted(bucket_counts)}}
+
+def report_median(column, result, histogram):
+    bucket_counts = {int(i): c for i, c in histogram["counts"].items()}
+    layout = parse_layout(histogram["layout"])
+    
+    print(f"=== Histogram Based Median Calculation ===")
+    print(f"Column: {column}")
+    print(f"Total number of records: {result['total_records']}")
+    print(f"Median pozition: {result['median_position']:.0f}")
+    print(f"Bucket layout: {histogram['layout']}")
+    print(f"Number of buckets used: {result['buckets_used']}")
     
+    median_value = result["median"]
     if median_value is not None:
+        bucket_start, bucket_end = result["bucket_range"]
+        print(f"\nMedian bucket: {result['median_bucket']}")
+        print(f"Bucket range: [{bucket_start:.6g}, {bucket_end:.6g}]")
+        print(f"Number of records in the bucket: {result['records_in_bucket']}")
+        print(f"Position in bucket: {result['position_in_bucket']:.0f}")
         print(f"\n*** Calculated Median: {median_value:.4f} ***")
-        if median_bucket in sample_values and sample_values[median_bucket]:
-            samples = sorted(sample_values[median_bucket])
-            print(f"\nValidation - Example values ​​in this bucket:")
-            print(f"Min: {min(samples):.4f}")
-            print(f"Max: {max(samples):.4f}")
-            print(f"Average: {sum(samples)/len(samples):.4f}")
+        samples = result.get("bucket_samples")
+        if samples:
+            print(f"\nValidation - Values in this bucket (exact):")
+            print(f"Min: {samples['min']:.4f}")
+            print(f"Max: {samples['max']:.4f}")
+            print(f"Average: {samples['average']:.4f}")
+            print(f"Random sample ({len(samples['samples'])}): {', '.join(f'{v:.4g}' for v in samples['samples'])}")
     
-    print("\n=== Histogram Distribution (First 20 bucket) ===")
-    for i in range(min(20, max(bucket_counts.keys()) + 1)):
-        if i in bucket_counts:
-            bucket_start, bucket_end = get_bucket_range(i, MIN_VALUE, MAX_VALUE, NUM_BUCKETS)
-            bar_length = int((bucket_counts[i] / max(bucket_counts.values())) * 40)
-            bar = '#' * bar_length
-            print(f"[{bucket_start:6.2f}-{bucket_end:6.2f}]: {bar} ({bucket_counts[i]})")
+    print("\n=== Histogram Distribution (20 buckets around the median) ===")
+    for i in populated_window(bucket_counts, result.get("median_bucket"), 20):
+        bucket_start, bucket_end = layout.bucket_range(i)
+        bar_length = int((bucket_counts[i] / max(bucket_counts.values())) * 40)
+        bar = '#' * bar_length
+        print(f"[{bucket_start:8.4g}-{bucket_end:8.4g}]: {bar} ({bucket_counts[i]})")
+
+def reducer():
+    histograms = {}
+    record = new_record("median")
+
+    for parts in read_records():
+        process_record(parts, histograms, record)
+    
+    for column in ordered_columns(histograms):
+        histogram = histograms[column]
+        bucket_counts = histogram.bucket_counts()
+        if not bucket_counts:
+            continue
+        record["results"][column] = column_result(bucket_counts, histogram.total(), histogram, histogram.layout)
+        record["state"][column] = {"histogram": histogram_state(bucket_counts, histogram.layout)}
+    finish_record(record)
+
+    for i, column in enumerate(record["results"]):
+        if i > 0:
+            print()
+        report_median(column, record["results"][column], record["state"][column]["histogram"])
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
 
 if __name__ == "__main__":
     reducer()
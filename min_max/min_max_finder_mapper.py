@@ -1,23 +1,24 @@
 import sys
-import csv
 
-VALUE_COLUMN_NAME = 'arithmetic_mean'
+from aggregates import MinMax, write_aggregate
+from records import iter_column_blocks, parse_columns
+from job_output import TaskCounters
+from wire import RecordWriter
 
-def process_row(row):
-    try:
-        value_str = row.get(VALUE_COLUMN_NAME)
-        if value_str is not None and value_str.strip() != "":
-            value = float(value_str)
-            print(f"MIN_VALUE\t{value}")
-            print(f"MAX_VALUE\t{value}")
-    except (ValueError, TypeError, KeyError) as e:
-        error_occurred = True  
+def mapper(columns):
+    extremes = [MinMax() for _ in columns]
 
-def mapper():
-    csv_reader = csv.DictReader(sys.stdin)
+    counters = TaskCounters(columns)
+    for blocks in iter_column_blocks(sys.stdin, columns, non_negative=False, counters=counters):
+        for aggregate, block in zip(extremes, blocks):
+            aggregate.update_block(block)
 
-    for row in csv_reader:
-        process_row(row)
+    writer = RecordWriter()
+    for column, aggregate in zip(columns, extremes):
+        if aggregate.n > 0:
+            write_aggregate(writer, column, aggregate)
+    counters.emit(writer)
 
 if __name__ == "__main__":
-    mapper()
+    mapper(parse_columns(sys.argv[1:]))
+
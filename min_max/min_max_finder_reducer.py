@@ -1,30 +1,41 @@
 
 import sys
 
-def process_line(line, current_min, current_max):
-    try:
-        key, value_str = line.strip().split('\t')
-        value = float(value_str)
+from aggregates import AGGREGATE_KEY, decode, merge_into
+from records import ordered_columns
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
 
-        if key == "MIN_VALUE":
-            if current_min[0] is None or value < current_min[0]:
-                current_min[0] = value
-        elif key == "MAX_VALUE":
-            if current_max[0] is None or value > current_max[0]:
-                current_max[0] = value
+def process_record(parts, extremes, record):
+    try:
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+            return
+        key, column, value = parts
+        if key == AGGREGATE_KEY:
+            merge_into(extremes, column, decode(value))
     except ValueError:
         error_flag = True
 
 def reducer():
-    current_min = [None]
-    current_max = [None]
+    extremes = {}
+    record = new_record("min_max")
+
+    for parts in read_records():
+        process_record(parts, extremes, record)
+    for column in ordered_columns(extremes):
+        aggregate = extremes[column]
+        if aggregate.n > 0:
+            record["results"][column] = {"global_min": aggregate.min_value,
+                                         "global_max": aggregate.max_value}
+    finish_record(record)
 
-    for line in sys.stdin:
-        process_line(line, current_min, current_max)
-    if current_min[0] is not None:
-        print(f"global_min\t{current_min[0]}")
-    if current_max[0] is not None:
-        print(f"global_max\t{current_max[0]}")
+    for column, result in record["results"].items():
+        for statistic, value in result.items():
+            print(f"{column}\t{statistic}\t{value}")
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
 
 if __name__ == "__main__":
     reducer()
@@ -1,7 +1,8 @@
 import sys
 import csv
 
-EXPECTED_FIELDNAMES = ['date_local', 'state_name', 'county_name', 'arithmetic_mean', 'aqi', 'first_max_value', 'observation_count', 'latitude', 'longitude']
+from records import EXPECTED_FIELDNAMES
+
 VALUE_COLUMN_NAME = 'arithmetic_mean'
 
 def normalize(value, min_val, max_val):
@@ -9,18 +10,31 @@ def normalize(value, min_val, max_val):
         return 0.5 
     return (value - min_val) / (max_val - min_val)
 
-def process_valid_row(row, line_parts, writer, global_min_val, global_max_val, processed_count):
+def parse_bounds(args):
+    # "column:min:max" per column, or the legacy "min max" pair for VALUE_COLUMN_NAME
+    if len(args) == 2 and ':' not in args[0] and ':' not in args[1]:
+        return {VALUE_COLUMN_NAME: (float(args[0]), float(args[1]))}
+    bounds = {}
+    for arg in args:
+        column, min_str, max_str = arg.rsplit(':', 2)
+        if column not in EXPECTED_FIELDNAMES:
+            raise ValueError(f"unknown column {column}")
+        bounds[column] = (float(min_str), float(max_str))
+    return bounds
+
+def process_valid_row(row, line_parts, writer, bounds, processed_count):
     try:
-        value_str = row.get(VALUE_COLUMN_NAME)
-        
-        if value_str is not None and value_str.strip() != "":
-            try:
-                original_value = float(value_str)
-                normalized_value = normalize(original_value, global_min_val, global_max_val)
-                row[VALUE_COLUMN_NAME] = f"{normalized_value:.8f}"
-                processed_count[0] += 1
-            except ValueError:
-                error_occurred = True
+        for column, (global_min_val, global_max_val) in bounds.items():
+            value_str = row.get(column)
+            
+            if value_str is not None and value_str.strip() != "":
+                try:
+                    original_value = float(value_str)
+                    normalized_value = normalize(original_value, global_min_val, global_max_val)
+                    row[column] = f"{normalized_value:.8f}"
+                    processed_count[0] += 1
+                except ValueError:
+                    error_occurred = True
         
         output_line = [row.get(fn, '') for fn in EXPECTED_FIELDNAMES]
         writer.writerow(output_line)
@@ -29,7 +43,7 @@ def process_valid_row(row, line_parts, writer, global_min_val, global_max_val, p
         # Genel hata durumunda orijinal satırı yaz
         writer.writerow(line_parts)
 
-def mapper(global_min_val, global_max_val):
+def mapper(bounds):
     reader = csv.reader(sys.stdin)
     writer = csv.writer(sys.stdout, lineterminator='\n')
     line_count = 0
@@ -39,18 +53,17 @@ def mapper(global_min_val, global_max_val):
         line_count += 1 
         if len(line_parts) == len(EXPECTED_FIELDNAMES):
             row = dict(zip(EXPECTED_FIELDNAMES, line_parts))
-            process_valid_row(row, line_parts, writer, global_min_val, global_max_val, processed_count)
+            process_valid_row(row, line_parts, writer, bounds, processed_count)
         else:
             skipped_line = True
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
+    if len(sys.argv) < 2:
         sys.exit(1)
     
     try:
-        g_min = float(sys.argv[1])
-        g_max = float(sys.argv[2])
+        bounds = parse_bounds(sys.argv[1:])
     except ValueError:
         sys.exit(1)
 
-    mapper(g_min, g_max)
+    mapper(bounds)
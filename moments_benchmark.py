@@ -0,0 +1,96 @@
+import io
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+import statistics
+from fractions import Fraction
+
+# Moments of one column in a map task, the per-row update of the original
+# mappers (csv.DictReader, one Welford/Terriberry step per value) against the
+# block path of moments.py (iter_column_blocks, two-pass block moments,
+# balanced merges). Reports the median time of each and the largest relative
+# error of mean, M2, M3 and M4 against a fractions.Fraction reference.
+#   python3 moments_benchmark.py --rows 200000 --runs 5
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPO_DIR, 'common'))
+from records import EXPECTED_FIELDNAMES, iter_column_blocks
+from moments import MomentAccumulator
+
+COLUMN = 'arithmetic_mean'
+
+def synthetic_csv(rows, seed=26):
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPECTED_FIELDNAMES)
+    for _ in range(rows):
+        row = {name: "" for name in EXPECTED_FIELDNAMES}
+        row.update(date_local=f"2019-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", state_name="CA",
+                   county_name="Fresno", arithmetic_mean=f"{rng.lognormvariate(2.0, 0.8):.3f}",
+                   aqi=str(rng.randint(0, 300)), observation_count=str(rng.randint(1, 24)))
+        writer.writerow([row[name] for name in EXPECTED_FIELDNAMES])
+    return out.getvalue()
+
+def per_row(text):
+    n, mean, M2, M3, M4 = 0, 0.0, 0.0, 0.0, 0.0
+    for row in csv.DictReader(io.StringIO(text)):
+        try:
+            x = float(row[COLUMN])
+        except (ValueError, TypeError, KeyError):
+            continue
+        if x < 0:
+            continue
+        n1 = n
+        n += 1
+        delta = x - mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+        mean += delta_n
+        M4 += term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * M2 - 4 * delta_n * M3
+        M3 += term1 * delta_n * (n - 2) - 3 * delta_n * M2
+        M2 += term1
+    return n, mean, M2, M3, M4
+
+def blocks(text):
+    accumulator = MomentAccumulator()
+    for (values,) in iter_column_blocks(io.StringIO(text), [COLUMN]):
+        accumulator.add_block(values)
+    return accumulator.result()
+
+def reference(text):
+    values = [Fraction(v) for (block,) in iter_column_blocks(io.StringIO(text), [COLUMN]) for v in block]
+    n = len(values)
+    mean = sum(values) / n
+    return (n, mean, *(sum((x - mean) ** k for x in values) for k in (2, 3, 4)))
+
+def worst_error(result, exact):
+    return max(float(abs(Fraction(value) - ref) / abs(ref)) for value, ref in zip(result[1:], exact[1:]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs block moments benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--input", help="CSV file to use instead of synthetic rows")
+    args = parser.parse_args()
+    text = open(args.input).read() if args.input else synthetic_csv(args.rows)
+    exact = reference(text)
+    print(f"Python {sys.version.split()[0]}, {exact[0]:,} values of {COLUMN}, median of {args.runs} runs\n")
+    print(f"{'path':<12}{'seconds':>10}{'rows/s':>12}{'max rel. error':>18}")
+    timings = {}
+    for name, compute in (("per-row", per_row), ("block", blocks)):
+        times = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = compute(text)
+            times.append(time.perf_counter() - started)
+        timings[name] = statistics.median(times)
+        print(f"{name:<12}{timings[name]:>10.3f}{exact[0] / timings[name]:>12,.0f}{worst_error(result, exact):>18.1e}")
+    print(f"\nspeedup: {timings['per-row'] / timings['block']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sys
+import csv
+
+from records import EXPECTED_FIELDNAMES, iter_row_blocks
+from date_partitions import UNDATED, partition_of
+from job_output import TaskCounters
+
+# Keys every row by its year/month partition:
+#   year=YYYY/month=MM \t row (CSV, EXPECTED_FIELDNAMES order, no header)
+
+def mapper():
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    counters = TaskCounters(['date_local'])
+    date_pos = EXPECTED_FIELDNAMES.index('date_local')
+    for indexes, rows in iter_row_blocks(sys.stdin, EXPECTED_FIELDNAMES):
+        counters.rows += len(rows)
+        for row in rows:
+            values = [row[i] if 0 <= i < len(row) else '' for i in indexes]
+            try:
+                partition = partition_of(values[date_pos])
+                counters.valid['date_local'] += 1
+            except ValueError:
+                partition = UNDATED
+            sys.stdout.write(f"{partition}\t")
+            writer.writerow(values)
+    counters.emit()
+
+if __name__ == "__main__":
+    mapper()
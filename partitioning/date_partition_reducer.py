@@ -0,0 +1,77 @@
+import sys
+import csv
+import argparse
+
+from records import EXPECTED_FIELDNAMES, NUMERIC_COLUMNS
+from partition_writer import PartitionWriter
+from date_partitions import UNDATED
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record
+
+# Writes the rows of every partition to {output_root}/year=YYYY/month=MM/part-NNNNN.csv
+# and prints the manifest, one line per partition:
+#   PARTITION  partition  rows  min_date  max_date  path
+# The result record also carries the min/max of every numeric column.
+
+DEFAULT_OUTPUT_ROOT = "/user/hadoop/epa_air_quality/partitions"
+DATE_POS = EXPECTED_FIELDNAMES.index('date_local')
+NUMERIC_POSITIONS = [(c, EXPECTED_FIELDNAMES.index(c)) for c in NUMERIC_COLUMNS]
+
+def new_partition_stats():
+    return {"rows": 0, "min_date": None, "max_date": None, "min": {}, "max": {}}
+
+def update_stats(stats, line, dated=True):
+    # The rows of UNDATED are those whose date did not parse: no date span
+    stats["rows"] += 1
+    try:
+        row = next(csv.reader([line]))
+    except StopIteration:
+        return
+    if dated and len(row) > DATE_POS:
+        date = row[DATE_POS][:10]
+        if stats["min_date"] is None or date < stats["min_date"]:
+            stats["min_date"] = date
+        if stats["max_date"] is None or date > stats["max_date"]:
+            stats["max_date"] = date
+    for column, pos in NUMERIC_POSITIONS:
+        try:
+            value = float(row[pos])
+        except (ValueError, IndexError):
+            continue
+        if value < stats["min"].get(column, value + 1):
+            stats["min"][column] = value
+        if value > stats["max"].get(column, value - 1):
+            stats["max"][column] = value
+
+def reducer(output_root, use_hdfs, source):
+    writer = PartitionWriter(output_root, use_hdfs)
+    partitions = {}
+    record = new_record("date_partitioning")
+    for line in sys.stdin:
+        partition, sep, row_line = line.partition('\t')
+        if not sep:
+            continue
+        if partition == TASK_META_KEY:
+            merge_task_meta(record, row_line)
+            continue
+        writer.write(partition, row_line)
+        if partition not in partitions:
+            partitions[partition] = new_partition_stats()
+        update_stats(partitions[partition], row_line, partition != UNDATED)
+    writer.close()
+
+    for partition in sorted(partitions):
+        stats = partitions[partition]
+        stats["path"] = writer.path(partition)
+        print(f"PARTITION\t{partition}\t{stats['rows']}\t{stats['min_date'] or ''}\t{stats['max_date'] or ''}\t{stats['path']}")
+        record["results"][partition] = stats
+    record["state"]["output_root"] = output_root
+    record["state"]["source"] = source
+    emit_record(finish_record(record))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes year/month partitions and their manifest")
+    parser.add_argument("--output-root", default=DEFAULT_OUTPUT_ROOT)
+    parser.add_argument("--local", action="store_true", help="write to the local file system instead of HDFS")
+    parser.add_argument("--source", default="", help="input path the partitions were built from")
+    args = parser.parse_args()
+    reducer(args.output_root, not args.local, args.source)
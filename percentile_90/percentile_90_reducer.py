@@ -1,29 +1,20 @@
 import sys
-from collections import defaultdict
 
-MIN_VALUE = 0.0
-MAX_VALUE = 500.0
-NUM_BUCKETS = 1000
+from aggregates import AGGREGATE_KEY, decode, merge_into
+from records import COLUMN_UNITS, ordered_columns
+from histogram import parse_layout, populated_window
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_comparison, print_counts
+from wire import read_records
 
-def get_bucket_range(bucket_idx, min_val, max_val, num_buckets):
-    bucket_width = (max_val - min_val) / num_buckets
-    bucket_start = min_val + (bucket_idx * bucket_width)
-    bucket_end = bucket_start + bucket_width
-    return bucket_start, bucket_end
-
-def process_line(line, bucket_counts, total_count, line_count):
+def process_record(parts, histograms, line_count, record):
     line_count[0] += 1
     try:
-        parts = line.strip().split('\t')
-        if len(parts) == 2:
-            key, value = parts
-            
-            if key.startswith("BUCKET_"):
-                bucket_idx = int(key[7:]) 
-                bucket_counts[bucket_idx] += int(value)
-                
-            elif key == "TOTAL_COUNT":
-                total_count[0] += int(value)
+        if parts[0] == TASK_META_KEY:
+            merge_task_meta(record, parts[1])
+        elif len(parts) == 3:
+            key, column, value = parts
+            if key == AGGREGATE_KEY:
+                merge_into(histograms, column, decode(value))
         else:
             invalid_format = True
                 
@@ -32,103 +23,122 @@ def process_line(line, bucket_counts, total_count, line_count):
         print(f"DEBUG: Line {line_count[0]} error while processing: {e}", file=sys.stderr)
         error_logged = True
 
-def print_histogram(bucket_counts, percentile_bucket):
-    print("\n=== Histogram Distribution (First 50 Bucket) ===")
+def print_histogram(bucket_counts, percentile_bucket, layout):
+    print("\n=== Histogram Distribution (50 buckets around the 90th percentile) ===")
     max_count = max(bucket_counts.values()) if bucket_counts else 1
-    for i in range(min(50, max(bucket_counts.keys()) + 1)):
-        if i in bucket_counts:
-            bucket_start, bucket_end = get_bucket_range(i, MIN_VALUE, MAX_VALUE, NUM_BUCKETS)
-            count = bucket_counts[i]
-            bar_length = int((count / max_count) * 40) if max_count > 0 else 0
-            bar = '#' * bar_length
-            marker = ""
-            if i == percentile_bucket:
-                marker = " <-- 90th PERCENTILE"
-            
-            print(f"Bucket {i:03d} [{bucket_start:6.2f}-{bucket_end:6.2f}]: {bar} ({count}){marker}")
+    for i in populated_window(bucket_counts, percentile_bucket, 50):
+        bucket_start, bucket_end = layout.bucket_range(i)
+        count = bucket_counts[i]
+        bar_length = int((count / max_count) * 40) if max_count > 0 else 0
+        bar = '#' * bar_length
+        marker = ""
+        if i == percentile_bucket:
+            marker = " <-- 90th PERCENTILE"
+        
+        print(f"Bucket {i:03d} [{bucket_start:8.4g}-{bucket_end:8.4g}]: {bar} ({count}){marker}")
 
-def calculate_other_percentiles(bucket_counts, total_count_value):
-    print("\n=== Other Percentile Values ​​(For Comparison) ===")
-    percentiles = [
-        (50, "Median"),
-        (95, "95th percentile"),
-        (99, "99th percentile")
-    ]
-    
-    for percentile, label in percentiles:
+OTHER_PERCENTILES = [
+    (50, "Median"),
+    (95, "95th percentile"),
+    (99, "99th percentile")
+]
+
+def calculate_other_percentiles(bucket_counts, total_count_value, layout):
+    values = {}
+    for percentile, label in OTHER_PERCENTILES:
         position = total_count_value * (percentile / 100.0)
         cumulative = 0
         
         for bucket_idx in sorted(bucket_counts.keys()):
             cumulative += bucket_counts[bucket_idx]
             if cumulative >= position:
-                bucket_start, bucket_end = get_bucket_range(bucket_idx, MIN_VALUE, MAX_VALUE, NUM_BUCKETS)
-                value = (bucket_start + bucket_end) / 2
-                print(f"{percentile}th percentile ({label}): ~{value:.2f} μg/m³")
-                bucket_idx = max(bucket_counts.keys()) + 1  # Döngüyü sonlandırmak için
+                bucket_start, bucket_end = layout.bucket_range(bucket_idx)
+                values[f"p{percentile}"] = (bucket_start + bucket_end) / 2
+                break
+    return values
 
-def reducer():
-    bucket_counts = defaultdict(int)
-    total_count = [0]  
-    line_count = [0]   
-    for line in sys.stdin:
-        process_line(line, bucket_counts, total_count, line_count)
-    total_count_value = total_count[0]
-    print(f"DEBUG: Total {line_count[0]} lines read", file=sys.stderr)
-    print(f"DEBUG: {len(bucket_counts)} different buckets found", file=sys.stderr)
+def print_other_percentiles(other_percentiles, unit):
+    print("\n=== Other Percentile Values ​​(For Comparison) ===")
+    for percentile, label in OTHER_PERCENTILES:
+        value = other_percentiles.get(f"p{percentile}")
+        if value is not None:
+            print(f"{percentile}th percentile ({label}): ~{value:.4g}{unit}")
+
+def column_result(bucket_counts, total_count_value, layout):
+    percentile_90_position = total_count_value * 0.9
+    result = {
+        "total_records": total_count_value,
+        "percentile_90_position": percentile_90_position,
+        "buckets_used": len(bucket_counts),
+        "percentile_90": None,
+    }
+    cumulative_count = 0
+    for bucket_idx in sorted(bucket_counts.keys()):
+        count_in_bucket = bucket_counts[bucket_idx]
+        cumulative_count += count_in_bucket
+        
+        if cumulative_count >= percentile_90_position:
+            bucket_start, bucket_end = layout.bucket_range(bucket_idx)
+            position_in_bucket = percentile_90_position - (cumulative_count - count_in_bucket)
+            fraction_in_bucket = position_in_bucket / count_in_bucket if count_in_bucket > 0 else 0.5
+            result["percentile_90"] = bucket_start + (fraction_in_bucket * (bucket_end - bucket_start))
+            result["percentile_bucket"] = bucket_idx
+            result["bucket_range"] = [bucket_start, bucket_end]
+            result["records_in_bucket"] = count_in_bucket
+            result["position_in_bucket"] = position_in_bucket
+            break
+    result["other_percentiles"] = calculate_other_percentiles(bucket_counts, total_count_value, layout)
+    return result
+
+def histogram_state(bucket_counts, layout):
+    return {"layout": layout.spec(), "num_buckets": layout.num_buckets,
+            "counts": {str(i): bucket_counts[i] for i in sorted(bucket_counts)}}
+
+def report_percentile(column, result, histogram):
+    unit = COLUMN_UNITS.get(column, "")
+    bucket_counts = {int(i): c for i, c in histogram["counts"].items()}
+    layout = parse_layout(histogram["layout"])
+    total_count_value = result["total_records"]
+    print(f"DEBUG: {column}: {len(bucket_counts)} different buckets found", file=sys.stderr)
     
     # Sonuçları yazdır
     print(f"=== 90th Percentile Calculation Results  ===")
+    print(f"Column: {column}")
     print(f"Total number of records: {total_count_value}")
     
     if total_count_value == 0:
         print("ERROR: No data processed!")
         return
-    percentile_90_position = total_count_value * 0.9
-    print(f"90th percentile pozition: {percentile_90_position:.0f}")
+    print(f"90th percentile pozition: {result['percentile_90_position']:.0f}")
     print(f"(90% of the values ​​are below this position)")
-    print(f"Number of buckets used: {len(bucket_counts)}")
+    print(f"Bucket layout: {histogram['layout']}")
+    print(f"Number of buckets used: {result['buckets_used']}")
     
     if len(bucket_counts) == 0:
         print("\nERROR: No bucket data found!")
         print("Check the Mapper output.")
         return
         
-    cumulative_count = 0
-    percentile_bucket = None
-    percentile_value = None
-    
-    for bucket_idx in sorted(bucket_counts.keys()):
-        count_in_bucket = bucket_counts[bucket_idx]
-        cumulative_count += count_in_bucket
-        
-        if cumulative_count >= percentile_90_position and percentile_bucket is None:
-            percentile_bucket = bucket_idx
-            bucket_start, bucket_end = get_bucket_range(
-                bucket_idx, MIN_VALUE, MAX_VALUE, NUM_BUCKETS
-            )
-            
-            position_in_bucket = percentile_90_position - (cumulative_count - count_in_bucket)
-            fraction_in_bucket = position_in_bucket / count_in_bucket if count_in_bucket > 0 else 0.5
-            percentile_value = bucket_start + (fraction_in_bucket * (bucket_end - bucket_start))
-            
-            print(f"\n90th percentile bucket: {bucket_idx}")
-            print(f"Bucket range: [{bucket_start:.4f}, {bucket_end:.4f}]")
-            print(f"Number of records in bucket: {count_in_bucket}")
-            print(f"Pozition in bucket: {position_in_bucket:.0f}")
-    
+    percentile_bucket = result.get("percentile_bucket")
+    percentile_value = result["percentile_90"]
     if percentile_value is not None:
-        print(f"\n*** 90th Percentile Value: {percentile_value:.4f} μg/m³ ***")
+        bucket_start, bucket_end = result["bucket_range"]
+        print(f"\n90th percentile bucket: {percentile_bucket}")
+        print(f"Bucket range: [{bucket_start:.6g}, {bucket_end:.6g}]")
+        print(f"Number of records in bucket: {result['records_in_bucket']}")
+        print(f"Pozition in bucket: {result['position_in_bucket']:.0f}")
+        print(f"\n*** 90th Percentile Value: {percentile_value:.4f}{unit} ***")
         print(f"\n=== Interpretation of Results ===")
-        print(f"90% of the measurements are below {percentile_value:.2f} μg/m³.")
+        print(f"90% of the measurements are below {percentile_value:.4g}{unit}.")
         
-        if percentile_value <= 35:
-            print("✓ EPA 24-hour standard (35 μg/m³) is met!")
-        else:
-            print(f"⚠ EPA standard {percentile_value - 35:.1f} μg/m³ is exceeded!")
+        if column == "arithmetic_mean":
+            if percentile_value <= 35:
+                print("✓ EPA 24-hour standard (35 μg/m³) is met!")
+            else:
+                print(f"⚠ EPA standard {percentile_value - 35:.1f} μg/m³ is exceeded!")
             
-    calculate_other_percentiles(bucket_counts, total_count_value)
-    print_histogram(bucket_counts, percentile_bucket)
+    print_other_percentiles(result["other_percentiles"], unit)
+    print_histogram(bucket_counts, percentile_bucket, layout)
 
     print(f"\n=== Data Distribution Summary ===")
     print(f"Total number of buckets: {len(bucket_counts)}")
@@ -136,5 +146,31 @@ def reducer():
     print(f"Highest bucket index: {max(bucket_counts.keys())}")
     print(f"Highest bucket: {max(bucket_counts, key=bucket_counts.get)} ({max(bucket_counts.values())} records)")
 
+def reducer():
+    histograms = {}
+    line_count = [0]   
+    record = new_record("percentile_90")
+    for parts in read_records():
+        process_record(parts, histograms, line_count, record)
+    print(f"DEBUG: Total {line_count[0]} lines read", file=sys.stderr)
+
+    for column in ordered_columns(histograms):
+        histogram = histograms[column]
+        bucket_counts = histogram.bucket_counts()
+        record["results"][column] = column_result(bucket_counts, histogram.total(), histogram.layout)
+        record["state"][column] = {"histogram": histogram_state(bucket_counts, histogram.layout)}
+    finish_record(record)
+
+    if not record["results"]:
+        print(f"=== 90th Percentile Calculation Results  ===")
+        print("ERROR: No data processed!")
+    for i, column in enumerate(record["results"]):
+        if i > 0:
+            print()
+        report_percentile(column, record["results"][column], record["state"][column]["histogram"])
+    print_counts(record)
+    print_comparison(record)
+    emit_record(record)
+
 if __name__ == "__main__":
     reducer()
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import statistics
+
+# Every analysis run the GUI starts, kept in a local SQLite database: the
+# dataset fingerprint, algorithm, execution mode, YARN application id,
+# per-stage timings, row counts, throughput and Hadoop counters. The execution
+# planner fits its cost model on the finished runs, and the trends view plots
+# latency and throughput per dataset and algorithm and flags runs that are
+# slower than their own history.
+
+DB_PATH = os.path.join(os.path.expanduser("~"), ".epa_big_data", "run_history.sqlite")
+LEGACY_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".epa_big_data", "execution_history.json")
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STAGES = ["preparation", "planning", "execution", "results"]
+SLOW_MIN_RUNS = 3       # earlier runs needed before a run can be flagged
+SLOW_MIN_RATIO = 1.25   # never flag a run less than 25% above the median
+SLOW_MADS = 3.0         # or less than this many (scaled) MADs above it
+HADOOP_COUNTERS = {
+    # counter line in the streaming job's stderr: key in the counters column
+    "Map input records": "map_input_records",
+    "Map output records": "map_output_records",
+    "Map output bytes": "map_output_bytes",
+    "Reduce input records": "reduce_input_records",
+    "Reduce output records": "reduce_output_records",
+    "HDFS: Number of bytes read": "hdfs_bytes_read",
+    "HDFS: Number of bytes written": "hdfs_bytes_written",
+    "Launched map tasks": "map_tasks",
+    "Launched reduce tasks": "reduce_tasks",
+    "CPU time spent (ms)": "cpu_ms",
+    "GC time elapsed (ms)": "gc_ms",
+    "Spilled Records": "spilled_records",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    dataset TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    application_id TEXT,
+    status TEXT NOT NULL,
+    input_bytes INTEGER NOT NULL,
+    rows INTEGER,
+    skipped_rows INTEGER,
+    execution_seconds REAL NOT NULL,
+    total_seconds REAL,
+    bytes_per_second REAL,
+    rows_per_second REAL,
+    stages TEXT NOT NULL DEFAULT '{}',
+    counters TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS runs_series ON runs (fingerprint, algorithm, mode, started);
+CREATE INDEX IF NOT EXISTS runs_mode ON runs (mode, status, started);
+"""
+
+def dataset_fingerprint(input_paths, input_bytes, filters=()):
+    # Same paths, same size and same row filters: the same work, as far as
+    # timings are concerned
+    key = '\n'.join(sorted(input_paths) + sorted(filters)) + f"\n{input_bytes}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+def parse_hadoop_counters(stderr_text):
+    # "\t\tMap input records=1000" lines of the streaming client's job report
+    counters = {}
+    for line in (stderr_text or "").splitlines():
+        name, sep, value = line.strip().rpartition('=')
+        if sep and name in HADOOP_COUNTERS:
+            try:
+                counters[HADOOP_COUNTERS[name]] = int(value)
+            except ValueError:
+                pass
+    return counters
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    if path == DB_PATH:
+        migrate_legacy_history(connection)
+    return connection
+
+def migrate_legacy_history(connection, legacy_path=LEGACY_HISTORY_PATH):
+    # The planner used to keep its last runs per mode in a JSON file
+    try:
+        with open(legacy_path) as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    rows = [(run["time"], "", "", "", mode, STATUS_OK, run["bytes"], run["seconds"],
+             run["bytes"] / run["seconds"] if run["seconds"] > 0 else None)
+            for mode, runs in history.items() for run in runs]
+    with connection:
+        connection.executemany(
+            "INSERT INTO runs (started, dataset, fingerprint, algorithm, mode, status, input_bytes,"
+            " execution_seconds, bytes_per_second) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    os.replace(legacy_path, legacy_path + ".migrated")
+    return len(rows)
+
+def record_run(run, path=DB_PATH):
+    # run: dict with the columns of the runs table; stages and counters are dicts
+    stages = run.get("stages", {})
+    seconds = run["execution_seconds"]
+    rows = run.get("rows")
+    values = {
+        "started": run.get("started", time.time()),
+        "dataset": run.get("dataset", ""),
+        "fingerprint": run.get("fingerprint", ""),
+        "algorithm": run.get("algorithm", ""),
+        "mode": run["mode"],
+        "application_id": run.get("application_id"),
+        "status": run.get("status", STATUS_OK),
+        "input_bytes": run["input_bytes"],
+        "rows": rows,
+        "skipped_rows": run.get("skipped_rows"),
+        "execution_seconds": seconds,
+        "total_seconds": run.get("total_seconds", sum(stages.values()) or None),
+        "bytes_per_second": run["input_bytes"] / seconds if seconds > 0 else None,
+        "rows_per_second": rows / seconds if rows and seconds > 0 else None,
+        "stages": json.dumps(stages),
+        "counters": json.dumps(run.get("counters", {})),
+    }
+    try:
+        connection = connect(path)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        with connection:
+            cursor = connection.execute(
+                f"INSERT INTO runs ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+                list(values.values()))
+        return cursor.lastrowid
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+
+def run_dict(row):
+    run = dict(row)
+    run["stages"] = json.loads(run["stages"] or "{}")
+    run["counters"] = json.loads(run["counters"] or "{}")
+    return run
+
+def query_runs(where="", params=(), limit=None, path=DB_PATH):
+    sql = "SELECT * FROM runs" + (f" WHERE {where}" if where else "") + " ORDER BY started"
+    if limit:
+        sql = f"SELECT * FROM ({sql} DESC LIMIT {int(limit)}) ORDER BY started"
+    try:
+        connection = connect(path)
+    except (OSError, sqlite3.Error):
+        return []
+    try:
+        return [run_dict(row) for row in connection.execute(sql, params)]
+    except sqlite3.Error:
+        return []
+    finally:
+        connection.close()
+
+def mode_history(limit=50, path=DB_PATH):
+    # {mode: [{"bytes", "seconds", "time"}]}: the last successful runs per mode
+    try:
+        connection = connect(path)
+    except (OSError, sqlite3.Error):
+        return {}
+    try:
+        modes = [row[0] for row in connection.execute("SELECT DISTINCT mode FROM runs WHERE status = ?", (STATUS_OK,))]
+    except sqlite3.Error:
+        modes = []
+    finally:
+        connection.close()
+    history = {}
+    for mode in modes:
+        runs = query_runs("mode = ? AND status = ?", (mode, STATUS_OK), limit, path)
+        history[mode] = [{"bytes": r["input_bytes"], "seconds": r["execution_seconds"],
+                          "time": r["started"]} for r in runs]
+    return history
+
+def series_runs(fingerprint, algorithm, mode, before=None, path=DB_PATH):
+    where = "fingerprint = ? AND algorithm = ? AND mode = ? AND status = ?"
+    params = [fingerprint, algorithm, mode, STATUS_OK]
+    if before is not None:
+        where += " AND started < ?"
+        params.append(before)
+    return query_runs(where, params, path=path)
+
+def list_series(path=DB_PATH):
+    # (dataset, fingerprint, algorithm, mode, run count) of every recorded series
+    try:
+        connection = connect(path)
+    except (OSError, sqlite3.Error):
+        return []
+    try:
+        return [tuple(row) for row in connection.execute(
+            "SELECT MAX(dataset), fingerprint, algorithm, mode, COUNT(*) FROM runs"
+            " WHERE algorithm != '' GROUP BY fingerprint, algorithm, mode ORDER BY MAX(started) DESC")]
+    except sqlite3.Error:
+        return []
+    finally:
+        connection.close()
+
+def slow_threshold(previous_seconds):
+    # Median plus a robust spread (scaled MAD) of the earlier runs, or None
+    # when there are too few of them to say
+    if len(previous_seconds) < SLOW_MIN_RUNS:
+        return None
+    median = statistics.median(previous_seconds)
+    mad = statistics.median(abs(s - median) for s in previous_seconds) * 1.4826
+    return max(median * SLOW_MIN_RATIO, median + SLOW_MADS * mad)
+
+def slow_run_report(run, previous):
+    # Why `run` is slower than the `previous` runs of its series, or None
+    seconds = [r["execution_seconds"] for r in previous]
+    threshold = slow_threshold(seconds)
+    if threshold is None or run["execution_seconds"] <= threshold:
+        return None
+    return (f"{run['execution_seconds']:.1f} seconds, the {len(seconds)} earlier runs took "
+            f"{statistics.median(seconds):.1f} seconds (median), flagged above {threshold:.1f} seconds")
+
+def flag_slow_runs(runs):
+    # Marks every run (in time order) that is slower than the runs before it
+    for i, run in enumerate(runs):
+        threshold = slow_threshold([r["execution_seconds"] for r in runs[:i]])
+        run["slow"] = threshold is not None and run["execution_seconds"] > threshold
+        run["slow_threshold"] = threshold
+    return runs
+
+def format_rate(bytes_per_second):
+    if not bytes_per_second:
+        return "-"
+    return f"{bytes_per_second / (1024 * 1024):.2f} MB/s"
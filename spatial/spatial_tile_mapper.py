@@ -0,0 +1,31 @@
+import sys
+import csv
+
+from records import EXPECTED_FIELDNAMES, iter_row_blocks
+from spatial import TILE_DEGREES, TILE_UNLOCATED, parse_coordinates, tile_id
+from job_output import TaskCounters
+
+# Keys every row by its grid tile:   tile \t row (CSV, EXPECTED_FIELDNAMES order)
+# Tiles are written without a header, which the statistic mappers fall back
+# to anyway for headerless splits.
+
+def mapper(tile_degrees):
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    counters = TaskCounters(['latitude'])
+    lat_pos = EXPECTED_FIELDNAMES.index('latitude')
+    lon_pos = EXPECTED_FIELDNAMES.index('longitude')
+    for indexes, rows in iter_row_blocks(sys.stdin, EXPECTED_FIELDNAMES):
+        counters.rows += len(rows)
+        for row in rows:
+            values = [row[i] if 0 <= i < len(row) else '' for i in indexes]
+            try:
+                tile = tile_id(*parse_coordinates(values[lat_pos], values[lon_pos]), tile_degrees)
+                counters.valid['latitude'] += 1
+            except ValueError:
+                tile = TILE_UNLOCATED
+            sys.stdout.write(f"{tile}\t")
+            writer.writerow(values)
+    counters.emit()
+
+if __name__ == "__main__":
+    mapper(float(sys.argv[1]) if len(sys.argv) > 1 else TILE_DEGREES)
@@ -0,0 +1,68 @@
+import sys
+import csv
+import argparse
+
+from records import EXPECTED_FIELDNAMES
+from spatial import parse_coordinates
+from partition_writer import PartitionWriter
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record
+
+# Writes the rows of every tile to {output_root}/{tile}/part-NNNNN.csv and
+# prints the tile index, one line per tile:
+#   TILE  tile  rows  min_lat  min_lon  max_lat  max_lon  path
+# (empty extent for the rows without coordinates)
+
+DEFAULT_OUTPUT_ROOT = "/user/hadoop/epa_air_quality/tiles"
+LAT_POS = EXPECTED_FIELDNAMES.index('latitude')
+LON_POS = EXPECTED_FIELDNAMES.index('longitude')
+
+def update_extent(tile_stats, line):
+    tile_stats["rows"] += 1
+    try:
+        row = next(csv.reader([line]))
+        lat, lon = parse_coordinates(row[LAT_POS], row[LON_POS])
+    except (ValueError, IndexError, StopIteration):
+        return
+    extent = tile_stats["extent"]
+    if extent is None:
+        tile_stats["extent"] = [lat, lon, lat, lon]
+    else:
+        extent[0] = min(extent[0], lat)
+        extent[1] = min(extent[1], lon)
+        extent[2] = max(extent[2], lat)
+        extent[3] = max(extent[3], lon)
+
+def reducer(output_root, use_hdfs, source):
+    writer = PartitionWriter(output_root, use_hdfs)
+    tiles = {}
+    record = new_record("spatial_layout")
+    for line in sys.stdin:
+        tile, sep, row_line = line.partition('\t')
+        if not sep:
+            continue
+        if tile == TASK_META_KEY:
+            merge_task_meta(record, row_line)
+            continue
+        writer.write(tile, row_line)
+        if tile not in tiles:
+            tiles[tile] = {"rows": 0, "extent": None}
+        update_extent(tiles[tile], row_line)
+    writer.close()
+
+    for tile in sorted(tiles):
+        stats = tiles[tile]
+        stats["path"] = writer.path(tile)
+        extent = '\t'.join(repr(v) for v in stats["extent"]) if stats["extent"] else '\t\t\t'
+        print(f"TILE\t{tile}\t{stats['rows']}\t{extent}\t{stats['path']}")
+        record["results"][tile] = stats
+    record["state"]["output_root"] = output_root
+    record["state"]["source"] = source
+    emit_record(finish_record(record))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes spatial tiles and their index")
+    parser.add_argument("--output-root", default=DEFAULT_OUTPUT_ROOT)
+    parser.add_argument("--local", action="store_true", help="write to the local file system instead of HDFS")
+    parser.add_argument("--source", default="", help="input path the layout was built from")
+    args = parser.parse_args()
+    reducer(args.output_root, not args.local, args.source)
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Cold-start cost of one streaming task, loose scripts vs. the job archive.
+# Every run starts in a fresh directory, like a YARN task working directory,
+# so no __pycache__ survives between runs; the input is just the CSV header,
+# so the timing is interpreter start, imports and shutdown.
+#   python3 startup_benchmark.py --runs 30
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPO_DIR, 'common'))
+from records import EXPECTED_FIELDNAMES
+from job_archive import ARCHIVE_NAME, build_archive
+
+TASKS = [
+    # (job directory, script, archive subcommand)
+    ("std_dev", "stddev_welford_mapper.py", "std_dev map"),
+    ("std_dev", "stddev_welford_reducer.py", "std_dev reduce"),
+    ("median", "median_histogram_mapper.py", "median map"),
+    ("top_k", "top_k_mapper.py", "top_k map"),
+]
+
+def time_run(command, cwd, stdin_text):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=cwd, input=stdin_text, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started
+
+def loose_files(job_dir):
+    common_dir = os.path.join(REPO_DIR, 'common')
+    return ([os.path.join(common_dir, name) for name in os.listdir(common_dir) if name.endswith('.py')] +
+            [os.path.join(REPO_DIR, job_dir, name) for name in os.listdir(os.path.join(REPO_DIR, job_dir))
+             if name.endswith('.py')])
+
+def measure(task, runs, archives, stdin_text):
+    job_dir, script, subcommand = task
+    results = {"loose scripts": [], "archive (source)": [], "archive (bytecode)": []}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as task_dir:
+            for path in loose_files(job_dir):
+                shutil.copy(path, task_dir)
+            results["loose scripts"].append(time_run([sys.executable, script], task_dir, stdin_text))
+        for label, archive in archives.items():
+            with tempfile.TemporaryDirectory() as task_dir:
+                shutil.copy(archive, os.path.join(task_dir, ARCHIVE_NAME))
+                command = [sys.executable, ARCHIVE_NAME] + subcommand.split()
+                results[label].append(time_run(command, task_dir, stdin_text))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Task cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    stdin_text = ','.join(EXPECTED_FIELDNAMES) + '\n'
+    job_dirs = [os.path.join(REPO_DIR, d) for d in sorted({t[0] for t in TASKS})]
+    with tempfile.TemporaryDirectory() as build_dir:
+        archives = {
+            "archive (source)": os.path.join(build_dir, "source.pyz"),
+            "archive (bytecode)": os.path.join(build_dir, "bytecode.pyz"),
+        }
+        sources = [os.path.join(REPO_DIR, 'common')] + job_dirs
+        build_archive(sources, archives["archive (source)"])
+        build_archive(sources, archives["archive (bytecode)"], compile_bytecode=True)
+        print(f"Python {sys.version.split()[0]}, {args.runs} runs per task, median milliseconds\n")
+        print(f"{'task':<28}{'loose scripts':>16}{'archive (source)':>19}{'archive (bytecode)':>21}")
+        for task in TASKS:
+            results = measure(task, args.runs, archives, stdin_text)
+            cells = ''.join(f"{statistics.median(times) * 1000:>{width}.1f}"
+                            for times, width in zip(results.values(), (16, 19, 21)))
+            print(f"{task[2]:<28}{cells}")
+
+if __name__ == "__main__":
+    main()
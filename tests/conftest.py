@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the shared modules the way the job scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
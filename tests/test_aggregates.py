@@ -0,0 +1,169 @@
+import random
+
+import pytest
+
+from aggregates import (AGGREGATE_TYPES, WIRE_VERSION, BucketStats, CoMoments, Count, Distinct, FrequentItems,
+                        Histogram, MinMax, Moments, decode, merge_samples)
+from histogram import LinearLayout, LogLinearLayout
+from topk import SpaceSaving
+
+RNG = random.Random(20)
+VALUES = [RNG.lognormvariate(2.0, 0.8) for _ in range(5000)]
+OTHER = [v * 0.5 + RNG.gauss(0, 1) for v in VALUES]
+KEYS = [f"site-{int(RNG.paretovariate(1.2))}" for _ in range(5000)]
+SPLITS = [(0, 1), (1, 700), (700, 701), (701, 3333), (3333, 5000)]
+LAYOUT = LogLinearLayout(0.01, 1000.0)
+
+def split(values):
+    return [values[start:end] for start, end in SPLITS]
+
+def sample_aggregates():
+    bucket_stats = BucketStats(LinearLayout(0.0, 100.0, 20), 8, rng=random.Random(1))
+    bucket_stats.update_block(VALUES)
+    histogram = Histogram(LAYOUT)
+    histogram.update_block(VALUES)
+    moments = Moments()
+    moments.update_block(VALUES)
+    comoments = CoMoments(["aqi", "arithmetic_mean"])
+    comoments.update_block([VALUES, OTHER])
+    distinct = Distinct(precision=10)
+    distinct.update_block(KEYS)
+    frequent = FrequentItems(16)
+    frequent.update_block(KEYS)
+    min_max = MinMax()
+    min_max.update_block(VALUES)
+    return [Count(len(VALUES)), min_max, moments, comoments, histogram, distinct, frequent, bucket_stats]
+
+def state(aggregate):
+    # Comparable state of every aggregate type
+    if isinstance(aggregate, BucketStats):
+        return aggregate.layout.spec(), aggregate.capacity, list(aggregate.counts), aggregate.stats
+    if isinstance(aggregate, Histogram):
+        return aggregate.layout.spec(), list(aggregate.counts)
+    if isinstance(aggregate, (Moments, CoMoments)):
+        return aggregate.result()
+    if isinstance(aggregate, Distinct):
+        return aggregate.sketch.precision, bytes(aggregate.sketch.registers)
+    if isinstance(aggregate, FrequentItems):
+        return aggregate.summary.to_dict()
+    return vars(aggregate)
+
+def test_every_type_is_covered():
+    assert {type(a) for a in sample_aggregates()} == set(AGGREGATE_TYPES.values())
+
+@pytest.mark.parametrize("aggregate", sample_aggregates(), ids=lambda a: type(a).__name__)
+def test_round_trip(aggregate):
+    data = aggregate.to_bytes()
+    assert data[0] == WIRE_VERSION and data[1] == aggregate.type_code
+    for encoded in (data, aggregate.serialize()):
+        decoded = decode(encoded)
+        assert type(decoded) is type(aggregate)
+        assert state(decoded) == state(aggregate)
+
+def test_decode_rejects_other_versions():
+    data = Count(3).to_bytes()
+    with pytest.raises(ValueError):
+        decode(bytes((WIRE_VERSION + 1,)) + data[1:])
+    with pytest.raises(ValueError):
+        decode(bytes((WIRE_VERSION, 99)) + data[2:])
+
+def merged(parts, new):
+    # One aggregate per part, sent over the wire and merged like a reducer does
+    total = None
+    for part in parts:
+        aggregate = new()
+        aggregate.update_block(part)
+        aggregate = decode(aggregate.serialize())
+        if total is None:
+            total = aggregate
+        else:
+            total.merge(aggregate)
+    return total
+
+def single_pass(values, new):
+    aggregate = new()
+    aggregate.update_block(values)
+    return aggregate
+
+@pytest.mark.parametrize("new, values", [
+    (Count, VALUES),
+    (MinMax, VALUES),
+    (lambda: Histogram(LAYOUT), VALUES),
+    (lambda: Distinct(precision=10), KEYS),
+], ids=["Count", "MinMax", "Histogram", "Distinct"])
+def test_exact_merge_of_splits(new, values):
+    assert state(merged(split(values), new)) == state(single_pass(values, new))
+
+def test_moments_merge_of_splits():
+    n, mean, *sums = merged(split(VALUES), Moments).result()
+    n_ref, mean_ref, *sums_ref = single_pass(VALUES, Moments).result()
+    assert n == n_ref
+    assert mean == pytest.approx(mean_ref, rel=1e-12)
+    assert sums == pytest.approx(sums_ref, rel=1e-12)
+
+def test_comoments_merge_of_splits():
+    new = lambda: CoMoments(["aqi", "arithmetic_mean"])
+    parts = [[VALUES[start:end], OTHER[start:end]] for start, end in SPLITS]
+    n, means, C = merged(parts, new).result()
+    n_ref, means_ref, C_ref = single_pass([VALUES, OTHER], new).result()
+    assert n == n_ref
+    assert means == pytest.approx(means_ref, rel=1e-12)
+    assert C == pytest.approx(C_ref, rel=1e-12)
+
+def test_comoments_reject_other_columns():
+    with pytest.raises(ValueError):
+        CoMoments(["aqi"]).merge(CoMoments(["arithmetic_mean"]))
+
+def test_space_saving_merge_bounds():
+    capacity = 16
+    summaries = []
+    for part in split(KEYS):
+        summary = SpaceSaving(capacity)
+        for key in part:
+            summary.add(key)
+        summaries.append(summary)
+    total = summaries[0]
+    for summary in summaries[1:]:
+        total.merge(summary)
+    true_counts = {}
+    for key in KEYS:
+        true_counts[key] = true_counts.get(key, 0) + 1
+    assert len(total.counts) <= capacity
+    for key, count, error in total.items():
+        # Never under the true count, and over it by at most the error,
+        # itself bounded by N / capacity
+        assert count - error <= true_counts[key] <= count
+        assert error <= len(KEYS) / capacity
+    # Every key more frequent than N / capacity is tracked
+    for key, count in true_counts.items():
+        if count > len(KEYS) / capacity:
+            assert key in total.counts
+
+def test_merge_samples_size_and_membership():
+    rng = random.Random(5)
+    a = list(range(0, 40))
+    b = list(range(100, 104))
+    for capacity in (0, 3, 8, 20, 50):
+        sample_a = rng.sample(a, min(capacity, len(a)))
+        sample_b = rng.sample(b, min(capacity, len(b)))
+        sample = merge_samples(sample_a, len(a), sample_b, len(b), capacity, rng)
+        assert len(sample) == min(capacity, len(a) + len(b))
+        assert len(set(sample)) == len(sample)
+        assert set(sample) <= set(sample_a) | set(sample_b)
+
+def test_bucket_stats_merge_of_splits():
+    layout = LinearLayout(0.0, 100.0, 20)
+    capacity = 8
+    # Quarter steps keep every sum exact in binary floating point
+    values = [round(v * 4) / 4 for v in VALUES]
+    parts = split(values)
+    total = merged(parts, lambda: BucketStats(layout, capacity, rng=random.Random(2)))
+    reference = BucketStats(layout, capacity, rng=random.Random(3))
+    reference.update_block(values)
+    assert list(total.counts) == list(reference.counts)
+    for bucket_idx, (count, min_value, max_value, bucket_sum, samples) in reference.stats.items():
+        merged_bucket = total.stats[bucket_idx]
+        assert merged_bucket[:4] == [count, min_value, max_value, bucket_sum]
+        assert len(merged_bucket[4]) == min(capacity, count)
+        bucket_values = [v for v in values if layout.index(v) == bucket_idx]
+        assert all(sample in bucket_values for sample in merged_bucket[4])
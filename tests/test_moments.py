@@ -0,0 +1,79 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+from moments import EMPTY_MOMENTS, MomentAccumulator, block_moments, block_weighted_moments, combine_moments
+
+# The tolerances documented in moments.py
+RELATIVE_ERROR = 1e-12
+MIN_CV = 1e-4
+LOW_CV_ERROR = 1e-16   # times 1 / cv, below MIN_CV
+
+def reference_moments(values, weights=None):
+    # Exact n, mean, M2, M3, M4 of the float values
+    weights = weights or [1] * len(values)
+    exact = [Fraction(v) for v in values]
+    n = sum(weights)
+    mean = sum(w * x for w, x in zip(weights, exact)) / n
+    sums = [sum(w * (x - mean) ** k for w, x in zip(weights, exact)) for k in (2, 3, 4)]
+    return n, mean, *sums
+
+def assert_close(moments, reference, relative_error=RELATIVE_ERROR):
+    assert moments[0] == reference[0]
+    for value, exact in zip(moments[1:], reference[1:]):
+        assert abs(Fraction(value) - exact) <= relative_error * abs(exact)
+
+def job_moments(values, splits, block_size):
+    # Mappers over the splits, each adding blocks; the reducer merges the
+    # mapper partials through its own accumulator
+    reducer = MomentAccumulator()
+    bounds = [0] + splits + [len(values)]
+    for start, end in zip(bounds, bounds[1:]):
+        mapper = MomentAccumulator()
+        for block_start in range(start, end, block_size):
+            mapper.add_block(values[block_start:min(end, block_start + block_size)])
+        reducer.add_partial(mapper.result())
+    return reducer.result()
+
+rng = random.Random(26)
+DATASETS = {
+    "skewed": [rng.lognormvariate(2.0, 0.9) for _ in range(6000)],
+    # An offset against a small spread (cv = MIN_CV), where one-pass sums fail
+    "offset": [5e3 + rng.expovariate(2.0) for _ in range(6000)],
+    "integers": [float(rng.randrange(0, 500) ** 2) for _ in range(6000)],
+}
+REFERENCES = {name: reference_moments(values) for name, values in DATASETS.items()}
+SPLITS = [[], [1], [5999], [17, 18, 2500], [100, 1000, 1001, 4096, 5000]]
+
+@pytest.mark.parametrize("name", DATASETS)
+@pytest.mark.parametrize("splits", SPLITS, ids=str)
+@pytest.mark.parametrize("block_size", [1, 7, 4096])
+def test_merged_moments_match_exact_reference(name, splits, block_size):
+    assert_close(job_moments(DATASETS[name], splits, block_size), REFERENCES[name])
+
+@pytest.mark.parametrize("splits", SPLITS[3:], ids=str)
+def test_low_variation_error_bound(splits):
+    # cv = 5e-7: the error grows as the spread shrinks against the mean
+    low_rng = random.Random(7)
+    values = [1e6 + low_rng.expovariate(2.0) for _ in range(6000)]
+    reference = reference_moments(values)
+    cv = float(reference[2] / (reference[0] - 1)) ** 0.5 / float(reference[1])
+    assert_close(job_moments(values, splits, 7), reference, LOW_CV_ERROR / cv)
+
+def test_block_moments():
+    values = [1e6 + v for v in DATASETS["skewed"][:500]]
+    assert_close(block_moments(values), reference_moments(values))
+    assert block_moments([]) == EMPTY_MOMENTS
+
+def test_weighted_block_moments_repeat_values():
+    values = DATASETS["skewed"][:300]
+    weight_rng = random.Random(8)
+    weights = [weight_rng.randrange(1, 25) for _ in values]
+    assert_close(block_weighted_moments(values, weights), reference_moments(values, weights))
+
+def test_combine_with_empty_partial():
+    partial = block_moments(DATASETS["skewed"][:10])
+    assert combine_moments(partial, EMPTY_MOMENTS) == partial
+    assert combine_moments(EMPTY_MOMENTS, partial) == partial
+    assert MomentAccumulator().result() == EMPTY_MOMENTS
@@ -0,0 +1,21 @@
+from records import comparison_sources, format_sources, parse_sources
+
+MAIN = "/user/hadoop/epa_air_quality/california.csv"
+PARTITION = "/user/hadoop/epa_air_quality/partitions/year=2019/month=06"
+
+def test_comparison_sources_labels():
+    sources = comparison_sources(MAIN, "ozone=/user/hadoop/ozone.csv, /user/hadoop/national.csv")
+    assert sources == [("california", MAIN), ("ozone", "/user/hadoop/ozone.csv"),
+                       ("national", "/user/hadoop/national.csv")]
+
+def test_comparison_sources_partition_path():
+    assert comparison_sources(MAIN, PARTITION)[1] == ("month=06", PARTITION)
+    assert comparison_sources(MAIN, f"june={PARTITION}")[1] == ("june", PARTITION)
+
+def test_comparison_sources_unique_labels():
+    labels = [label for label, _ in comparison_sources(MAIN, "/a/california.csv, /b/california.csv")]
+    assert labels == ["california", "california_2", "california_3"]
+
+def test_sources_round_trip():
+    sources = comparison_sources(MAIN, f"june 2019={PARTITION}")
+    assert parse_sources(format_sources(sources)) == sources
@@ -0,0 +1,152 @@
+import io
+import os
+import sys
+import csv
+import random
+import struct
+import subprocess
+
+import pytest
+
+from aggregates import Count, decode
+from job_output import load_record
+from local_runner import binary_text_stream, shuffle_typed
+from records import EXPECTED_FIELDNAMES
+from wire import (BOOL, BYTE, BYTES, DOUBLE, FLOAT, INT, LIST, LIST_END, LONG, MAP, STRING, TEXT, TYPED_BYTES,
+                  VECTOR, RecordWriter, decode_value, encode_pair, encode_value, read_pairs, read_records)
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def encoded(value):
+    return bytes(encode_value(value, bytearray()))
+
+def decoded(data):
+    return decode_value(io.BytesIO(data))
+
+@pytest.mark.parametrize("value, type_code", [
+    (b"\x00\xffpacked", BYTES),
+    (True, BOOL),
+    (False, BOOL),
+    (-(1 << 62), LONG),
+    (0.1, DOUBLE),
+    (float('inf'), DOUBLE),
+    ("Fresno, CA ü", STRING),
+    ("", STRING),
+    ([], VECTOR),
+    (["AGG", b"\x01\x02", 3, [4.5, ["nested", b""]]], VECTOR),
+    ({"key": [1, 2], "other": b"x"}, MAP),
+], ids=repr)
+def test_round_trip(value, type_code):
+    data = encoded(value)
+    assert data[0] == type_code
+    assert decoded(data) == (list(value) if isinstance(value, tuple) else value)
+
+def test_tuples_encode_as_vectors():
+    assert decoded(encoded(("a", 1))) == ["a", 1]
+
+@pytest.mark.parametrize("data, value", [
+    (struct.pack('>Bb', BYTE, -5), -5),
+    (struct.pack('>Bi', INT, -70000), -70000),
+    (struct.pack('>Bf', FLOAT, 1.5), 1.5),
+    (bytes((LIST,)) + encoded("a") + encoded(2) + bytes((LIST_END,)), ["a", 2]),
+], ids=["byte", "int", "float", "list"])
+def test_decode_java_types(data, value):
+    # Types Hadoop may write that encode_value never does
+    assert decoded(data) == value
+
+def test_unsupported_values():
+    with pytest.raises(TypeError):
+        encoded(object())
+    with pytest.raises(ValueError):
+        decoded(bytes((42,)))
+
+@pytest.mark.parametrize("cut", [1, 3, 5, 9])
+def test_truncated_stream(cut):
+    data = encode_pair("AGG", ["arithmetic_mean", b"payload"])
+    stream = io.BytesIO(data[:cut])
+    with pytest.raises(EOFError):
+        list(read_pairs(stream))
+
+def test_truncated_value_after_key():
+    with pytest.raises(EOFError):
+        list(read_pairs(io.BytesIO(encoded("AGG"))))
+
+def test_read_pairs():
+    data = encode_pair("b", [1]) + encode_pair("a", [b"x", 2.5])
+    assert list(read_pairs(io.BytesIO(data))) == [("b", [1]), ("a", [b"x", 2.5])]
+    assert list(read_pairs(io.BytesIO(b""))) == []
+
+def test_shuffle_typed_sorts_by_key_bytes():
+    pairs = [("b", [1]), ("AGG", [b"2"]), ("a", [3]), ("AGG", [b"1"])]
+    data = b"".join(encode_pair(key, value) for key, value in pairs)
+    shuffled = list(read_pairs(io.BytesIO(shuffle_typed(data))))
+    # Hadoop compares the serialized keys, length prefix included
+    assert [key for key, _ in shuffled] == sorted((key for key, _ in pairs), key=encoded)
+    assert [key for key, _ in shuffled] == ["a", "b", "AGG", "AGG"]
+    # Equal keys keep their map output order, as the text shuffle does
+    assert [value for key, value in shuffled if key == "AGG"] == [[b"2"], [b"1"]]
+
+@pytest.mark.parametrize("wire", [TEXT, TYPED_BYTES])
+def test_record_writer_round_trip(wire):
+    stream = binary_text_stream()
+    writer = RecordWriter(stream, wire)
+    writer.write("AGG", "arithmetic_mean", Count(7).to_bytes())
+    writer.write("TASK_META", '{"rows":7}')
+    stream.flush()
+    stream.seek(0)
+    records = list(read_records(stream, wire))
+    assert [record[:2] for record in records] == [["AGG", "arithmetic_mean"], ["TASK_META", '{"rows":7}']]
+    assert decode(records[0][2]).n == 7
+
+JOBS = [
+    # (job directory, mapper command, reducer command)
+    ("std_dev", "stddev_welford_mapper.py arithmetic_mean,first_max_value", "stddev_welford_reducer.py"),
+    ("skewness", "skewness_stats_mapper.py arithmetic_mean", "skewness_stats_reducer.py"),
+    ("min_max", "min_max_finder_mapper.py arithmetic_mean,aqi", "min_max_finder_reducer.py"),
+    ("median", "median_histogram_mapper.py arithmetic_mean log:0.01:500:64", "median_histogram_reducer.py"),
+    ("percentile_90", "percentile_90_mapper.py arithmetic_mean,aqi", "percentile_90_reducer.py"),
+    ("mad_iqr", "mad_iqr_mapper.py arithmetic_mean log:0.01:500:64", "mad_iqr_reducer.py"),
+    ("covariance", "covariance_mapper.py arithmetic_mean,first_max_value state_name", "covariance_reducer.py"),
+    ("distinct", "hll_distinct_mapper.py", "hll_distinct_reducer.py"),
+]
+
+def synthetic_csv():
+    rng = random.Random(45)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPECTED_FIELDNAMES)
+    for _ in range(3000):
+        row = dict.fromkeys(EXPECTED_FIELDNAMES, "")
+        row.update(date_local=f"2019-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                   state_name=rng.choice(["CA", "TX", "NY"]), county_name=rng.choice("ABCD"),
+                   arithmetic_mean=f"{rng.lognormvariate(2, 0.8):.3f}",
+                   first_max_value=f"{rng.lognormvariate(3, 0.5):.2f}", aqi=str(rng.randint(0, 300)),
+                   observation_count=str(rng.randint(1, 24)))
+        writer.writerow([row[name] for name in EXPECTED_FIELDNAMES])
+    return out.getvalue()
+
+@pytest.fixture(scope="module")
+def input_csv():
+    return synthetic_csv()
+
+def run_local(job_dir, mapper, reducer, input_text, wire):
+    env = {name: value for name, value in os.environ.items() if not name.startswith("EPA_")}
+    env["EPA_WIRE"] = wire
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'common', 'local_runner.py'),
+                             '--workdir', os.path.join(REPO_DIR, job_dir), '--mapper', mapper, '--reducer', reducer],
+                            input=input_text, capture_output=True, text=True, env=env, check=True)
+    return load_record(result.stdout)
+
+def without_samples(value):
+    # The bucket reservoirs are random draws, everything else is exact
+    if isinstance(value, dict):
+        return {key: without_samples(item) for key, item in value.items() if key != "samples"}
+    return value
+
+@pytest.mark.parametrize("job_dir, mapper, reducer", JOBS, ids=[job[0] for job in JOBS])
+def test_text_and_typed_bytes_results_match(job_dir, mapper, reducer, input_csv):
+    text = run_local(job_dir, mapper, reducer, input_csv, TEXT)
+    typed = run_local(job_dir, mapper, reducer, input_csv, TYPED_BYTES)
+    assert text["results"]
+    assert without_samples(typed["results"]) == without_samples(text["results"])
+    assert typed["counts"] == text["counts"]
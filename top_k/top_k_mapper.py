@@ -0,0 +1,84 @@
+import sys
+import json
+import argparse
+
+from aggregates import FrequentItems
+from topk import TopKHeap
+from records import EXPECTED_FIELDNAMES, KEY_SEPARATOR, iter_row_blocks, parse_columns, parse_key_expressions
+from job_output import TaskCounters
+
+# Two modes, both O(K) per task:
+#   max       the K rows with the highest value, with their row context
+#   frequent  the keys (e.g. counties) with the most rows above a threshold,
+#             approximated with a Space-Saving summary of CAPACITY_FACTOR * K counters
+#   TOPK      column  k  value  context_json
+#   FREQUENT  column  key_name  threshold  k  summary (serialized aggregate)
+
+MODE_MAX = "max"
+MODE_FREQUENT = "frequent"
+CONTEXT_FIELDS = ['date_local', 'state_name', 'county_name', 'latitude', 'longitude']
+CAPACITY_FACTOR = 10
+
+def row_context(row, context_indexes):
+    return json.dumps({f: row[i] for f, i in context_indexes if i < len(row)}, separators=(',', ':'))
+
+def max_block(rows, index, heap, context_indexes):
+    valid = 0
+    for row in rows:
+        try:
+            value = float(row[index])
+        except (ValueError, IndexError):
+            continue
+        valid += 1
+        if heap.would_accept(value):
+            heap.add(value, row_context(row, context_indexes))
+    return valid
+
+def frequent_block(rows, index, key_indexes, threshold, summary):
+    valid = 0
+    for row in rows:
+        try:
+            value = float(row[index])
+            key = KEY_SEPARATOR.join(row[i].strip() for i in key_indexes)
+        except (ValueError, IndexError):
+            continue
+        valid += 1
+        if value > threshold:
+            summary.update(key)
+    return valid
+
+def mapper(columns, mode, k, threshold, key_name, key_fields):
+    counters = TaskCounters(columns)
+    lookup = columns + CONTEXT_FIELDS + key_fields
+    heaps = {column: TopKHeap(k) for column in columns}
+    summaries = {column: FrequentItems(CAPACITY_FACTOR * k) for column in columns}
+    for indexes, rows in iter_row_blocks(sys.stdin, lookup, counters=counters):
+        counters.rows += len(rows)
+        context_indexes = [(f, i) for f, i in zip(CONTEXT_FIELDS, indexes[len(columns):]) if i >= 0]
+        key_indexes = indexes[len(columns) + len(CONTEXT_FIELDS):]
+        for column, index in zip(columns, indexes):
+            if index < 0:
+                continue
+            if mode == MODE_MAX:
+                counters.valid[column] += max_block(rows, index, heaps[column], context_indexes)
+            elif min(key_indexes) >= 0:
+                counters.valid[column] += frequent_block(rows, index, key_indexes, threshold, summaries[column])
+
+    for column in columns:
+        if mode == MODE_MAX:
+            for value, context in heaps[column].items():
+                print(f"TOPK\t{column}\t{k}\t{value!r}\t{context}")
+        elif summaries[column].summary.counts:
+            print(f"FREQUENT\t{column}\t{key_name}\t{threshold!r}\t{k}\t{summaries[column].serialize()}")
+    counters.emit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-K values or frequent keys")
+    parser.add_argument("columns", nargs="?", default="")
+    parser.add_argument("--mode", choices=[MODE_MAX, MODE_FREQUENT], default=MODE_MAX)
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=35.0)
+    parser.add_argument("--key", default="county")
+    args = parser.parse_args()
+    key_name, key_fields = next(iter(parse_key_expressions(args.key).items()))
+    mapper(parse_columns([args.columns]), args.mode, args.k, args.threshold, key_name, key_fields)
@@ -0,0 +1,121 @@
+import sys
+import json
+import argparse
+
+from aggregates import decode
+from topk import TopKHeap
+from records import COLUMN_LABELS, COLUMN_UNITS, KEY_SEPARATOR, ordered_columns
+from job_output import TASK_META_KEY, emit_record, finish_record, merge_task_meta, new_record, print_counts
+
+# Also used as the combiner (--combine): merged partials are written back in
+# the mapper format and TASK_META lines are passed through.
+
+def process_line(line, heaps, summaries, meta_lines, record):
+    try:
+        parts = line.rstrip('\n').split('\t')
+        if parts[0] == TASK_META_KEY:
+            meta_lines.append(line.rstrip('\n'))
+            merge_task_meta(record, parts[1])
+        elif parts[0] == "TOPK" and len(parts) == 5:
+            column, k = parts[1], int(parts[2])
+            if column not in heaps:
+                heaps[column] = TopKHeap(k)
+            heaps[column].add(float(parts[3]), parts[4])
+        elif parts[0] == "FREQUENT" and len(parts) == 6:
+            column = parts[1]
+            summary = decode(parts[5])
+            if column not in summaries:
+                summaries[column] = (parts[2], float(parts[3]), int(parts[4]), summary)
+            else:
+                summaries[column][3].merge(summary)
+    except (ValueError, IndexError, KeyError) as e:
+        print(f"DEBUG: line skipped: {e}", file=sys.stderr)
+
+def write_partials(heaps, summaries, meta_lines):
+    for column, heap in heaps.items():
+        for value, context in heap.items():
+            print(f"TOPK\t{column}\t{heap.k}\t{value!r}\t{context}")
+    for column, (key_name, threshold, k, summary) in summaries.items():
+        print(f"FREQUENT\t{column}\t{key_name}\t{threshold!r}\t{k}\t{summary.serialize()}")
+    for line in meta_lines:
+        print(line)
+
+def frequent_result(key_name, threshold, k, summary):
+    items = summary.items()
+    # A key is surely in the top-K when its lower bound beats every key ranked below it
+    outside_bound = summary.min_count()
+    if len(items) > k:
+        outside_bound = max(outside_bound, items[k][1])
+    return {
+        "mode": "frequent",
+        "key": key_name,
+        "threshold": threshold,
+        "k": k,
+        "exact": summary.min_count() == 0,
+        "frequent": [{"key": key.split(KEY_SEPARATOR), "count": count, "error": error,
+                      "guaranteed": count - error >= outside_bound}
+                     for key, count, error in items[:k]],
+    }
+
+def print_max(column, result):
+    unit = COLUMN_UNITS.get(column, "")
+    print(f"=== Top {result['k']} {COLUMN_LABELS.get(column, column)} Values ===")
+    for rank, row in enumerate(result["top"], 1):
+        place = ", ".join(row.get(f, "") for f in ("county_name", "state_name"))
+        print(f"{rank:4d}. {row['value']:.2f}{unit}  {row.get('date_local', '')}  {place}  "
+              f"({row.get('latitude', '')}, {row.get('longitude', '')})")
+
+def print_frequent(column, result):
+    unit = COLUMN_UNITS.get(column, "")
+    accuracy = "exact" if result["exact"] else "approximate, Space-Saving"
+    # Rows are daily readings of one monitor: a county with several sites
+    # counts each site's day, so the counts are site-days, not calendar days
+    print(f"=== Top {result['k']} {result['key']} by site-days (rows) with {COLUMN_LABELS.get(column, column)} "
+          f"> {result['threshold']:g}{unit} ({accuracy}) ===")
+    for rank, item in enumerate(result["frequent"], 1):
+        error = f" (overestimate ≤ {item['error']})" if item["error"] else ""
+        marker = "" if item["guaranteed"] else " ?"
+        print(f"{rank:4d}. {' / '.join(item['key'])}: {item['count']}{error}{marker}")
+    if not result["exact"]:
+        print("(? = rank not guaranteed by the error bounds)")
+
+def reducer(combine):
+    heaps = {}
+    summaries = {}
+    meta_lines = []
+    record = new_record("top_k")
+    for line in sys.stdin:
+        process_line(line, heaps, summaries, meta_lines, record)
+    if combine:
+        write_partials(heaps, summaries, meta_lines)
+        return
+
+    for column in ordered_columns(heaps):
+        record["results"][column] = {
+            "mode": "max",
+            "k": heaps[column].k,
+            "top": [dict(json.loads(context), value=value) for value, context in heaps[column].items()],
+        }
+    for column in ordered_columns(summaries):
+        key_name, threshold, k, frequent_items = summaries[column]
+        summary = frequent_items.summary
+        record["results"][column] = frequent_result(key_name, threshold, k, summary)
+        record["state"][column] = {"space_saving": summary.to_dict()}
+    finish_record(record)
+
+    for i, (column, result) in enumerate(record["results"].items()):
+        if i > 0:
+            print()
+        if result["mode"] == "max":
+            print_max(column, result)
+        else:
+            print_frequent(column, result)
+    if not record["results"]:
+        print("ERROR: No valid data found!")
+    print_counts(record)
+    emit_record(record)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merges top-K partials")
+    parser.add_argument("--combine", action="store_true")
+    reducer(parser.parse_args().combine)